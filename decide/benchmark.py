@@ -0,0 +1,89 @@
+"""
+Memory benchmark of the candidate exchanges.
+
+Measures the memory allocated while the candidate exchanges of the first round are created
+and reports the number of bytes per candidate exchange, for example:
+
+    python -m decide.benchmark --input_file data/input/cop21.csv
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+
+from decide import input_folder
+from decide.data.modelfactory import ModelFactory
+from decide.data.reader import InputDataFile
+from decide.model.equalgain import EqualGainModel
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Memory benchmark of the candidate exchanges of the Decide exchange model"
+    )
+    parser.add_argument(
+        "--input_file",
+        help="The location of the csv input file. ",
+        default=os.path.join(input_folder, "cop21.csv"),
+        type=str,
+    )
+    parser.add_argument(
+        "--numeric",
+        help='The numeric backend of the model, "decimal" or "float"',
+        default="decimal",
+        choices=["decimal", "float"],
+        type=str,
+    )
+
+    return parser.parse_args()
+
+
+def measure_candidate_exchanges(model):
+    """
+    Create the candidate exchanges of the model and measure the allocated memory
+    :param model: AbstractModel
+    :return: tuple with the number of candidate exchanges, the allocated and the peak number of bytes
+    """
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        model.determine_groups_and_calculate_exchanges()
+        gc.collect()
+
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return len(model.exchanges), after - before, peak - before
+
+
+def main():
+    args = parse_arguments()
+
+    factory = ModelFactory(InputDataFile.open(args.input_file))
+    model = factory(model_klass=EqualGainModel, numeric_backend=args.numeric)
+    # measure the calculation of the candidate exchanges, not the copy of the first round of the factory
+    model.initial_exchanges = None
+
+    exchanges, allocated, peak = measure_candidate_exchanges(model)
+
+    print("input file:           {0}".format(args.input_file))
+    print("actors x issues:      {0} x {1}".format(len(model.actors), len(model.issues)))
+    print("candidate exchanges:  {0}".format(exchanges))
+    print("allocated:            {0} bytes".format(allocated))
+    print("peak:                 {0} bytes".format(peak))
+
+    if exchanges > 0:
+        print("bytes per exchange:   {0:.0f}".format(allocated / exchanges))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Checkpoints of a sweep over p-values, so an interrupted sweep can be resumed.
+
+The observers are not pickled. A checkpoint stores the records (see EventRecorder) of the finished
+repetitions of the p-values that are not finished yet. On resume these records are replayed, which
+rebuilds the storage of the observers for the current p-value. The state that is kept over the
+p-values (Observer.checkpoint_state) is stored at the start of the sweep and for the finished p-values.
+"""
+import logging
+import os
+import pickle
+import time
+from collections import defaultdict
+
+CHECKPOINT_FILENAME = "checkpoint.pickle"
+
+
+class Checkpoint:
+    """
+    The progress of a sweep: the finished p-values, the finished repetitions and the repetition in progress
+    """
+
+    def __init__(self, path, arguments: dict, interval=300):
+        """
+        :param path: the checkpoint file
+        :param arguments: the settings of the sweep, a checkpoint is only resumed with the same settings
+        :param interval: the minimal number of seconds between two checkpoints, except after a finished p-value
+        """
+        self.path = path
+        self.arguments = arguments
+        self.interval = interval
+
+        self.finished = []  # the finished p-values
+        self.observer_states = []  # Observable.checkpoint_state at the start and after the last finished p-value
+        self.repetitions = defaultdict(dict)  # dict with p-value, dict with repetition and records
+        self.running = None  # tuple with the p-value and the pickled ModelLoop of the repetition in progress
+        self.resumed = False  # loaded from the checkpoint of an interrupted sweep
+
+        self.saved_at = time.time()
+
+    @classmethod
+    def load(cls, path, arguments: dict, interval=300):
+        """
+        Load the checkpoint of an interrupted sweep
+        :param arguments: the settings of the sweep, a seed of None takes the seed of the checkpoint
+        :raises ValueError: when the checkpoint belongs to a sweep with other settings
+        """
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+
+        if arguments.get("seed") is None:
+            arguments = dict(arguments, seed=state["arguments"].get("seed"))
+
+        if state["arguments"] != arguments:
+            changed = sorted(
+                key
+                for key in set(state["arguments"]) | set(arguments)
+                if state["arguments"].get(key) != arguments.get(key)
+            )
+
+            raise ValueError(
+                "The checkpoint {0} belongs to a sweep with other settings: {1}".format(
+                    path, ", ".join(changed)
+                )
+            )
+
+        checkpoint = cls(path, arguments, interval)
+        checkpoint.finished = state["finished"]
+        checkpoint.observer_states = state["observer_states"]
+        checkpoint.repetitions.update(state["repetitions"])
+        checkpoint.running = state["running"]
+        checkpoint.resumed = True
+
+        logging.info(
+            "resume from {0}, {1} p-value(s) finished".format(path, len(checkpoint.finished))
+        )
+
+        return checkpoint
+
+    def save(self):
+        state = {
+            "arguments": self.arguments,
+            "finished": self.finished,
+            "observer_states": self.observer_states,
+            "repetitions": dict(self.repetitions),
+            "running": self.running,
+        }
+
+        # write to a temporary file first, so an interruption while saving keeps the previous checkpoint
+        temporary = self.path + ".tmp"
+
+        with open(temporary, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, self.path)
+
+        self.saved_at = time.time()
+
+    def remove(self):
+        """
+        Remove the checkpoint file when the sweep is finished
+        """
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def add_repetition(self, p, repetition, records):
+        """
+        Store a finished repetition, the checkpoint is written at most once per interval
+        """
+        self.repetitions[p][repetition] = records
+        self.running = None
+
+        self.save_if_due()
+
+    def finish(self, p, observer_states):
+        """
+        All the repetitions of the p-value are written by the observers
+        """
+        self.finished.append(p)
+        self.observer_states = observer_states
+        self.repetitions.pop(p, None)
+        self.save()
+
+    def save_running(self, p, model_loop):
+        """
+        Store the repetition in progress, at most once per interval
+        """
+        if self.due():
+            self.running = (p, pickle.dumps(model_loop, protocol=pickle.HIGHEST_PROTOCOL))
+            self.save()
+
+    def due(self):
+        return time.time() - self.saved_at >= self.interval
+
+    def save_if_due(self):
+        if self.due():
+            self.save()
+
+    def running_repetition(self, p, repetition):
+        """
+        :return: the ModelLoop of the repetition when it was in progress at the last checkpoint, otherwise None
+        """
+        if self.running is None or self.running[0] != p:
+            return None
+
+        model_loop = pickle.loads(self.running[1])
+
+        if model_loop.repetition_number != repetition:
+            return None
+
+        return model_loop
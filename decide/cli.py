@@ -1,20 +1,35 @@
 import argparse
 import logging
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 from typing import List
 
 from decide import input_folder
+from decide.checkpoint import CHECKPOINT_FILENAME, Checkpoint
 from decide.data.modelfactory import ModelFactory
 from decide.data.reader import InputDataFile
 from decide.model import randomrate, equalgain
+from decide.model.base import stream_seed
+from decide.model.observers.background import BackgroundWriter
 from decide.model.observers.exchanges_writer import ExchangesWriter
 from decide.model.observers.externalities import Externalities
+from decide.model.observers.confidence import MdsConfidence
 from decide.model.observers.issue_development import IssueDevelopment
 from decide.model.observers.logger import Logger
 from decide.model.observers.observer import Observable
+from decide.model.observers.recorder import is_deterministic, replay
 from decide.model.observers.sqliteobserver import SQLiteObserver
 from decide.model.utils import ModelLoop
+from decide.sweep import (
+    SweepScheduler,
+    create_repetition,
+    finish_repetition,
+    record_repetition,
+    run_repetition,
+)
 
 
 def parse_arguments():
@@ -63,6 +78,98 @@ def parse_arguments():
         type=str,
     )
 
+    parser.add_argument(
+        "--numeric",
+        help='The numeric backend of the model, "decimal" (the reference) or "float" (faster, '
+             'see docs/cli.md for the tolerance)',
+        default="decimal",
+        choices=["decimal", "float"],
+        type=str,
+    )
+
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="The number of processes that calculate the repetitions of all the p-values in parallel. "
+             "The results are written in order of repetition, as in a serial run",
+        default=1,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--seed",
+        help="The seed of the run. Every repetition gets its own random streams derived from it, "
+             "so a run with the same seed can be reproduced. A random seed is chosen (and logged) when omitted",
+        default=None,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--common_random_numbers",
+        help="Use the same random streams for every p-value, this reduces the variance between the p-values",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--convergence_tolerance",
+        help="Stop a repetition before the last iteration when no exchange is realized anymore, or when the "
+             "NBS of every issue moved less than this tolerance in a round. Use 0 to stop only when no exchange "
+             "is realized. The remaining iterations are reported with the final positions",
+        default=None,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--split_components",
+        help="Calculate the groups of issues that share no actors as separate models, each with a smaller set "
+             "of candidate exchanges. The components get their own random streams",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--confidence_half_width",
+        help="Repeat until the half-width of the 95%% confidence interval of the final MDS of every issue is "
+             "below this value (on the 0 - 100 scale of the model). --repetitions is the maximum number of "
+             "repetitions",
+        default=None,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        help="Write checkpoints of the sweep to the output directory, so an interrupted sweep can be resumed",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--checkpoint_interval",
+        help="The minimal number of seconds between two checkpoints. "
+             "A checkpoint is always written when a p-value is finished",
+        default=300,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--resume",
+        help="Continue an interrupted sweep from its last checkpoint, with the same arguments. "
+             "Finished p-values and repetitions are not calculated again",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--delta_snapshots",
+        help="Store the positions of all the actors once per repetition, after that only the changed positions. "
+             "Makes the database much smaller, see docs/cli.md",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--background_writer",
+        help="Write the database, the csv files and the charts in a separate process, while the model calculates "
+             "the next rounds",
+        action="store_true",
+    )
+
     parser.add_argument("--step", default='0.80', type=str)
     parser.add_argument("--stop", default='0.80', type=str)
     parser.add_argument("--start", default='0.0', type=str)
@@ -73,21 +180,36 @@ def parse_arguments():
     return parser.parse_args()
 
 
-def init_event_handlers(model, output_directory, database_file, write_csv=True):
+def init_event_handlers(
+        model, output_directory, database_file, write_csv=True, delta_snapshots=False, background_writer=False
+):
     event_handler = Observable(model_ref=model, output_directory=output_directory)
 
-    SQLiteObserver(event_handler, output_directory)
+    writer_arguments = dict(write_csv=write_csv, delta_snapshots=delta_snapshots)
 
-    Logger(event_handler)
+    if background_writer:
+        # the observers that only write the results are created in the writer process
+        BackgroundWriter(event_handler, init_writers, writer_arguments)
+    else:
+        init_writers(event_handler, **writer_arguments)
+
+    return event_handler
+
+
+def init_writers(writers, write_csv=True, delta_snapshots=False):
+    """
+    Register the observers that write the results, also called in the process of a BackgroundWriter
+    """
+    SQLiteObserver(writers, writers.output_directory, delta_snapshots)
+
+    Logger(writers)
     Logger.LOG_LEVEL = 99
 
     if write_csv:
         # csv handlers
-        Externalities(event_handler)
-        ExchangesWriter(event_handler)
-        IssueDevelopment(event_handler)
-
-    return event_handler
+        Externalities(writers)
+        ExchangesWriter(writers)
+        IssueDevelopment(writers)
 
 
 def init_output_directory(*args):
@@ -162,6 +284,296 @@ def p_values_param(args) -> List[float]:
     return p_values
 
 
+def before_p_value(args, factory, model_klass, p, event_handler, parent_output_directory):
+    """
+    Point the event handlers to the output directory of the p-value and start its model run
+    :return: the start time of the p-value
+    """
+    start_time = datetime.now()  # for timing operations
+
+    event_handler.update_model_ref(
+        factory(model_klass=model_klass, randomized_value=p, numeric_backend=args.numeric)
+    )
+    event_handler.update_output_directory(init_output_directory(parent_output_directory, p))
+
+    event_handler.log(message="Start calculation at {0}".format(start_time))
+
+    event_handler.log(message="Parsed file".format(args.input_file))
+
+    event_handler.before_repetitions(
+        repetitions=args.repetitions, iterations=args.iterations, randomized_value=p
+    )
+
+    return start_time
+
+
+def after_p_value(event_handler, start_time, confidence=None):
+    if confidence:
+        event_handler.log(
+            message="{0} repetitions, confidence interval half-width {1:.4f}".format(
+                confidence.repetitions, confidence.half_width()
+            )
+        )
+
+    event_handler.after_repetitions()
+
+    event_handler.log(message="Finished in {0}".format(datetime.now() - start_time))
+
+
+def repetition_arguments(args, model_klass, actors, issues):
+    """
+    :return: the keyword arguments of create_repetition for this run
+    """
+    return dict(
+        input_file=args.input_file,
+        actors=actors,
+        issues=issues,
+        model_klass=model_klass,
+        numeric_backend=args.numeric,
+        seed=args.seed,
+        common_random_numbers=args.common_random_numbers,
+        convergence_tolerance=args.convergence_tolerance,
+    )
+
+
+def sweep_arguments(args, p_values, actors, issues):
+    """
+    The settings that define the results of a sweep, a checkpoint can only be resumed with the same settings
+    """
+    return dict(
+        input_file=os.path.abspath(args.input_file),
+        model=args.model,
+        p_values=p_values,
+        repetitions=args.repetitions,
+        iterations=args.iterations,
+        numeric=args.numeric,
+        seed=args.seed,
+        common_random_numbers=args.common_random_numbers,
+        convergence_tolerance=args.convergence_tolerance,
+        split_components=args.split_components,
+        # the observers are arranged differently, so is their checkpoint state
+        background_writer=args.background_writer,
+        confidence_half_width=args.confidence_half_width,
+        actors=actors,
+        issues=issues,
+    )
+
+
+def recorded_repetition(args, arguments, p, repetition, checkpoint: Checkpoint):
+    """
+    The records of a repetition, from the checkpoint when it was finished before. A repetition that was in
+    progress continues from the last checkpoint.
+    """
+    records = checkpoint.repetitions[p].get(repetition)
+
+    if records is None and args.split_components:
+        records = run_repetition(p, repetition, args.iterations, split_components=True, **arguments)
+
+        checkpoint.add_repetition(p, repetition, records)
+
+    if records is None:
+        model_loop = checkpoint.running_repetition(p, repetition)
+
+        if model_loop is None:
+            model_loop = create_repetition(p, repetition, **arguments)
+
+        records = finish_repetition(
+            model_loop, args.iterations, partial(checkpoint.save_running, p)
+        )
+
+        checkpoint.add_repetition(p, repetition, records)
+
+    return records
+
+
+def finish_p_value(event_handler, checkpoint, p):
+    if checkpoint:
+        checkpoint.finish(p, event_handler.checkpoint_state())
+
+
+def run_sweep_serial(
+        args, factory, model_klass, p_values, actors, issues, event_handler, confidence, checkpoint
+):
+    """
+    Calculate the repetitions one after the other. Without a checkpoint the observers follow the model directly,
+    with a checkpoint the repetitions are recorded so they can be stored. With --split_components the
+    repetitions are recorded as well, see decide.components.
+
+    The first repetition of a model without a random component is recorded as well. When it did not need a tie
+    break, the other repetitions are the same and its records are replayed for them.
+    """
+    parent_output_directory = event_handler.output_directory
+
+    arguments = repetition_arguments(args, model_klass, actors, issues)
+
+    for p in p_values:
+
+        start_time = before_p_value(
+            args, factory, model_klass, p, event_handler, parent_output_directory
+        )
+
+        deterministic_records = None
+
+        for repetition in range(args.repetitions):
+
+            if deterministic_records:
+                replay(deterministic_records, event_handler, repetition)
+            elif checkpoint or args.split_components:
+                if checkpoint:
+                    records = recorded_repetition(args, arguments, p, repetition, checkpoint)
+                else:
+                    records = run_repetition(
+                        p, repetition, args.iterations, split_components=True, **arguments
+                    )
+
+                replay(records, event_handler)
+
+                if repetition == 0 and is_deterministic(records):
+                    deterministic_records = records
+            else:
+                model = factory(
+                    model_klass=model_klass,
+                    randomized_value=p,
+                    numeric_backend=args.numeric,
+                    seed=stream_seed(
+                        args.seed, repetition, None if args.common_random_numbers else p
+                    ),
+                )
+
+                if repetition == 0 and not model.draws_for_exchanges():
+                    records = finish_repetition(
+                        record_repetition(model, repetition, args.convergence_tolerance),
+                        args.iterations,
+                    )
+                    replay(records, event_handler)
+
+                    if model.is_deterministic():
+                        deterministic_records = records
+
+                    continue
+
+                event_handler.update_model_ref(model)
+
+                model_loop = ModelLoop(
+                    model, event_handler, repetition, args.convergence_tolerance
+                )
+
+                event_handler.before_iterations(repetition)
+
+                model_loop.run(args.iterations)
+
+                event_handler.after_iterations(repetition)
+
+            if confidence and confidence.reached(args.confidence_half_width):
+                break
+
+        after_p_value(event_handler, start_time, confidence)
+
+        finish_p_value(event_handler, checkpoint, p)
+
+
+def run_sweep_parallel(
+        args, factory, model_klass, p_values, actors, issues, event_handler, checkpoint
+):
+    """
+    Calculate the (p-value x repetition) grid on args.jobs worker processes. The output directory of a p-value
+    is written as soon as all its repetitions and those of the p-values before it are finished, so the p-values
+    are written in the same order as in a serial run.
+    """
+    parent_output_directory = event_handler.output_directory
+
+    task = partial(
+        run_repetition,
+        iterations=args.iterations,
+        split_components=args.split_components,
+        **repetition_arguments(args, model_klass, actors, issues)
+    )
+
+    start_time = datetime.now()
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        scheduler = SweepScheduler(
+            executor,
+            task,
+            p_values,
+            args.repetitions,
+            finished=checkpoint.repetitions if checkpoint else None,
+            callback=checkpoint.add_repetition if checkpoint else None,
+            deterministic=is_deterministic,
+        )
+
+        for p, repetition_records in scheduler.completed():
+            before_p_value(args, factory, model_klass, p, event_handler, parent_output_directory)
+
+            # the records are in order of repetition, as in a serial run. A deterministic p-value has the records
+            # of its first repetition for all the repetitions
+            for repetition, records in enumerate(repetition_records):
+                replay(records, event_handler, repetition)
+
+            # the p-values are calculated concurrently, the reported time is the time since the start of the sweep
+            after_p_value(event_handler, start_time)
+
+            finish_p_value(event_handler, checkpoint, p)
+
+
+def run_sweep_sequential_sampling(
+        args, factory, model_klass, p_values, actors, issues, event_handler, confidence, checkpoint
+):
+    """
+    Calculate the repetitions of each p-value in batches of args.jobs, until the confidence interval is small
+    enough or args.repetitions is reached. The decision needs the results of the previous batch, so the
+    p-values are calculated one after the other. A deterministic first repetition is replayed for the others.
+    """
+    parent_output_directory = event_handler.output_directory
+
+    task = partial(
+        run_repetition,
+        iterations=args.iterations,
+        split_components=args.split_components,
+        **repetition_arguments(args, model_klass, actors, issues)
+    )
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for p in p_values:
+            start_time = before_p_value(
+                args, factory, model_klass, p, event_handler, parent_output_directory
+            )
+
+            repetition = 0
+            deterministic_records = None
+
+            # the repetitions of an interrupted run
+            while checkpoint and repetition in checkpoint.repetitions[p]:
+                replay(checkpoint.repetitions[p][repetition], event_handler)
+                repetition += 1
+
+            if repetition > 0 and is_deterministic(checkpoint.repetitions[p][0]):
+                deterministic_records = checkpoint.repetitions[p][0]
+
+            while repetition < args.repetitions and not confidence.reached(args.confidence_half_width):
+                if deterministic_records:
+                    replay(deterministic_records, event_handler, repetition)
+                    repetition += 1
+                    continue
+
+                batch = range(repetition, min(repetition + args.jobs, args.repetitions))
+
+                for batch_repetition, records in zip(batch, executor.map(partial(task, p), batch)):
+                    replay(records, event_handler)
+
+                    if checkpoint:
+                        checkpoint.add_repetition(p, batch_repetition, records)
+
+                    if batch_repetition == 0 and is_deterministic(records):
+                        deterministic_records = records
+
+                repetition = batch.stop
+
+            after_p_value(event_handler, start_time, confidence)
+
+            finish_p_value(event_handler, checkpoint, p)
+
+
 def main():
     args = parse_arguments()
 
@@ -184,53 +596,77 @@ def main():
     else:
         model_klass = randomrate.RandomRateModel
 
-    for p in p_values:
+    parent_output_directory = init_output_directory(args.output_dir, data_set_name)
 
-        start_time = datetime.now()  # for timing operations
+    checkpoint_file = os.path.join(parent_output_directory, CHECKPOINT_FILENAME)
 
-        model = factory(model_klass=model_klass, randomized_value=p)
+    checkpoint = None
 
-        output_directory = init_output_directory(
-            args.output_dir,
-            data_set_name,
-            p,
-        )
+    if args.resume:
+        if not os.path.isfile(checkpoint_file):
+            raise RuntimeError("There is no checkpoint to resume in {0}".format(parent_output_directory))
 
-        # The event handlers for logging and writing the results to the disk.
-        event_handler = init_event_handlers(
-            model=model,
-            output_directory=output_directory,
-            database_file=args.database,
-            write_csv=True,
+        checkpoint = Checkpoint.load(
+            checkpoint_file, sweep_arguments(args, p_values, actors, issues), args.checkpoint_interval
         )
 
-        event_handler.log(message="Start calculation at {0}".format(start_time))
+        # the seed of the interrupted run
+        args.seed = checkpoint.arguments["seed"]
 
-        event_handler.log(message="Parsed file".format(args.input_file))
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
 
-        event_handler.before_repetitions(
-            repetitions=args.repetitions, iterations=args.iterations
+    if args.checkpoint and checkpoint is None:
+        checkpoint = Checkpoint(
+            checkpoint_file, sweep_arguments(args, p_values, actors, issues), args.checkpoint_interval
         )
 
-        for repetition in range(args.repetitions):
+    model = factory(
+        model_klass=model_klass, randomized_value=p_values[0], numeric_backend=args.numeric
+    )
 
-            model = factory(model_klass=model_klass, randomized_value=p)
+    # The event handlers for logging and writing the results to the disk.
+    event_handler = init_event_handlers(
+        model=model,
+        output_directory=parent_output_directory,
+        database_file=args.database,
+        write_csv=True,
+        delta_snapshots=args.delta_snapshots,
+        background_writer=args.background_writer,
+    )
 
-            event_handler.update_model_ref(model)
+    event_handler.before_model()
 
-            model_loop = ModelLoop(model, event_handler, repetition)
+    event_handler.log(message="Seed {0}".format(args.seed))
 
-            event_handler.before_iterations(repetition)
+    if checkpoint and checkpoint.resumed:
+        # the output of the finished p-values is written before the interruption
+        event_handler.restore_checkpoint_state(checkpoint.observer_states)
+        p_values = [p for p in p_values if p not in checkpoint.finished]
+    elif checkpoint:
+        checkpoint.observer_states = event_handler.checkpoint_state()
 
-            for iteration_number in range(args.iterations):
-                logging.info("round {0}.{1}".format(repetition, iteration_number))
-                model_loop.loop()
+    confidence = MdsConfidence(event_handler) if args.confidence_half_width is not None else None
 
-            event_handler.after_iterations(repetition)
+    if args.jobs > 1 and confidence:
+        run_sweep_sequential_sampling(
+            args, factory, model_klass, p_values, actors, issues, event_handler, confidence, checkpoint
+        )
+    elif args.jobs > 1:
+        run_sweep_parallel(
+            args, factory, model_klass, p_values, actors, issues, event_handler, checkpoint
+        )
+    else:
+        run_sweep_serial(
+            args, factory, model_klass, p_values, actors, issues, event_handler, confidence, checkpoint
+        )
 
-        event_handler.after_repetitions()
+    # the summaries over all the p-values are written once, in the parent directory
+    event_handler.update_output_directory(parent_output_directory)
+    event_handler.after_model()
 
-        event_handler.log(message="Finished in {0}".format(datetime.now() - start_time))
+    if checkpoint:
+        checkpoint.remove()
 
     logging.info("Done")
 
@@ -0,0 +1,188 @@
+"""
+Calculate the groups of issues that share no actors as separate models.
+
+An exchange needs both actors on both issues, so the exchanges on one group of issues (a component, see
+AbstractModel.issue_components) never change the positions, NBS or exchanges of another component. Each component
+is calculated as a sub model with its own, smaller set of candidate exchanges. The records of the components are
+merged per iteration, so the observers get the same events as for a single model.
+"""
+import pickle
+from typing import List
+
+from decide.model.base import AbstractModel, ExchangeQueue
+from decide.model.observers.recorder import EventRecorder, dump_record
+from decide.model.utils import ModelLoop
+
+
+def component_seed(seed, component):
+    """
+    The seed of the random streams of a component, derived from the seed of the repetition
+    """
+    if seed is None:
+        return None
+
+    return "{0}-component-{1}".format(seed, component)
+
+
+def run_components(model: AbstractModel, repetition, iterations, convergence_tolerance=None):
+    """
+    Calculate each component of the model as a separate model
+    :param model: the model of the repetition, in its begin state
+    :param convergence_tolerance: see ModelLoop, applies to each component
+    :return: the merged records, the same as the records of an EventRecorder on the complete model
+    """
+    records = []
+
+    for component, issues in enumerate(model.issue_components()):
+        sub_model = model.sub_model(issues, component_seed(model.seed, component))
+
+        event_handler = EventRecorder(sub_model)
+        ModelLoop(sub_model, event_handler, repetition, convergence_tolerance).run(iterations)
+        event_handler.after_iterations(repetition)
+
+        records.append(event_handler.records)
+
+    return merge_records(model, repetition, iterations, records)
+
+
+class ComponentRecords:
+    """
+    Reads the records of a component one loop at a time
+    """
+
+    def __init__(self, records: List[bytes]):
+        self.records = records
+        self.index = 0
+
+        self.model = None  # the model of the last read record
+        self.converged_at = None  # the iteration after which the component converged
+
+        # the records of a loop are before_loop, after_loop and end_loop, the last record holds after_iterations
+        self.loops = (len(records) - 1) // 3
+
+    def read(self):
+        """
+        :return: the events of the next record
+        """
+        self.model, events = pickle.loads(self.records[self.index])
+        self.index += 1
+
+        return events
+
+    def read_final(self):
+        for event, kwargs in self.read():
+            if event == "converged":
+                self.converged_at = kwargs["iteration"]
+
+
+def merge_records(model: AbstractModel, repetition, iterations, component_records: List[List[bytes]]):
+    """
+    Merge the records of the components into the records of the complete model. A component that converged
+    keeps its final positions, without exchanges, until all the components are finished.
+    :param model: the complete model in its begin state, it holds the merged state of the components
+    :param component_records: the records of an EventRecorder for each component
+    :return: list of records
+    """
+    components = [ComponentRecords(records) for records in component_records]
+    loops = max(component.loops for component in components)
+
+    records = []
+
+    def snapshot(events):
+        records.append(dump_record(model, events))
+
+    for iteration in range(loops):
+        running = [component for component in components if iteration < component.loops]
+
+        # before_loop, the first record also holds before_iterations
+        for component in running:
+            component.read()
+
+        merge_models(model, [component.model for component in components])
+        snapshot(
+            ([("before_iterations", dict(repetition=repetition))] if iteration == 0 else [])
+            + [("before_loop", dict(iteration=iteration, repetition=repetition))]
+        )
+
+        # after_loop, with the realized exchanges of all the components
+        events = []
+        realized = []
+
+        for component in running:
+            for event, kwargs in component.read():
+                if event == "execute_exchange":
+                    events.append((event, kwargs))
+                elif event == "after_loop":
+                    realized += kwargs["realized"]
+
+        merge_models(model, [component.model for component in components])
+        snapshot(
+            events
+            + [("after_loop", dict(realized=realized, iteration=iteration, repetition=repetition))]
+        )
+
+        # end_loop
+        for component in running:
+            component.read()
+
+        merge_models(model, [component.model for component in components])
+        snapshot([("end_loop", dict(iteration=iteration, repetition=repetition))])
+
+    for component in components:
+        component.read_final()
+
+    merge_models(model, [component.model for component in components])
+
+    events = []
+
+    if all(component.converged_at is not None for component in components):
+        events.append(
+            (
+                "converged",
+                dict(
+                    iteration=max(component.converged_at for component in components),
+                    repetition=repetition,
+                    iterations=iterations,
+                ),
+            )
+        )
+
+    snapshot(events + [("after_iterations", dict(repetition=repetition))])
+
+    return records
+
+
+def merge_models(model: AbstractModel, component_models: List[AbstractModel]):
+    """
+    Copy the state of the components into the complete model: the positions, the NBS, the groups and the
+    exchanges. The exchanges keep the component model as their model.
+    """
+    model.exchanges = ExchangeQueue(precision=model.exchanges.precision)
+    model.groups = {}
+    model.tie_count = 0
+
+    deterministic = True
+
+    for component_model in component_models:
+        for issue, actor_issues in component_model.actor_issues.items():
+            merged_issue = model.issues[issue]
+
+            for actor, actor_issue in actor_issues.items():
+                merged_actor_issue = model.actor_issues[merged_issue][actor]
+                merged_actor_issue.position = actor_issue.position
+                merged_actor_issue.left = actor_issue.left
+
+            if issue in component_model.nbs:
+                model.nbs[merged_issue] = component_model.nbs[issue]
+                model.nbs_denominators[merged_issue] = component_model.nbs_denominators[issue]
+
+        for exchange in component_model.exchanges:
+            model.exchanges.append(exchange)
+
+        model.groups.update(component_model.groups)
+        model.tie_count += component_model.tie_count
+
+        deterministic = deterministic and component_model.is_deterministic()
+
+    # the merged model drew a random number when one of the components did, see AbstractModel.is_deterministic
+    model.random_start = model.random_state() if deterministic else None
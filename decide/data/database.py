@@ -5,6 +5,9 @@ from playhouse.db_url import connect
 
 connection = peewee.DatabaseProxy()
 
+# the version of the schema, stored in the user_version pragma. See decide.data.migrations
+SCHEMA_VERSION = 2
+
 
 class DictionaryIndexMixin:
     hash_field = "id"
@@ -55,8 +58,8 @@ class Issue(DictionaryIndexMixin, BaseModel):
     name = peewee.CharField()
     key = peewee.CharField()
 
-    lower = peewee.DecimalField()
-    upper = peewee.DecimalField()
+    lower = peewee.FloatField()
+    upper = peewee.FloatField()
 
     data_set = peewee.ForeignKeyField(DataSet, on_delete="CASCADE")
 
@@ -67,7 +70,7 @@ class ModelRun(BaseModel):
     started_at = peewee.DateTimeField(default=datetime.datetime.now)
     finished_at = peewee.DateTimeField(null=True)
 
-    p = peewee.DecimalField(max_digits=3, decimal_places=2)
+    p = peewee.FloatField()
     iterations = peewee.IntegerField()
     repetitions = peewee.IntegerField()
 
@@ -85,6 +88,9 @@ class Repetition(DictionaryIndexMixin, BaseModel):
 
     model_run = peewee.ForeignKeyField(ModelRun, on_delete="CASCADE")
 
+    class Meta:
+        indexes = ((("model_run", "pointer"), False),)
+
 
 class Iteration(DictionaryIndexMixin, BaseModel):
     """
@@ -96,6 +102,9 @@ class Iteration(DictionaryIndexMixin, BaseModel):
 
     hash_field = "pointer"
 
+    class Meta:
+        indexes = ((("repetition", "pointer"), False),)
+
 
 class ActorIssue(BaseModel):
     """
@@ -106,14 +115,17 @@ class ActorIssue(BaseModel):
 
     actor = peewee.ForeignKeyField(Actor, on_delete="CASCADE")
 
-    power = peewee.DecimalField(max_digits=20, decimal_places=15)
-    position = peewee.DecimalField(max_digits=20, decimal_places=15)
-    salience = peewee.DecimalField(max_digits=20, decimal_places=15)
+    power = peewee.FloatField()
+    position = peewee.FloatField()
+    salience = peewee.FloatField()
 
     iteration = peewee.ForeignKeyField(Iteration, on_delete="CASCADE")
 
     type = peewee.CharField(choices=("before", "after"), default="before")
 
+    class Meta:
+        indexes = ((("iteration", "type"), False),)
+
     def __str__(self):
         return "{issue} {actor} {position}".format(
             issue=self.issue.name, actor=self.actor.name, position=self.position
@@ -126,13 +138,11 @@ class ExchangeActor(BaseModel):
 
     demand_issue = peewee.ForeignKeyField(Issue, on_delete="CASCADE")
 
-    x = peewee.DecimalField(max_digits=20, decimal_places=15)  # begin position
-    y = peewee.DecimalField(max_digits=20, decimal_places=15)  # end position
-    eu = peewee.DecimalField(
-        max_digits=20, decimal_places=15
-    )  # expected utility or gain
+    x = peewee.FloatField()  # begin position
+    y = peewee.FloatField()  # end position
+    eu = peewee.FloatField()  # expected utility or gain
 
-    demand_position = peewee.DecimalField(max_digits=20, decimal_places=15)
+    demand_position = peewee.FloatField()
 
     # shortcut
     other_actor = peewee.ForeignKeyField("self", null=True, on_delete="CASCADE")
@@ -158,14 +168,66 @@ class Externality(BaseModel):
     supply = peewee.ForeignKeyField(Issue, on_delete="CASCADE")
     demand = peewee.ForeignKeyField(Issue, on_delete="CASCADE")
 
-    own = peewee.DecimalField(max_digits=20, decimal_places=15, null=True)
-    inner_positive = peewee.DecimalField(max_digits=20, decimal_places=15, null=True)
-    inner_negative = peewee.DecimalField(max_digits=20, decimal_places=15, null=True)
-    outer_positive = peewee.DecimalField(max_digits=20, decimal_places=15, null=True)
-    outer_negative = peewee.DecimalField(max_digits=20, decimal_places=15, null=True)
+    own = peewee.FloatField(null=True)
+    inner_positive = peewee.FloatField(null=True)
+    inner_negative = peewee.FloatField(null=True)
+    outer_positive = peewee.FloatField(null=True)
+    outer_negative = peewee.FloatField(null=True)
 
     iteration = peewee.ForeignKeyField(Iteration)
 
+    class Meta:
+        indexes = ((("iteration", "actor"), False),)
+
+
+class Mds(BaseModel):
+    """
+    The MDS (the Nash bargaining solution) of an issue in an iteration, stored during the run
+    so the results do not have to sum the actor issues
+    """
+
+    iteration = peewee.ForeignKeyField(Iteration, on_delete="CASCADE")
+    issue = peewee.ForeignKeyField(Issue, on_delete="CASCADE")
+
+    type = peewee.CharField(choices=("before", "after"), default="before")
+
+    mds = peewee.FloatField()
+
+    class Meta:
+        # covers the queries of the results, without reading the table
+        indexes = ((("iteration", "type", "issue", "mds"), True),)
+
+
+# The actor issues of every snapshot (the type and iteration), also for the repetitions that only store the
+# changed actor issues (see SQLiteObserver). A row is valid from its own snapshot until the next row of the same
+# actor issue in the repetition. The snapshots of a repetition are ordered by iteration, before comes before after.
+SNAPSHOT_VIEW = """
+CREATE VIEW IF NOT EXISTS actorissue_snapshot AS
+WITH snapshot AS (
+    SELECT i.id AS iteration_id, i.repetition_id, t.type, 2 * i.pointer + t.step AS step
+    FROM iteration i
+    CROSS JOIN (SELECT 'before' AS type, 0 AS step UNION ALL SELECT 'after', 1) t
+), change AS (
+    SELECT
+        ai.issue_id, ai.actor_id, ai.power, ai.salience, ai.position, i.repetition_id,
+        2 * i.pointer + (ai.type = 'after') AS step,
+        LEAD(2 * i.pointer + (ai.type = 'after')) OVER (
+            PARTITION BY i.repetition_id, ai.actor_id, ai.issue_id ORDER BY i.pointer, ai.type = 'after'
+        ) AS next_step
+    FROM actorissue ai
+    INNER JOIN iteration i ON ai.iteration_id = i.id
+)
+SELECT c.issue_id, c.actor_id, c.power, c.salience, c.position, s.iteration_id, s.type
+FROM change c
+INNER JOIN snapshot s ON s.repetition_id = c.repetition_id
+    AND s.step >= c.step
+    AND (c.next_step IS NULL OR s.step < c.next_step)
+"""
+
+# pragmas for the databases of the model runs. The write-ahead log lets the results read while a run writes,
+# and a normal sync is safe with a write-ahead log: a crash can only lose the last transactions.
+RUN_PRAGMAS = (("journal_mode", "wal"), ("synchronous", "normal"))
+
 
 class Manager:
     """
@@ -183,20 +245,30 @@ class Manager:
         Exchange,
         ExchangeActor,
         Externality,
+        Mds,
     ]
 
     def __init__(self, database_path):
         self.database_path = database_path
 
-    def init_database(self):
+    def init_database(self, pragmas=()):
+        """
+        :param pragmas: the pragmas of each connection, see RUN_PRAGMAS
+        """
         global connection
-        db = connect(self.database_path)
+        db = connect(self.database_path, pragmas=pragmas)
         connection.initialize(db)
 
     def create_tables(self):
-        connection.create_tables(self.tables, safe=True)
+        """
+        Create the tables of a new database, or upgrade the tables of an existing database to SCHEMA_VERSION
+        """
+        from decide.data import migrations
+
+        migrations.upgrade(connection, self.tables)
 
     def delete_tables(self):
+        connection.execute_sql("DROP VIEW IF EXISTS actorissue_snapshot")
         connection.drop_tables(self.tables)
 
     def __call__(self):
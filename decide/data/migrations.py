@@ -0,0 +1,78 @@
+"""
+Upgrades of the results database to the current schema (database.SCHEMA_VERSION).
+
+The version of a database is stored in the user_version pragma. The databases of the first schema have no version
+(0), they stored all the numbers in DECIMAL columns and had no MDS table.
+"""
+import logging
+import re
+
+from decide.data import database as db
+
+
+def schema_version(connection):
+    return connection.pragma("user_version")
+
+
+def upgrade(connection, tables):
+    """
+    Create the missing tables, indexes and views and upgrade the existing tables of an older schema
+    :param connection: the database
+    :param tables: the models of the current schema
+    """
+    existing = connection.table_exists(db.ActorIssue._meta.table_name)
+    version = schema_version(connection) if existing else db.SCHEMA_VERSION
+
+    with connection.atomic():
+        if version < 2:
+            logging.info("upgrade the database from schema version {0} to 2".format(version))
+
+            # the view refers to the tables that are replaced
+            connection.execute_sql("DROP VIEW IF EXISTS actorissue_snapshot")
+
+            real_columns(connection)
+
+        connection.create_tables(tables, safe=True)
+        connection.execute_sql(db.SNAPSHOT_VIEW)
+
+        if version < 2:
+            fill_mds(connection)
+
+        connection.pragma("user_version", db.SCHEMA_VERSION)
+
+
+def real_columns(connection):
+    """
+    Replace the tables with DECIMAL columns by tables with REAL columns. SQLite can not change the type of a
+    column, so each table is copied into a new table. The indexes are created again by create_tables.
+    """
+    cursor = connection.execute_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE '%DECIMAL%'"
+    )
+
+    for name, sql in cursor.fetchall():
+        new_name = "{0}_v2".format(name)
+
+        sql = sql.replace('CREATE TABLE "{0}"'.format(name), 'CREATE TABLE "{0}"'.format(new_name), 1)
+        sql = re.sub(r"DECIMAL\(\d+, \d+\)", "REAL", sql)
+
+        connection.execute_sql(sql)
+
+        # the REAL affinity converts the values
+        connection.execute_sql('INSERT INTO "{0}" SELECT * FROM "{1}"'.format(new_name, name))
+        connection.execute_sql('DROP TABLE "{0}"'.format(name))
+        connection.execute_sql('ALTER TABLE "{0}" RENAME TO "{1}"'.format(new_name, name))
+
+
+def fill_mds(connection):
+    """
+    Calculate the MDS of every iteration of the model runs stored before the MDS table existed
+    """
+    connection.execute_sql(
+        """
+        INSERT INTO mds (iteration_id, issue_id, type, mds)
+        SELECT iteration_id, issue_id, type, SUM(position * power * salience) / SUM(salience * power)
+        FROM actorissue_snapshot
+        GROUP BY iteration_id, issue_id, type
+        """
+    )
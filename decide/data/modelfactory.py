@@ -2,7 +2,7 @@ from typing import List, Dict
 
 from decide.data import types
 from decide.data.reader import InputDataFile
-from decide.model.base import AbstractModel
+from decide.model.base import AbstractModel, InitialExchanges
 
 
 class ModelFactory:
@@ -22,6 +22,8 @@ class ModelFactory:
         self.data_file = date_file
         self.actor_whitelist = actor_whitelist
         self.issue_whitelist = issue_whitelist
+        self.templates = {}  # dict with numeric backend, AbstractModel with the begin state
+        self.initial_exchanges = {}  # dict with (model class, numeric backend), InitialExchanges
 
     def filter_actors(self) -> Dict[str, types.PartialActor]:
 
@@ -48,8 +50,49 @@ class ModelFactory:
 
         return actor_issues
 
+    def template(self, numeric_backend="decimal") -> AbstractModel:
+        """
+        The model with the begin state of the data file, it is built once for each numeric backend.
+        The template is never calculated, create hands out copies of it.
+        """
+        if numeric_backend not in self.templates:
+            self.templates[numeric_backend] = self.build(
+                model_klass=AbstractModel, numeric_backend=numeric_backend
+            )
+
+        return self.templates[numeric_backend]
+
     def create(self, *args, model_klass=AbstractModel, **kwargs):
+        """
+        A new model with the begin state, copied from the template so the data file is only processed once
+        """
+        model = model_klass(*args, **kwargs)
+        model.copy_begin_state(self.template(model.numeric_backend))
+
+        if model.DETERMINISTIC_CANDIDATES:
+            model.initial_exchanges = self.first_round(model_klass, model.numeric_backend)
+
+        return model
+
+    def first_round(self, model_klass, numeric_backend="decimal") -> InitialExchanges:
+        """
+        The candidate exchanges of the first round, calculated once for each model class and numeric backend
+        on a model without a random component
+        """
+        key = (model_klass, numeric_backend)
+
+        if key not in self.initial_exchanges:
+            model = model_klass(numeric_backend=numeric_backend)
+            model.copy_begin_state(self.template(numeric_backend))
+
+            self.initial_exchanges[key] = InitialExchanges(model)
+
+        return self.initial_exchanges[key]
 
+    def build(self, *args, model_klass=AbstractModel, **kwargs):
+        """
+        Build a model from the filtered actors, issues and actor issues of the data file
+        """
         model = model_klass(*args, **kwargs)
 
         filtered_actors = self.filter_actors()
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+from decide.data import database as db
+from decide.data import migrations
+
+# the tables of the first schema, as created by the DecimalFields
+SCHEMA_V1 = [
+    'CREATE TABLE "dataset" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL)',
+    'CREATE TABLE "actor" ("id" INTEGER NOT NULL PRIMARY KEY, "key" VARCHAR(255) NOT NULL, '
+    '"name" VARCHAR(255) NOT NULL, "data_set_id" INTEGER NOT NULL)',
+    'CREATE TABLE "issue" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL, '
+    '"key" VARCHAR(255) NOT NULL, "lower" DECIMAL(10, 5) NOT NULL, "upper" DECIMAL(10, 5) NOT NULL, '
+    '"data_set_id" INTEGER NOT NULL)',
+    'CREATE TABLE "modelrun" ("id" INTEGER NOT NULL PRIMARY KEY, "started_at" DATETIME NOT NULL, '
+    '"finished_at" DATETIME, "p" DECIMAL(3, 2) NOT NULL, "iterations" INTEGER NOT NULL, '
+    '"repetitions" INTEGER NOT NULL, "data_set_id" INTEGER NOT NULL)',
+    'CREATE TABLE "repetition" ("id" INTEGER NOT NULL PRIMARY KEY, "pointer" INTEGER NOT NULL, '
+    '"model_run_id" INTEGER NOT NULL)',
+    'CREATE TABLE "iteration" ("id" INTEGER NOT NULL PRIMARY KEY, "pointer" INTEGER NOT NULL, '
+    '"repetition_id" INTEGER NOT NULL)',
+    'CREATE TABLE "actorissue" ("id" INTEGER NOT NULL PRIMARY KEY, "issue_id" INTEGER NOT NULL, '
+    '"actor_id" INTEGER NOT NULL, "power" DECIMAL(20, 15) NOT NULL, "position" DECIMAL(20, 15) NOT NULL, '
+    '"salience" DECIMAL(20, 15) NOT NULL, "iteration_id" INTEGER NOT NULL, "type" VARCHAR(255) NOT NULL)',
+]
+
+
+@pytest.fixture
+def restore_connection():
+    previous = db.connection.obj
+    yield
+    db.connection.initialize(previous)
+
+
+def test_upgrade(tmp_path, restore_connection):
+    path = str(tmp_path / "v1.db")
+
+    conn = sqlite3.connect(path)
+    for sql in SCHEMA_V1:
+        conn.execute(sql)
+
+    conn.execute("INSERT INTO dataset VALUES (1, 'test')")
+    conn.executemany("INSERT INTO actor VALUES (?, ?, ?, 1)", [(1, "a", "a"), (2, "b", "b")])
+    conn.execute("INSERT INTO issue VALUES (1, 'x', 'x', 0, 100, 1)")
+    conn.execute("INSERT INTO modelrun VALUES (1, '2020-01-01', NULL, 0.5, 1, 1, 1)")
+    conn.execute("INSERT INTO repetition VALUES (1, 0, 1)")
+    conn.execute("INSERT INTO iteration VALUES (1, 0, 1)")
+    conn.executemany(
+        "INSERT INTO actorissue VALUES (?, 1, ?, ?, ?, ?, 1, 'before')",
+        [(1, 1, 1.0, 20.0, 0.5), (2, 2, 0.5, 80.0, 1.0)],
+    )
+    conn.commit()
+    conn.close()
+
+    manager = db.Manager("sqlite:///" + path)
+    manager.init_database()
+    manager.create_tables()
+
+    assert migrations.schema_version(db.connection) == db.SCHEMA_VERSION
+
+    columns = {column.name: column.data_type for column in db.connection.get_columns("actorissue")}
+    assert columns["position"] == "REAL"
+
+    mds = db.Mds.get(type="before")
+    assert mds.mds == pytest.approx((20 * 0.5 + 80 * 0.5) / (0.5 + 0.5))
+
+    # the data is kept, and the upgrade runs only once
+    assert db.ActorIssue.select().count() == 2
+
+    manager.create_tables()
+
+    # the view also gives the unchanged actor issues as the after snapshot
+    assert db.Mds.select().count() == 2
@@ -92,3 +92,36 @@ def test_actor_issue_filter():
 
     assert count == len(filtered_actor_issues)
     assert isinstance(model, EqualGainModel)
+
+
+def test_copies_of_the_template():
+    data = [[types.PartialIssue.starts_with, 'Issue #1', 'Issue #1']]
+
+    for actor in ['Actor #1', 'Actor #2']:
+        data.append([types.PartialActor.starts_with, actor, actor])
+        data.append([types.ActorIssue.starts_with, actor, 'Issue #1', 100, 1, 1])
+
+    data_file = reader.InputDataFile()
+    data_file.parse_rows(data)
+    data_file.update_issues_with_positions()
+
+    factory = ModelFactory(data_file)
+
+    model_1 = factory(EqualGainModel, randomized_value=0.5)
+    model_2 = factory(EqualGainModel)
+
+    assert len(factory.templates) == 1
+    assert model_1.randomized_value == 0.5
+
+    issue = next(iter(model_1.issues))
+    actor = next(iter(model_1.actors))
+
+    # the actors and issues are shared, the values are not
+    assert issue in model_2.issues
+    assert model_1.state is not model_2.state
+
+    position = model_2.actor_issues[issue][actor].position
+    model_1.actor_issues[issue][actor].position = position + 10
+
+    assert model_2.actor_issues[issue][actor].position == position
+    assert factory.template().actor_issues[issue][actor].position == position
@@ -1,22 +1,98 @@
+import copy
+import heapq
 import logging
+import math
+import random
 from collections import defaultdict
-from decimal import Decimal
+from decimal import Context, Decimal, localcontext
+from functools import lru_cache
 from itertools import combinations
 from typing import List
 
+import numpy as np
+
+# the numeric backends: the type used for all the model calculations and the tolerance
+# under which two (expected) gains are considered equal
+NUMERIC_BACKENDS = {
+    "decimal": (Decimal, 1e-20),
+    "float": (float, 1e-10),
+}
+
+# the context of the adjusted Nash bargaining numerators: wide enough to add and subtract the products of
+# the actor issues without rounding, so a numerator that is updated in place equals the sum from scratch
+NUMERATOR_CONTEXT = Context(prec=120)
+
+
+def stream_seed(seed, repetition, p=None):
+    """
+    The seed of the random streams of a single repetition, derived from the seed of the run.
+
+    :param seed: the seed of the run, None for a stream that can not be reproduced
+    :param repetition: the index of the repetition
+    :param p: the randomized value of the model. Omit it to use the same (common) random numbers for all p-values
+    :return: str or None
+    """
+    if seed is None:
+        return None
+
+    if p is None:
+        return "{0}-{1}".format(seed, repetition)
+
+    return "{0}-{1}-{2}".format(seed, repetition, p)
+
+
+# shared, read-only value of AbstractExchange.issue_updates for an issue without updates
+NO_UPDATES = {}
+
+
+@lru_cache(maxsize=None)
+def slot_names(klass):
+    """
+    The names of the __slots__ of a class and its base classes
+    """
+    return tuple(
+        slot
+        for base_klass in klass.__mro__
+        for slot in getattr(base_klass, "__slots__", ())
+        if slot not in ("__dict__", "__weakref__")
+    )
+
+
+def copy_slots(obj):
+    """
+    Shallow copy of an object with __slots__, without calling the constructor
+    """
+    klass = type(obj)
+    copy = klass.__new__(klass)
+
+    for slot in slot_names(klass):
+        try:
+            setattr(copy, slot, getattr(obj, slot))
+        except AttributeError:
+            pass  # the slot is not assigned
+
+    if hasattr(obj, "__dict__"):
+        copy.__dict__.update(obj.__dict__)
+
+    return copy
+
 
 class Issue:
-    def __init__(self, name, lower=None, upper=None):
+    __slots__ = ("delta", "step_size", "name", "number_type", "lower", "upper", "comment")
+
+    def __init__(self, name, lower=None, upper=None, number_type=Decimal):
         """
         Refers an issue
         :param name: str
         :param lower: int
         :param upper: int
+        :param number_type: Decimal or float
         """
         self.delta = 0
         self.step_size = 0
 
         self.name = name
+        self.number_type = number_type
 
         self.lower = lower
         self.upper = upper
@@ -36,18 +112,18 @@ class Issue:
 
     def calculate_step_size(self):
         if self.delta != 0:
-            self.step_size = Decimal(100 / self.delta)
+            self.step_size = self.number_type(100 / self.delta)
         else:
             self.step_size = 0
 
     def de_normalize(self, value):
         if value == 0:
-            return self.lower
+            return self.number_type(self.lower)
 
-        return value / self.step_size + self.lower
+        return value / self.step_size + self.number_type(self.lower)
 
     def normalize(self, value):
-        return Decimal(value - self.lower) * self.step_size
+        return self.number_type(value - self.lower) * self.step_size
 
     def __str__(self):
         return self.__repr__()
@@ -87,6 +163,8 @@ class Issue:
 
 
 class Actor:
+    __slots__ = ("name", "comment", "actor_id")
+
     def __init__(self, name, actor_id=None):
         """
         Represents an Actor
@@ -101,14 +179,15 @@ class Actor:
 
     def __eq__(self, other):
 
-        from decide.data.database import Actor as ModelActor
-
+        if isinstance(other, Actor):
+            return self.actor_id == other.actor_id
         if isinstance(other, str):
             return self.actor_id == str(other)
         if isinstance(other, int):
             return self.__hash__() == other
-        if isinstance(other, Actor):
-            return self.actor_id == other.actor_id
+
+        from decide.data.database import Actor as ModelActor
+
         if isinstance(other, ModelActor):
             return self.actor_id == other.key
         if not other:
@@ -146,19 +225,25 @@ class ActorIssue:
     Represents a combination between an actor and issue
     """
 
-    def __init__(self, actor: Actor, issue: Issue, position, salience, power):
+    __slots__ = ("actor", "number_type", "power", "position", "salience", "left", "issue", "group")
+
+    def __init__(
+            self, actor: Actor, issue: Issue, position, salience, power, number_type=Decimal
+    ):
         """
         :param actor: Actor 
         :param issue: Issue
         :param position: Double
         :param salience: Double
         :param power: Double
+        :param number_type: Decimal or float
         """
 
         self.actor = actor
-        self.power = Decimal(power)
-        self.position = Decimal(position)
-        self.salience = Decimal(salience)
+        self.number_type = number_type
+        self.power = number_type(power)
+        self.position = number_type(position)
+        self.salience = number_type(salience)
         self.left = False  # left of nbs
         self.issue = issue
 
@@ -191,39 +276,419 @@ class ActorIssue:
         return self.actor < other.actor
 
 
-class DemandActorIssue(ActorIssue):
+class ActorIssueView(ActorIssue):
     """
-    Object for a demand issue, has the same properties as a ActorIssue
+    The ActorIssue of a model, the values are stored in the ModelState of the model
     """
 
+    __slots__ = ("state", "index")
+
+    def __init__(
+            self, state: "ModelState", actor: Actor, issue: Issue, position, salience, power
+    ):
+        """
+        :param state: ModelState
+        :param actor: Actor
+        :param issue: Issue
+        :param position: Double
+        :param salience: Double
+        :param power: Double
+        """
+        self.state = state
+        self.index = state.index(actor, issue)
+
+        super().__init__(actor, issue, position, salience, power, state.number_type)
+
+        self.state.present[self.index] = True
+
+    @property
+    def position(self):
+        return self.state.position.item(self.index)
+
+    @position.setter
+    def position(self, value):
+        self.state.position[self.index] = value
+
+    @property
+    def salience(self):
+        return self.state.salience.item(self.index)
+
+    @salience.setter
+    def salience(self, value):
+        self.state.salience[self.index] = value
+
+    @property
+    def power(self):
+        return self.state.power.item(self.index)
+
+    @power.setter
+    def power(self, value):
+        self.state.power[self.index] = value
+
+    @property
+    def left(self):
+        return self.state.left.item(self.index)
+
+    @left.setter
+    def left(self, value):
+        self.state.left[self.index] = value
+
+    def copy(self, state: "ModelState") -> "ActorIssueView":
+        """
+        The same actor issue on a copy of the ModelState, see ModelState.copy
+        :param state: ModelState
+        """
+        view = ActorIssueView.__new__(ActorIssueView)
+        view.actor = self.actor
+        view.issue = self.issue
+        view.number_type = self.number_type
+        view.state = state
+        view.index = self.index
+
+        return view
+
+
+class ExchangeActorIssue:
+    """
+    View on the ActorIssue of the model for an exchange actor, the values are not copied.
+    Only the position can diverge during an exchange (see AbstractExchange.invalidate_exchange_by_supply),
+    an assigned position is kept as an override and does not change the model.
+
+    The actor, issue, salience and power do not change during a round, the view holds references to
+    the objects of the model for a fast access in the calculations.
+    """
+
+    __slots__ = ("actor_issue", "override", "actor", "issue", "salience", "power")
+
     def __init__(self, actor_issue: ActorIssue):
-        super().__init__(
-            actor_issue.actor,
-            actor_issue.issue,
-            actor_issue.position,
-            actor_issue.salience,
-            actor_issue.power,
+        self.actor_issue = actor_issue
+        self.override = None  # the position of this exchange actor, when it differs from the model
+
+        self.actor = actor_issue.actor
+        self.issue = actor_issue.issue
+        self.salience = actor_issue.salience
+        self.power = actor_issue.power
+
+    @property
+    def position(self):
+        if self.override is None:
+            return self.actor_issue.position
+
+        return self.override
+
+    @position.setter
+    def position(self, value):
+        self.override = value
+
+    @property
+    def number_type(self):
+        return self.actor_issue.number_type
+
+    @property
+    def left(self):
+        return self.actor_issue.left
+
+    def copy(self, actor_issue: ActorIssue) -> "ExchangeActorIssue":
+        """
+        The same view on the actor issue of another model
+        """
+        view = copy_slots(self)
+        view.actor_issue = actor_issue
+
+        return view
+
+    def __str__(self):
+        return "{0} on {1} with x={2}, s={3}, c={4}".format(
+            self.actor.name, self.issue.name, self.position, self.salience, self.power
         )
 
-        self.actor_issue = actor_issue
 
+class DemandActorIssue(ExchangeActorIssue):
+    """
+    Object for a demand issue, has the same properties as a ActorIssue
+    """
+
+    __slots__ = ()
 
-class SupplyActorIssue(ActorIssue):
+
+class SupplyActorIssue(ExchangeActorIssue):
     """
     Object for a demand issue, has a extra voting_position (self.y)
     """
 
+    __slots__ = ("y",)
+
     def __init__(self, actor_issue: ActorIssue, y=None):
-        super().__init__(
-            actor_issue.actor,
-            actor_issue.issue,
-            actor_issue.position,
-            actor_issue.salience,
-            actor_issue.power,
-        )
+        super().__init__(actor_issue)
 
         self.y = y
-        self.actor_issue = actor_issue
+
+
+class ModelState:
+    """
+    Struct-of-arrays storage of the actor issues of a model: dense actor x issue matrices for the
+    position, salience, power and the side of the MDS (left), indexed by the integer ids of the
+    actors and issues. AbstractModel.actor_issues holds an ActorIssueView for each present cell.
+
+    The matrices hold Python objects for the decimal backend and floats for the float backend.
+    A cell without an actor issue is zero and False in present.
+    """
+
+    def __init__(self, number_type=Decimal):
+        self.number_type = number_type
+        self.dtype = float if number_type is float else object
+
+        self.actors = []  # Actor by index
+        self.issues = []  # Issue by index
+        self.actor_ids = {}  # dict with actor_id, index
+        self.issue_ids = {}  # dict with issue_id, index
+
+        # the matrices are allocated with spare capacity, only [:len(actors), :len(issues)] is used
+        self.position = self._allocate(0, 0)
+        self.salience = self._allocate(0, 0)
+        self.power = self._allocate(0, 0)
+        self.left = np.zeros((0, 0), dtype=bool)
+        self.present = np.zeros((0, 0), dtype=bool)
+
+    def copy(self) -> "ModelState":
+        """
+        A copy of the matrices, the actors and issues themselves are shared
+        """
+        state = ModelState.__new__(ModelState)
+        state.number_type = self.number_type
+        state.dtype = self.dtype
+
+        state.actors = list(self.actors)
+        state.issues = list(self.issues)
+        state.actor_ids = dict(self.actor_ids)
+        state.issue_ids = dict(self.issue_ids)
+
+        for name in ["position", "salience", "power", "left", "present"]:
+            setattr(state, name, getattr(self, name).copy())
+
+        return state
+
+    def _allocate(self, rows, columns):
+        array = np.empty((rows, columns), dtype=self.dtype)
+        array.fill(self.number_type(0))
+        return array
+
+    def _grow(self, rows, columns):
+        """
+        Make room for the given number of actors and issues, the capacity of a dimension is doubled when
+        exceeded. Only the exceeded dimension grows, so adding many actors keeps the number of issue columns.
+        """
+        capacity = self.present.shape
+
+        if rows <= capacity[0] and columns <= capacity[1]:
+            return
+
+        shape = (
+            capacity[0] if rows <= capacity[0] else max(rows, 2 * capacity[0]),
+            capacity[1] if columns <= capacity[1] else max(columns, 2 * capacity[1]),
+        )
+
+        for name in ["position", "salience", "power"]:
+            array = self._allocate(*shape)
+            array[: capacity[0], : capacity[1]] = getattr(self, name)
+            setattr(self, name, array)
+
+        for name in ["left", "present"]:
+            array = np.zeros(shape, dtype=bool)
+            array[: capacity[0], : capacity[1]] = getattr(self, name)
+            setattr(self, name, array)
+
+    def add_actor(self, actor: Actor) -> int:
+        """
+        The index of the actor, the actor is added when it is unknown
+        """
+        if actor.actor_id not in self.actor_ids:
+            self._grow(len(self.actors) + 1, len(self.issues))
+            self.actor_ids[actor.actor_id] = len(self.actors)
+            self.actors.append(actor)
+
+        return self.actor_ids[actor.actor_id]
+
+    def add_issue(self, issue: Issue) -> int:
+        """
+        The index of the issue, the issue is added when it is unknown
+        """
+        if issue.issue_id not in self.issue_ids:
+            self._grow(len(self.actors), len(self.issues) + 1)
+            self.issue_ids[issue.issue_id] = len(self.issues)
+            self.issues.append(issue)
+
+        return self.issue_ids[issue.issue_id]
+
+    def index(self, actor: Actor, issue: Issue):
+        """
+        The (actor, issue) index of the cell of the actor issue
+        """
+        return self.add_actor(actor), self.add_issue(issue)
+
+    def view(self, array):
+        """
+        The used part of one of the matrices
+        """
+        return array[: len(self.actors), : len(self.issues)]
+
+    def column_sum(self, array):
+        """
+        Sum of the present cells of each issue, in order of the actors
+        """
+        values = np.where(self.view(self.present), array, self.number_type(0))
+
+        if len(self.actors) == 0:
+            return values.sum(axis=0)
+
+        # reduce from the first actor so a sum over Decimals stays a Decimal
+        return np.add.reduce(values, axis=0)
+
+    def denominators(self):
+        """
+        :math:`\\sum_{i=1}^n C_{id} S_{id}` for each issue
+        """
+        return self.column_sum(self.view(self.salience) * self.view(self.power))
+
+    def numerators(self):
+        """
+        :math:`\\sum_{i=1}^n C_{id} S_{id} X_{id}` for each issue
+        """
+        return self.column_sum(
+            self.view(self.position) * self.view(self.salience) * self.view(self.power)
+        )
+
+    def determine_positions(self, nbs):
+        """
+        Set left for all the actor issues at once
+        :param nbs: array with the Nash bargaining solution of each issue
+        """
+        left = self.view(self.position) <= np.asarray(nbs, dtype=self.dtype)[None, :]
+        self.view(self.left)[:] = left & self.view(self.present)
+
+    def set_positions(self, actor_issues: List[ActorIssueView], positions):
+        """
+        Assign the positions to the cells of the actor issues, the last position wins
+        when an actor issue occurs more than once
+        """
+        if len(actor_issues) == 0:
+            return
+
+        rows, columns = zip(*(actor_issue.index for actor_issue in actor_issues))
+
+        self.position[list(rows), list(columns)] = np.asarray(positions, dtype=self.dtype)
+
+
+class NashBargainingState:
+    """
+    Keeps the running numerator :math:`\\sum_{i=1}^n C_{id} S_{id} X_{id}` and the cached denominator
+    :math:`\\sum_{i=1}^n C_{id} S_{id}` of a single issue.
+
+    An exchange only shifts a few actors, so the Nash bargaining solution after such a shift is calculated
+    from the difference with the current position instead of copying all the ActorIssues. The shifts are
+    added to an exact numerator in NUMERATOR_CONTEXT, so the result does not depend on the order of the
+    calculation and equals the sum over the copies calculated in that context.
+    """
+
+    def __init__(self, actor_issues, denominator=None, numerator=None):
+        """
+        :param actor_issues: dictionary with key (actor) and value (ActorIssue) of this issue
+        :param denominator: the pre-calculated denominator, calculated when omitted
+        :param numerator: the pre-calculated numerator, calculated when omitted
+        """
+        self.actor_issues = actor_issues
+
+        calculate_denominator = denominator is None
+        calculate_numerator = numerator is None
+
+        if calculate_denominator:
+            denominator = 0
+
+        if calculate_numerator:
+            numerator = 0
+
+        if calculate_denominator or calculate_numerator:
+            for actor_issue in actor_issues.values():
+                if calculate_numerator:
+                    numerator += actor_issue.position * actor_issue.salience * actor_issue.power
+
+                if calculate_denominator:
+                    denominator += actor_issue.salience * actor_issue.power
+
+        self.numerator = numerator
+        self.denominator = denominator
+
+        self.exact_numerator = None  # the numerator in NUMERATOR_CONTEXT, summed once on the first adjustment
+
+    @property
+    def nbs(self):
+        """
+        The Nash bargaining solution on the current positions
+        """
+        if self.denominator == 0:
+            return 0
+
+        return self.numerator / self.denominator
+
+    def _numerator(self, positions):
+        """
+        The numerator with the given positions instead of the current positions, only the given actors are
+        visited
+        :param positions: dictionary with key (actor) and value (position)
+        """
+        with localcontext(NUMERATOR_CONTEXT):
+            if self.exact_numerator is None:
+                self.exact_numerator = sum(
+                    actor_issue.position * actor_issue.salience * actor_issue.power
+                    for actor_issue in self.actor_issues.values()
+                )
+
+            numerator = self.exact_numerator
+
+            for key, position in positions.items():
+                actor_issue = self.actor_issues.get(key)
+
+                if actor_issue is not None:
+                    numerator += (position - actor_issue.position) * actor_issue.salience * actor_issue.power
+
+        return numerator
+
+    def adjusted_nbs(self, updates, actor, new_position):
+        """
+        The Nash bargaining solution when the positions of the updates are applied and the actor moves to new_position
+
+        :param updates: dictionary with key (actor) and value (position)
+        :param actor: the actor that is moving
+        :param new_position: the new position of the actor
+        :return: Decimal, the new nash bargaining solution
+        """
+        if self.denominator == 0:
+            return 0
+
+        positions = dict(updates)
+        positions[actor] = new_position
+
+        return self._numerator(positions) / self.denominator
+
+    def adjusted_nbs_by_position(self, updates, actor, x_pos, new_nbs):
+        """
+        The inverse of adjusted_nbs: the shift of the actor (starting at x_pos) needed to
+        move the Nash bargaining solution to new_nbs when the positions of the updates are applied.
+
+        :param updates: dictionary with key (actor) and value (position)
+        :param actor: the actor that is moving
+        :param x_pos: the position of the actor before the shift
+        :param new_nbs: the desired nash bargaining solution
+        :return: Decimal, the delta
+        """
+        positions = {actor: x_pos}
+        positions.update(updates)
+
+        actor_issue = self.actor_issues[actor]
+
+        return (new_nbs * self.denominator - self._numerator(positions)) / (
+            actor_issue.salience * actor_issue.power
+        )
 
 
 class AbstractExchangeActor:
@@ -231,6 +696,23 @@ class AbstractExchangeActor:
     Represents an exchange actor. Contains his demand and supply issues and voting-position
     """
 
+    __slots__ = (
+        "actor",
+        "supply",
+        "demand",
+        "y",
+        "start_position",
+        "eu",
+        "opposite_actor",
+        "move",
+        "moves",
+        "nbs_0",
+        "nbs_1",
+        "exchange",
+        "model",
+        "is_adjusted_by_nbs",
+    )
+
     def __init__(
             self,
             model: "AbstractModel",
@@ -279,6 +761,19 @@ class AbstractExchangeActor:
 
         self.is_adjusted_by_nbs = False
 
+    def copy(self, model: "AbstractModel", exchange: "AbstractExchange") -> "AbstractExchangeActor":
+        """
+        The same exchange actor on the actor issues of another model, see AbstractExchange.copy
+        """
+        exchange_actor = copy_slots(self)
+        exchange_actor.supply = self.supply.copy(model.actor_issues[self.supply.issue][self.actor])
+        exchange_actor.demand = self.demand.copy(model.actor_issues[self.demand.issue][self.actor])
+        exchange_actor.moves = list(self.moves)
+        exchange_actor.exchange = exchange
+        exchange_actor.model = model
+
+        return exchange_actor
+
     def is_move_valid(self, move):
 
         """
@@ -316,6 +811,7 @@ class AbstractExchangeActor:
             y=self.y,
             salience_weight=self.model.SALIENCE_WEIGHT,
             fixed_weight=self.model.FIXED_WEIGHT,
+            number_type=self.model.number_type,
         )
 
     def actor_issues(self):
@@ -332,18 +828,10 @@ class AbstractExchangeActor:
 
     def adjust_nbs(self, position):
 
-        actor_issues = self.actor_issues()
-
-        updates = self.exchange.updates[self.supply.issue]
-
-        from . import calculations  # Todo should be global import
+        updates = self.exchange.issue_updates(self.supply.issue)
 
-        return calculations.adjusted_nbs(
-            actor_issues=actor_issues,
-            updates=updates,
-            actor=self.actor,
-            new_position=position,
-            denominator=self.model.nbs_denominators[self.supply.issue],
+        return self.model.nbs_states[self.supply.issue].adjusted_nbs(
+            updates=updates, actor=self.actor, new_position=position
         )
 
     def equals_actor_demand_issue(self, other: "AbstractExchangeActor"):
@@ -415,13 +903,11 @@ class AbstractExchangeActor:
                 raise Exception("test123")
         else:
             delta = abs(
-                calculations.adjusted_nbs_by_position(
-                    actor_issues=self.actor_issues(),
-                    updates=self.exchange.updates[self.supply.issue],
+                self.model.nbs_states[self.supply.issue].adjusted_nbs_by_position(
+                    updates=self.exchange.issue_updates(self.supply.issue),
                     actor=self.actor,
                     x_pos=self.supply.position,
                     new_nbs=self.opposite_actor.demand.position,
-                    denominator=self.model.nbs_denominators[self.supply.issue],
                 )
             )
 
@@ -439,6 +925,7 @@ class AbstractExchangeActor:
                     actor_issues=self.opposite_actor.actor_issues(),
                     actor=self.opposite_actor,
                     exchange_ratio=self.exchange.dq,
+                    denominator=self.model.nbs_denominators[self.opposite_actor.supply.issue],
                 )
             )
 
@@ -525,6 +1012,21 @@ class AbstractExchange:
     An exchange between two actors and two issues. Each actor has a demand and supply issue
     """
 
+    __slots__ = (
+        "model",
+        "groups",
+        "gain",
+        "is_valid",
+        "re_calc",
+        "p",
+        "q",
+        "dp",
+        "dq",
+        "updates",
+        "i",
+        "j",
+    )
+
     actor_class = AbstractExchangeActor
 
     def __init__(self, i, j, p, q, m, groups):
@@ -552,6 +1054,7 @@ class AbstractExchange:
         self.dp = 0
         self.dq = 0
 
+        # dict with issue, {actor: position}, the positions of the demand actors shifted by realized exchanges
         self.updates = defaultdict(dict)
 
         # c.	If (1) holds, i shifts his position on issue p in the direction of j,
@@ -582,9 +1085,41 @@ class AbstractExchange:
         self.i.opposite_actor = self.j
 
     def calculate(self):
+        """
+        Calculate the gain of the exchange, including the random component of a valid exchange
+        """
+        self.calculate_gain()
+
+        if self.is_valid:
+            self.randomize()
+
+    def calculate_gain(self):
         """Method stub to be overriden"""
         raise NotImplementedError
 
+    def randomize(self):
+        """
+        Add the random component to the gain of a valid exchange, the last step of calculate.
+        The abstract exchange has no random component.
+        """
+
+    def copy(self, model: "AbstractModel") -> "AbstractExchange":
+        """
+        A copy of the calculated exchange on another model with the same actors, issues and positions
+        """
+        exchange = copy_slots(self)
+        exchange.model = model
+        exchange.updates = defaultdict(
+            dict, {issue: dict(updates) for issue, updates in self.updates.items()}
+        )
+
+        exchange.i = self.i.copy(model, exchange)
+        exchange.j = self.j.copy(model, exchange)
+        exchange.i.opposite_actor = exchange.j
+        exchange.j.opposite_actor = exchange.i
+
+        return exchange
+
     def invalidate_move(self):
         self.i.moves.pop()
         self.j.moves.pop()
@@ -632,6 +1167,12 @@ class AbstractExchange:
 
         return invalid_i or invalid_j
 
+    def issue_updates(self, issue: Issue):
+        """
+        The updated positions on the issue, without creating an (empty) entry for an issue without updates
+        """
+        return self.updates.get(issue, NO_UPDATES)
+
     def update_updates(
             self,
             exchange_actor: AbstractExchangeActor,
@@ -671,11 +1212,11 @@ class AbstractExchange:
                 self.j
         ) or exchange.j.equals_actor_demand_issue(self.i):
 
-            if exchange.i.actor in self.updates[exchange.j.demand.issue]:
+            updates = self.issue_updates(exchange.j.demand.issue)
+
+            if exchange.i.actor in updates:
                 self.update_updates(
-                    exchange.i,
-                    exchange.j.demand.issue,
-                    self.updates[exchange.j.demand.issue][exchange.i.actor],
+                    exchange.i, exchange.j.demand.issue, updates[exchange.i.actor]
                 )
             else:
                 self.updates[exchange.j.demand.issue][exchange.i.actor] = exchange.i.y
@@ -688,11 +1229,11 @@ class AbstractExchange:
                 self.j
         ) or exchange.i.equals_actor_demand_issue(self.i):
 
-            if exchange.j.actor in self.updates[exchange.i.demand.issue]:
+            updates = self.issue_updates(exchange.i.demand.issue)
+
+            if exchange.j.actor in updates:
                 self.update_updates(
-                    exchange.j,
-                    exchange.i.demand.issue,
-                    self.updates[exchange.i.demand.issue][exchange.j.actor],
+                    exchange.j, exchange.i.demand.issue, updates[exchange.j.actor]
                 )
             else:
                 self.updates[exchange.i.demand.issue][exchange.j.actor] = exchange.j.y
@@ -748,24 +1289,464 @@ class AbstractExchange:
         return self.i == other.i and self.j == other.j
 
 
+class ExchangeQueue:
+    """
+    Indexed max-heap of exchanges keyed on their gain.
+
+    The heap is lazily invalidated: an update or removal marks the old heap entry as removed
+    and the entry is discarded when it reaches the top of the heap. Iterating over the queue
+    yields the exchanges in the order they are added (or in order of gain after sort()).
+
+    When a precision is given, the gains are rounded to that number of decimals so exchanges
+    with an (almost) equal gain are popped in the order they are added.
+    """
+
+    REMOVED = None  # placeholder for a removed exchange in a heap entry
+
+    def __init__(self, exchanges=None, precision=None):
+        self.precision = precision
+        self._heap = []
+        self._entries = {}  # dict with id(exchange), [-gain, counter, sequence, exchange]
+        # plain counters instead of itertools.count, so a queue can be pickled
+        self._counter = 0  # the order of the exchanges with an equal gain
+        self._sequence = 0  # makes each heap entry unique, so exchanges are never compared
+
+        for exchange in exchanges or []:
+            self.append(exchange)
+
+    def append(self, exchange: AbstractExchange):
+        """
+        Add an exchange to the queue, an exchange that is already queued is updated instead
+        """
+        if id(exchange) in self._entries:
+            return self.update(exchange)
+
+        self._counter += 1
+        self._push(exchange, self._counter)
+
+    def update(self, exchange: AbstractExchange):
+        """
+        Update the key of the exchange after its gain has changed.
+        The exchange keeps its place between exchanges with an equal gain.
+        """
+        entry = self._entries[id(exchange)]
+
+        if entry[0] == self._key(exchange):
+            return
+
+        entry[-1] = self.REMOVED
+        self._push(exchange, entry[1])
+        self._compact()
+
+    def _push(self, exchange, counter):
+        self._sequence += 1
+        entry = [self._key(exchange), counter, self._sequence, exchange]
+        self._entries[id(exchange)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, exchange: AbstractExchange):
+        """
+        Remove the exchange from the queue
+        """
+        entry = self._entries.pop(id(exchange))
+        entry[-1] = self.REMOVED
+        self._compact()
+
+    def pop(self) -> AbstractExchange:
+        """
+        Remove and return the exchange with the highest gain
+        """
+        self._discard_removed()
+
+        if not self._heap:
+            raise IndexError("pop from an empty exchange queue")
+
+        exchange = heapq.heappop(self._heap)[-1]
+        del self._entries[id(exchange)]
+
+        return exchange
+
+    def peek(self) -> AbstractExchange:
+        """
+        Return the exchange with the highest gain without removing it
+        """
+        self._discard_removed()
+
+        if not self._heap:
+            raise IndexError("peek in an empty exchange queue")
+
+        return self._heap[0][-1]
+
+    def sort(self):
+        """
+        Order the iteration over the queue by gain, highest first
+        """
+        entries = sorted(self._entries.values(), key=lambda entry: entry[:2])
+        self._entries = {id(entry[-1]): entry for entry in entries}
+
+    def clear(self):
+        self._heap.clear()
+        self._entries.clear()
+
+    def __setstate__(self, state):
+        # the entries are keyed by id(), which changes when a queue is unpickled
+        self.__dict__.update(state)
+        self._entries = {id(entry[-1]): entry for entry in self._entries.values()}
+
+    def _key(self, exchange):
+        if self.precision is None:
+            return -exchange.gain
+
+        return -round(exchange.gain, self.precision)
+
+    def _compact(self):
+        # rebuild the heap when it holds more removed entries than exchanges
+        if len(self._heap) > 2 * len(self._entries) + 32:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][-1] is self.REMOVED:
+            heapq.heappop(self._heap)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (entry[-1] for entry in list(self._entries.values()))
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __contains__(self, exchange):
+        return id(exchange) in self._entries
+
+
+class ActorIssueArrays:
+    """
+    Snapshot of the positions, saliences and powers of all the actor issues as actor x issue
+    arrays of floats, used to classify and filter the exchanges of many actors at once.
+    An actor without a position on an issue is NaN in the value arrays and False in present.
+
+    Most actors of a large data set have a position on a few issues only. The actors of each issue are kept
+    as a sorted index, so the groups of an issue combination only visit the actors present on both issues.
+    """
+
+    def __init__(self, model: "AbstractModel"):
+        state = model.state
+
+        self.actors = list(state.actors)
+        self.issues = list(state.issues)
+        self.issue_index = {issue: index for index, issue in enumerate(self.issues)}
+
+        self.present = state.view(state.present).copy()
+        self.left = state.view(state.left).copy()
+
+        # the indices of the actors present on each issue
+        self.issue_actors = [np.flatnonzero(column) for column in self.present.T]
+
+        self.position = self._floats(state, state.position)
+        self.salience = self._floats(state, state.salience)
+        self.power = self._floats(state, state.power)
+
+        # the cached denominators of the nash bargaining solution, sum(c * s)
+        self.denominator = np.array(
+            [float(model.nbs_denominators.get(issue, np.nan)) for issue in self.issues]
+        )
+
+    def _floats(self, state: ModelState, array):
+        """
+        The present cells as floats, only these cells are converted
+        """
+        values = np.full(self.present.shape, np.nan)
+        values[self.present] = state.view(array)[self.present].astype(float)
+        return values
+
+    def groups(self, p: Issue, q: Issue):
+        """
+        The indices of the actors in group A, B, C and D for the issue combination p, q
+        :param p: Issue
+        :param q: Issue
+        :return: list with four arrays of actor indices
+        """
+        p, q = self.issue_index[p], self.issue_index[q]
+
+        actors = np.intersect1d(self.issue_actors[p], self.issue_actors[q], assume_unique=True)
+
+        # A = 00 = 0, B = 01 = 1, C = 10 = 2, D = 11 = 3
+        group = self.left[actors, p] | (self.left[actors, q].astype(int) << 1)
+
+        return [actors[group == n] for n in range(4)]
+
+
+class InitialExchanges:
+    """
+    The candidate exchanges of the first round, calculated once and copied into every repetition.
+
+    All the repetitions of a data file start from the same positions. Until the random components are
+    added, the first round of each repetition gives the same groups and candidate exchanges.
+    """
+
+    def __init__(self, model: "AbstractModel"):
+        """
+        :param model: a model in its begin state without a random component, it is calculated here
+        """
+        model.calc_nbs()
+        model.determine_positions()
+        model.calc_combinations()
+        model.determine_groups_and_calculate_exchanges()
+
+        self.state = model.state
+        self.keys = self.actor_issue_keys(model)
+        self.groups = model.groups
+        self.exchanges = list(model.exchanges)  # in the order they are created
+
+        # the same exchanges as AbstractModel.candidates, for the incremental calculation of the second round
+        self.candidates = defaultdict(list)
+
+        for exchange in self.exchanges:
+            self.candidates[(exchange.p, exchange.q, exchange.groups[0])].append(exchange)
+
+        # tuples with issue, actor and the group the actor issue is assigned to
+        self.actor_issue_groups = [
+            (issue, actor, actor_issue.group)
+            for issue, actor_issues in model.actor_issues.items()
+            for actor, actor_issue in actor_issues.items()
+            if hasattr(actor_issue, "group")
+        ]
+
+    def matches(self, model: "AbstractModel"):
+        """
+        True when the model has the same actor issues and values as the model of the initial exchanges
+        """
+        state = model.state
+
+        if self.actor_issue_keys(model) != self.keys:
+            return False
+
+        if state.actor_ids != self.state.actor_ids or state.issue_ids != self.state.issue_ids:
+            return False
+
+        return all(
+            np.array_equal(state.view(getattr(state, name)), self.state.view(getattr(self.state, name)))
+            for name in ["present", "position", "salience", "power"]
+        )
+
+    @staticmethod
+    def actor_issue_keys(model: "AbstractModel"):
+        """
+        The issues of the model with the actors of each issue
+        """
+        return list(model.issues), [
+            (issue, list(actor_issues)) for issue, actor_issues in model.actor_issues.items()
+        ]
+
+    def apply(self, model: "AbstractModel"):
+        """
+        Copy the exchanges into the model and add their random components, in the order they are created
+        """
+        model.exchange_index.clear()
+        model.groups = dict(self.groups)
+
+        for issue, actor, group in self.actor_issue_groups:
+            model.actor_issues[issue][actor].group = group
+
+        for exchange in self.exchanges:
+            model.add_copied_exchange(exchange)
+
+        model.candidates = dict(self.candidates)
+        model.candidate_positions = self.state.view(self.state.position).copy()
+
+
 class AbstractModel:
     SALIENCE_WEIGHT = 0.4
     FIXED_WEIGHT = 0.1
     VERBOSE = True  # verbose messages for debugging
+    # the candidate exchanges do not depend on random draws, until their random component is added. The candidates
+    # of the first round are copied from InitialExchanges, those of later rounds are kept for unchanged issues
+    DETERMINISTIC_CANDIDATES = False
+
+    def __init__(self, *args, numeric_backend="decimal", seed=None, **kwargs):
+        """
+        :param numeric_backend: "decimal" (the reference) or "float", see NUMERIC_BACKENDS
+        :param seed: the seed of the random streams of this model, see stream_seed
+        """
+        if numeric_backend not in NUMERIC_BACKENDS:
+            raise ValueError(
+                "Unknown numeric backend '{0}', choose from {1}".format(
+                    numeric_backend, ", ".join(NUMERIC_BACKENDS)
+                )
+            )
+
+        self.numeric_backend = numeric_backend
+        self.number_type, self.tolerance = NUMERIC_BACKENDS[numeric_backend]
 
-    def __init__(self, *args, **kwargs):
         self.issues = {}
-        self.actor_issues = defaultdict(dict)
+        self.state = ModelState(self.number_type)
+        self.actor_issues = defaultdict(dict)  # dict with issue, actor, ActorIssueView on self.state
         self.actors = {}
-        self.exchanges: List[AbstractExchange] = []
+        self.exchanges = ExchangeQueue(precision=round(-math.log10(self.tolerance)))
+        # dict with (actor_id, issue_id), the exchanges where the actor supplies or demands the issue
+        self.exchange_index = defaultdict(dict)
         self.nbs = {}
         self.issue_combinations = []
         self.groups = {}
         self.moves = {}  # dict with issue,actor[move_1,move_2,move_3]
         self.nbs_denominators = {}
+        self.nbs_states = {}  # dict with issue, NashBargainingState
         self.data_set_name = ""
         self.model_name = "abstract"
         self.tie_count = 0
+        self.initial_exchanges = None  # InitialExchanges for the first round, see ModelFactory
+        # dict with (p, q, group of i), the candidate exchanges of the last round before their random component
+        self.candidates = None
+        self.candidate_positions = None  # the positions of the actor issues when the candidates were calculated
+
+        # separate streams for the tie breaks and the exchanges, so the tie breaks of models with
+        # and without a randomized value stay in step on common random numbers
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.exchange_random = random.Random(None if seed is None else "{0}-exchanges".format(seed))
+        self.random_start = self.random_state()  # see is_deterministic
+
+    def __getstate__(self):
+        # the candidate caches are not pickled, without them the candidates are calculated again
+        state = self.__dict__.copy()
+        state["initial_exchanges"] = None
+        state["candidates"] = None
+        state["candidate_positions"] = None
+
+        return state
+
+    def record_state(self):
+        """
+        The state of the model in the records of an EventRecorder. The observers read the positions, the NBS and
+        the groups, the candidate exchanges are left out.
+        """
+        state = self.__getstate__()
+        state["exchanges"] = ExchangeQueue(precision=self.exchanges.precision)
+        state["exchange_index"] = defaultdict(dict)
+
+        return state
+
+    def __setstate__(self, state):
+        # the exchange index is keyed by id(), which changes when a model is unpickled
+        self.__dict__.update(state)
+
+        for key, exchanges in self.exchange_index.items():
+            self.exchange_index[key] = {
+                id(exchange): exchange for exchange in exchanges.values()
+            }
+
+    def issue_components(self) -> List[List[Issue]]:
+        """
+        Split the issues in groups that share no actors. An exchange needs both actors on both issues,
+        so the exchanges of one group never change the positions, NBS or exchanges of another group.
+        :return: list with the issues of each group, in the order of the issues of the model
+        """
+        parent = {issue: issue for issue in self.issues}
+
+        def find(issue):
+            while parent[issue] is not issue:
+                parent[issue] = parent[parent[issue]]
+                issue = parent[issue]
+
+            return issue
+
+        actor_issues = defaultdict(list)  # dict with actor, the issues of the actor
+
+        for issue, actors in self.actor_issues.items():
+            if issue not in parent:
+                continue
+
+            for actor in actors:
+                actor_issues[actor].append(self.issues[issue])
+
+        for issues in actor_issues.values():
+            root = find(issues[0])
+
+            for issue in issues[1:]:
+                parent[find(issue)] = root
+
+        components = defaultdict(list)
+
+        for issue in self.issues:
+            components[find(issue)].append(issue)
+
+        return list(components.values())
+
+    def sub_model(self, issues: List[Issue], seed=None) -> "AbstractModel":
+        """
+        A model with the same settings and the current actor issues of the given issues only, see issue_components
+        :param seed: the seed of the random streams of the sub model
+        """
+        model = copy.copy(self)  # keeps the settings of the subclass, such as the randomized value
+        AbstractModel.__init__(model, numeric_backend=self.numeric_backend, seed=seed)
+
+        model.model_name = self.model_name
+        model.data_set_name = self.data_set_name
+
+        for issue in issues:
+            model.issues[issue] = issue
+            model.state.add_issue(issue)
+
+            for actor, actor_issue in self.actor_issues[issue].items():
+                model.actors[actor] = actor
+
+                model.actor_issues[issue][actor] = ActorIssueView(
+                    model.state,
+                    actor,
+                    issue,
+                    actor_issue.position,
+                    actor_issue.salience,
+                    actor_issue.power,
+                )
+
+        return model
+
+    def random_state(self):
+        """
+        Fingerprint of the state of both random streams
+        """
+        return hash((self.random.getstate(), self.exchange_random.getstate()))
+
+    def is_deterministic(self):
+        """
+        True when the model did not draw a random number yet, there was no tie break and no random component.
+        Another repetition of such a model gives exactly the same results.
+        """
+        return self.random_state() == self.random_start
+
+    def draws_for_exchanges(self):
+        """
+        True when the calculation of the exchanges draws random numbers, apart from the tie breaks
+        """
+        return True
+
+    def copy_begin_state(self, template: "AbstractModel"):
+        """
+        Take over the actors, issues and actor issues of a template model that is not calculated yet.
+        The Actor and Issue objects do not change during a run and are shared with the template,
+        the values of the actor issues are copied.
+        :param template: AbstractModel with the same numeric backend
+        """
+        if template.numeric_backend != self.numeric_backend:
+            raise ValueError(
+                "The template has the numeric backend '{0}' instead of '{1}'".format(
+                    template.numeric_backend, self.numeric_backend
+                )
+            )
+
+        self.actors = dict(template.actors)
+        self.issues = dict(template.issues)
+        self.state = template.state.copy()
+
+        self.actor_issues = defaultdict(dict)
+
+        for issue, actor_issues in template.actor_issues.items():
+            self.actor_issues[issue] = {
+                actor: actor_issue.copy(self.state) for actor, actor_issue in actor_issues.items()
+            }
 
     def get_actor_issue(self, actor: Actor, issue: Issue):
         """
@@ -812,6 +1793,7 @@ class AbstractModel:
         actor = Actor(actor_name, actor_id)
         actor.comment = comment
         self.actors[actor] = actor
+        self.state.add_actor(actor)
         return actor
 
     def add_issue(self, issue_name, issue_id=None, comment="") -> Issue:
@@ -821,9 +1803,10 @@ class AbstractModel:
         :param issue_id:
         :param issue_name:
         """
-        issue = Issue(issue_name)
+        issue = Issue(issue_name, number_type=self.number_type)
         issue.comment = comment
         self.issues[issue] = issue
+        self.state.add_issue(issue)
         return issue
 
     def add_actor_issue(self, actor, issue, position, salience, power):
@@ -860,13 +1843,13 @@ class AbstractModel:
         issue.calculate_step_size()
         normalized_position = issue.normalize(position)
 
-        self.actor_issues[issue][actor] = ActorIssue(
-            actor, issue, normalized_position, salience, power
+        self.actor_issues[issue][actor] = ActorIssueView(
+            self.state, actor, issue, normalized_position, salience, power
         )
 
         return self.actor_issues[issue][actor]
 
-    def add_exchange(self, i, j, p, q, groups):
+    def add_exchange(self, i, j, p, q, groups, candidates=None):
         """
         Add an exchange pair to the model
         :param i:
@@ -874,15 +1857,76 @@ class AbstractModel:
         :param p:
         :param q:
         :param groups:
+        :param candidates: list for a copy of the exchange before its random component is added
         :return:
         """
         e = self.new_exchange_factory(i, j, p, q, self, groups)
-        e.calculate()
-        self.eui.append(e.i.eu)
-        self.exchanges.append(e)
+
+        if candidates is None:
+            e.calculate()
+        else:
+            e.calculate_gain()
+
+            if e.is_valid:
+                candidates.append(e.copy(self))
+                e.randomize()
+
+        # an invalid exchange is never recalculated, so there is no need to keep it as candidate
+        if e.is_valid:
+            self.exchanges.append(e)
+            self.index_exchange(e)
+
         return e
 
-    eui = []
+    def add_copied_exchange(self, exchange: AbstractExchange):
+        """
+        Add a copy of a candidate exchange without its random component, see candidates
+        """
+        exchange = exchange.copy(self)
+        exchange.randomize()
+
+        if exchange.is_valid:
+            self.exchanges.append(exchange)
+            self.index_exchange(exchange)
+
+        return exchange
+
+    @staticmethod
+    def exchange_index_keys(exchange: AbstractExchange):
+        """
+        The (actor_id, issue_id) pairs of both actors on both issues of the exchange
+        """
+        return [
+            (exchange_actor.actor.actor_id, issue.issue_id)
+            for exchange_actor in (exchange.i, exchange.j)
+            for issue in (exchange_actor.supply.issue, exchange_actor.demand.issue)
+        ]
+
+    def index_exchange(self, exchange: AbstractExchange):
+        """
+        Register the exchange under the actor-issues it supplies or demands
+        """
+        for key in self.exchange_index_keys(exchange):
+            self.exchange_index[key][id(exchange)] = exchange
+
+    def unindex_exchange(self, exchange: AbstractExchange):
+        """
+        Remove the exchange from the index
+        """
+        for key in self.exchange_index_keys(exchange):
+            self.exchange_index[key].pop(id(exchange), None)
+
+    def affected_exchanges(self, exchange: AbstractExchange) -> List[AbstractExchange]:
+        """
+        The exchanges that share an actor-issue with the given exchange,
+        only these exchanges can be influenced by realizing the exchange
+        """
+        affected = {}
+
+        for key in self.exchange_index_keys(exchange):
+            affected.update(self.exchange_index[key])
+
+        return list(affected.values())
 
     def calc_nbs(self):
         from . import calculations
@@ -890,105 +1934,208 @@ class AbstractModel:
         """
         Calculate the nash bargaining solution for all the issue
         """
+        denominators = self.state.denominators()
+        numerators = self.state.numerators()
+
         for issue, actor_issues in self.actor_issues.items():
-            self.nbs_denominators[issue] = calculations.calc_nbs_denominator(
-                actor_issues
-            )
+            column = self.state.issue_ids.get(getattr(issue, "issue_id", None))
 
-            nbs = calculations.nash_bargaining_solution(
-                actor_issues, self.nbs_denominators[issue]
-            )
-            self.nbs[issue] = nbs
+            if column is None:
+                self.nbs_denominators[issue] = calculations.calc_nbs_denominator(
+                    actor_issues
+                )
+                state = NashBargainingState(actor_issues, self.nbs_denominators[issue])
+            else:
+                self.nbs_denominators[issue] = denominators.item(column)
+                state = NashBargainingState(
+                    actor_issues, denominators.item(column), numerators.item(column)
+                )
+
+            self.nbs_states[issue] = state
+            self.nbs[issue] = state.nbs
 
     def determine_positions(self):
         """
         Determine if the position of an actor is left or right of the Nash Bargaining Solution on an issue
         """
-        for issue_name, issue_nbs in self.nbs.items():
-            for actor_issue in self.actor_issues[issue_name].values():
-                actor_issue.is_left_to_nbs(issue_nbs)
+        self.state.determine_positions(
+            [self.nbs.get(issue, 0) for issue in self.state.issues]
+        )
 
     def calc_combinations(self):
         """
         Create a list of all possible combinations for the issues
         """
-        self.issue_combinations = combinations(self.issues, 2)
+        self.issue_combinations = list(combinations(self.issues, 2))
 
     def determine_groups_and_calculate_exchanges(self):
         """
         There are 4 groups: A, B, C, and D.
         An actor is member of group A if his position on both issues is left of the MDS.
         Each actor of group A can exchange with the actors of Group D, the actors of B with C.
+
+        The first time, the InitialExchanges of the model are copied instead when the positions match.
+        In a later round, the candidates of a combination of two issues without changed positions are copied
+        from the last round (see changed_issues). The random components are added in the same order
+        as when all the candidates are calculated.
         """
-        for combination in self.issue_combinations:
+        initial_exchanges, self.initial_exchanges = self.initial_exchanges, None
 
-            pos = [[], [], [], []]
+        if initial_exchanges is not None and initial_exchanges.matches(self):
+            initial_exchanges.apply(self)
+            return
 
-            for k, actor in self.actors.items():
+        self.exchange_index.clear()
 
-                a0 = self.get_actor_issue(actor=actor, issue=combination[0])
-                a1 = self.get_actor_issue(actor=actor, issue=combination[1])
+        arrays = ActorIssueArrays(self)
 
-                # some magic happens here: we have four possibilities and two bytes, so
-                # A = 00 = 0
-                # B = 01 = 1
-                # C = 10 = 2
-                # D = 11 = 3
+        changed = self.changed_issues()
+        candidates = self.candidates if changed is not None else None
 
-                if a0 is not False and a1 is not False:
-                    position = a0.left | a1.left * 2
-                    pos[position].append(actor)
+        # keep the candidates of this round only when the last round left an issue unchanged,
+        # when all the issues keep changing the copies are never used
+        self.candidates = None
+        self.candidate_positions = None
+
+        if self.DETERMINISTIC_CANDIDATES:
+            self.candidate_positions = self.state.view(self.state.position).copy()
+
+            if changed is not None and len(changed) < len(self.issues):
+                self.candidates = {}
+
+        for combination in self.issue_combinations:
+
+            pos = arrays.groups(combination[0], combination[1])
 
             combination_id = "{0}-{1}".format(combination[0], combination[1])
 
             self.groups[combination_id] = {
-                "a": pos[0],
-                "b": pos[1],
-                "c": pos[2],
-                "d": pos[3],
+                key: [arrays.actors[n] for n in group]
+                for key, group in zip(["a", "b", "c", "d"], pos)
             }
 
-            # all actors of group A and D
-            for i in pos[0]:
-                for j in pos[3]:
-                    self.add_exchange(
-                        i, j, combination[0], combination[1], groups=["a", "d"]
-                    )
+            unchanged = (
+                candidates is not None
+                and combination[0] not in changed
+                and combination[1] not in changed
+            )
 
-                    self.actor_issues[combination[0]][i].group = "a"
-                    self.actor_issues[combination[1]][j].group = "d"
+            # all actors of group A and D
+            self.add_exchanges(
+                arrays,
+                pos[0],
+                pos[3],
+                combination,
+                groups=["a", "d"],
+                candidates=candidates.get(combination + ("a",)) if unchanged else None,
+            )
 
             # all actors of group B and C
-            for i in pos[1]:
-                for j in pos[2]:
-                    self.add_exchange(
-                        i, j, combination[0], combination[1], groups=["b", "c"]
-                    )
-                    self.actor_issues[combination[0]][i].group = "b"
-                    self.actor_issues[combination[1]][j].group = "c"
+            self.add_exchanges(
+                arrays,
+                pos[1],
+                pos[2],
+                combination,
+                groups=["b", "c"],
+                candidates=candidates.get(combination + ("b",)) if unchanged else None,
+            )
+
+    def changed_issues(self):
+        """
+        The issues with a changed position since the candidates of the last round were calculated
+        :return: set of issues, None when there is no last round to compare with
+        """
+        if self.candidate_positions is None:
+            return None
+
+        positions = self.state.view(self.state.position)
+
+        if positions.shape != self.candidate_positions.shape:
+            return None
+
+        columns = np.nonzero((positions != self.candidate_positions).any(axis=0))[0]
+
+        return {self.state.issues[column] for column in columns}
+
+    def add_exchanges(
+            self, arrays: ActorIssueArrays, group_i, group_j, combination, groups, candidates=None
+    ):
+        """
+        Add the exchanges between all the actors of group_i and group_j on the issue combination.
+        Only the pairs that pass viable_exchanges are created and calculated.
+        :param arrays: ActorIssueArrays
+        :param group_i: array with the actor indices of the first group
+        :param group_j: array with the actor indices of the second group
+        :param combination: tuple with the issues p and q
+        :param groups: the names of both groups
+        :param candidates: the candidates of the last round for these issues and groups, they are copied
+            instead of calculated
+        """
+        if len(group_i) == 0 or len(group_j) == 0:
+            return
+
+        p, q = combination
+
+        for i in group_i:
+            self.actor_issues[p][arrays.actors[i]].group = groups[0]
+
+        for j in group_j:
+            self.actor_issues[q][arrays.actors[j]].group = groups[1]
+
+        if candidates is not None:
+            for exchange in candidates:
+                self.add_copied_exchange(exchange)
+        else:
+            viable = self.viable_exchanges(arrays, group_i, group_j, p, q)
+
+            # the candidates are kept without their random component when self.candidates is a dict
+            candidates = [] if self.candidates is not None else None
+
+            for n, m in zip(*np.nonzero(viable)):
+                self.add_exchange(
+                    arrays.actors[group_i[n]],
+                    arrays.actors[group_j[m]],
+                    p,
+                    q,
+                    groups=groups,
+                    candidates=candidates,
+                )
+
+        if self.candidates is not None:
+            self.candidates[(p, q, groups[0])] = candidates
+
+    def viable_exchanges(self, arrays: ActorIssueArrays, group_i, group_j, p, q):
+        """
+        Boolean array of len(group_i) x len(group_j), False for a pair of actors that certainly
+        results in an invalid exchange and can be skipped. The abstract model keeps all pairs.
+        """
+        return np.ones((len(group_i), len(group_j)), dtype=bool)
 
     def remove_invalid_exchanges(self, res):
         """
-        Removes all the invalid exchanges from the exchanges list and return them
-        :param res: a list of exchanges
-        :return: a list with online valid exchanges
+        Recalculates the exchanges that share an actor-issue with the realized exchange.
+        Removes the invalid exchanges from the exchanges queue and return them
+        :param res: the realized exchange
+        :return: a list with the exchanges that became invalid
         """
-        length = len(self.exchanges)
+        self.unindex_exchange(res)
 
-        valid_exchanges = []
         invalid_exchanges = []
 
-        for i in range(length):
+        for exchange in self.affected_exchanges(res):
+
+            if exchange not in self.exchanges:
+                continue
 
-            if self.exchanges[i].is_valid:
-                self.exchanges[i].recalculate(res)
+            exchange.recalculate(res)
 
-                if self.exchanges[i].is_valid:
-                    valid_exchanges.append(self.exchanges[i])
-                else:
-                    invalid_exchanges.append(self.exchanges[i])
+            if exchange.is_valid:
+                self.exchanges.update(exchange)
+            else:
+                self.exchanges.remove(exchange)
+                self.unindex_exchange(exchange)
 
-        self.exchanges = valid_exchanges
+                invalid_exchanges.append(exchange)
 
         return invalid_exchanges
 
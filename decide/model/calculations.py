@@ -1,6 +1,7 @@
-import copy
 import decimal
 
+import numpy as np
+
 from decide.model import base
 
 
@@ -73,20 +74,9 @@ def adjusted_nbs(actor_issues, updates, actor, new_position, denominator):
     :param denominator: Decimal, the cached denominator
     :return: Decimal, the new nash bargaining solution
     """
-    copy_ai = {}
-
-    for k, v in actor_issues.items():
-        copy_ai[v.actor] = base.ActorIssue(
-            v.actor, v.issue, position=v.position, power=v.power, salience=v.salience
-        )
-
-    for key, value in updates.items():
-        if key in copy_ai:  # TODO: this should not be possible
-            copy_ai[key].position = value
+    state = base.NashBargainingState(actor_issues, denominator)
 
-    copy_ai[actor].position = new_position
-
-    return nash_bargaining_solution(copy_ai, denominator)
+    return state.adjusted_nbs(updates, actor, new_position)
 
 
 def adjusted_nbs_by_position(actor_issues, updates, actor, x_pos, new_nbs, denominator):
@@ -100,29 +90,14 @@ def adjusted_nbs_by_position(actor_issues, updates, actor, x_pos, new_nbs, denom
     :param denominator:
     :return:
     """
+    state = base.NashBargainingState(actor_issues, denominator)
 
-    copy_ai = copy.deepcopy(actor_issues)
-
-    # to be calculate:
-    copy_ai[actor].position = x_pos
-
-    for key, value in updates.items():
-        copy_ai[key].position = value
-
-    nominator = 0
-
-    for key, value in copy_ai.items():
-        if key is not actor:
-            nominator += value.position * value.salience * value.power
+    return state.adjusted_nbs_by_position(updates, actor, x_pos, new_nbs)
 
-    left = (new_nbs * denominator) - nominator
 
-    right = left / (copy_ai[actor].salience * copy_ai[actor].power)
-
-    return right
-
-
-def reverse_move(actor_issues, actor: base.AbstractExchangeActor, exchange_ratio):
+def reverse_move(
+    actor_issues, actor: base.AbstractExchangeActor, exchange_ratio, denominator=None
+):
     """
     The move/shift is unknown and calculated by this method.
     It results the absolute delta/move.
@@ -132,9 +107,13 @@ def reverse_move(actor_issues, actor: base.AbstractExchangeActor, exchange_ratio
     :param actor_issues:
     :param actor:
     :param exchange_ratio:
+    :param denominator: the cached SUM[c * s], calculated from the actor_issues when omitted
     :return:
     """
-    return (exchange_ratio * sum_salience_power(actor_issues)) / (
+    if denominator is None:
+        denominator = sum_salience_power(actor_issues)
+
+    return (exchange_ratio * denominator) / (
         actor.supply.power * actor.supply.salience
     )
 
@@ -160,11 +139,12 @@ def by_exchange_ratio(supply_actor: base.AbstractExchangeActor, supply_exchange_
     return ((si_supply + sj_supply) / (sip + sjp)) * supply_exchange_ratio
 
 
-def by_absolute_move(actor_issues, s_actor: base.AbstractExchangeActor):
+def by_absolute_move(actor_issues, s_actor: base.AbstractExchangeActor, denominator=None):
     """
 
     :param actor_issues:
     :param s_actor:
+    :param denominator: the cached SUM[c * s], calculated from the actor_issues when omitted
     :return:
     """
     d_actor = s_actor.opposite_actor
@@ -175,7 +155,10 @@ def by_absolute_move(actor_issues, s_actor: base.AbstractExchangeActor):
     sjp = s_actor.supply.salience
     cjp = s_actor.supply.power
 
-    sum_sc = sum_salience_power(actor_issues)
+    if denominator is None:
+        sum_sc = sum_salience_power(actor_issues)
+    else:
+        sum_sc = denominator
 
     dp = (abs(xip - xjp) * sjp * cjp) / sum_sc
 
@@ -273,6 +256,35 @@ def actor_externalities(
     return 0
 
 
+def externalities(model_ref: base.AbstractModel, realized: base.AbstractExchange):
+    """
+    The externalities of an exchange for all the actors at once, the same calculation as actor_externalities.
+    Only the actors with a position on both issues have an externality.
+
+    :param model_ref: model
+    :param realized: realized exchange
+    :return: array with the indices of the actors in model_ref.state and array with their externalities
+    """
+    state = model_ref.state
+
+    p = state.issue_ids[realized.j.supply.issue.issue_id]
+    q = state.issue_ids[realized.i.supply.issue.issue_id]
+
+    present = state.view(state.present)
+    actors = np.flatnonzero(present[:, p] & present[:, q])
+
+    position = state.view(state.position)
+    salience = state.view(state.salience)
+
+    xp, sp = position[actors, p], salience[actors, p]
+    xq, sq = position[actors, q], salience[actors, q]
+
+    l = abs(realized.j.nbs_0 - xp) - abs(realized.j.nbs_1 - xp)
+    r = abs(realized.i.nbs_0 - xq) - abs(realized.i.nbs_1 - xq)
+
+    return actors, l * sp + r * sq
+
+
 def position_by_nbs(actor_issues, exchange_actor, nbs, denominator):
     """
     For the Random Rate implementation the position is need to be calculated where a MDS is given.
@@ -320,11 +332,53 @@ def exchange_ratio_by_expected_utility(delta_q, sq, sp, utility=0):
     return (utility + (delta_q * sq)) / sp
 
 
-def new_start_position(salience, x, y, salience_weight=0.4, fixed_weight=0.1):
-    sw = decimal.Decimal(salience_weight)
-    fw = decimal.Decimal(fixed_weight)
+def new_start_position(
+    salience, x, y, salience_weight=0.4, fixed_weight=0.1, number_type=decimal.Decimal
+):
+    sw = number_type(salience_weight)
+    fw = number_type(fixed_weight)
     swv = (1 - salience) * sw * y
     fwv = fw * y
     pv = (1 - (1 - salience) * sw - fw) * x
 
     return swv + fwv + pv
+
+
+class RunningStatistics:
+    """
+    Online mean and variance (Welford's algorithm), the values do not need to be stored
+    """
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # the sum of the squared differences from the mean
+
+    def add(self, value):
+        self.count += 1
+
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """
+        The sample variance, 0 with less than two values
+        """
+        if self.count < 2:
+            return 0.0
+
+        return self.m2 / (self.count - 1)
+
+    def half_width(self, z=1.96):
+        """
+        The half-width of the confidence interval of the mean, infinite with less than two values
+        :param z: the quantile of the normal distribution, 1.96 for a 95% interval
+        """
+        if self.count < 2:
+            return float("inf")
+
+        return z * (self.variance / self.count) ** 0.5
@@ -1,8 +1,6 @@
-import decimal
 import logging
-import random
-from operator import attrgetter
-from typing import List
+
+import numpy as np
 
 from decide.model import base, calculations
 
@@ -12,6 +10,8 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
     AbstractExchangeActor is the same actor...
     """
 
+    __slots__ = ("equal_gain_voting", "z", "u", "v", "eu_max")
+
     def __init__(
         self,
         model: "EqualGainModel",
@@ -77,6 +77,7 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
             actor_issues=self.opposite_actor.actor_issues(),
             actor=self.opposite_actor,
             exchange_ratio=exchange_ratio_p,
+            denominator=self.model.nbs_denominators[self.opposite_actor.supply.issue],
         )
 
         euj = abs(
@@ -103,7 +104,10 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
 
             move_j = delta_x_j_supply
             move_i = calculations.reverse_move(
-                self.actor_issues(), self, exchange_ratio_q
+                self.actor_issues(),
+                self,
+                exchange_ratio_q,
+                self.model.nbs_denominators[self.supply.issue],
             )
 
             if abs(move_i) < abs(
@@ -145,17 +149,15 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
                 else:
 
                     delta = abs(
-                        calculations.adjusted_nbs_by_position(
-                            actor_issues=self.opposite_actor.actor_issues(),
-                            updates=self.opposite_actor.exchange.updates[
+                        self.model.nbs_states[
+                            self.opposite_actor.supply.issue
+                        ].adjusted_nbs_by_position(
+                            updates=self.opposite_actor.exchange.issue_updates(
                                 self.opposite_actor.supply.issue
-                            ],
+                            ),
                             actor=self.opposite_actor.actor,
                             x_pos=self.opposite_actor.supply.position,
                             new_nbs=self.demand.position,
-                            denominator=self.model.nbs_denominators[
-                                self.opposite_actor.supply.issue
-                            ],
                         )
                     )
 
@@ -177,6 +179,7 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
                         actor_issues=self.actor_issues(),
                         actor=self,
                         exchange_ratio=exchange_ratio_p,
+                        denominator=self.model.nbs_denominators[self.supply.issue],
                     )
 
                     euj = abs(
@@ -226,13 +229,11 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
             else:
 
                 delta = abs(
-                    calculations.adjusted_nbs_by_position(
-                        actor_issues=self.actor_issues(),
-                        updates=self.exchange.updates[self.supply.issue],
+                    self.model.nbs_states[self.supply.issue].adjusted_nbs_by_position(
+                        updates=self.exchange.issue_updates(self.supply.issue),
                         actor=self.actor,
                         x_pos=self.supply.position,
                         new_nbs=self.opposite_actor.demand.position,
-                        denominator=self.model.nbs_denominators[self.supply.issue],
                     )
                 )
 
@@ -251,6 +252,9 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
                     actor_issues=self.opposite_actor.actor_issues(),
                     actor=self.opposite_actor,
                     exchange_ratio=exchange_ratio_p,
+                    denominator=self.model.nbs_denominators[
+                        self.opposite_actor.supply.issue
+                    ],
                 )
 
                 euj = abs(
@@ -342,6 +346,8 @@ class EqualGainExchangeActor(base.AbstractExchangeActor):
 
 
 class EqualGainExchange(base.AbstractExchange):
+    __slots__ = ()
+
     actor_class = EqualGainExchangeActor
 
     def __init__(self, i, j, p, q, m, groups):
@@ -349,23 +355,29 @@ class EqualGainExchange(base.AbstractExchange):
         self.j: EqualGainExchangeActor
         super().__init__(i, j, p, q, m, groups)
 
-    def calculate(self):
+    def calculate_gain(self):
         # first we try to move j to the position of i on issue p
         # we start with the calculation for j
-        self.dp = calculations.by_absolute_move(self.j.actor_issues(), self.j)
+        self.dp = calculations.by_absolute_move(
+            self.j.actor_issues(), self.j, self.model.nbs_denominators[self.j.supply.issue]
+        )
         self.dq = calculations.by_exchange_ratio(self.j, self.dp)
 
-        self.i.move = calculations.reverse_move(self.i.actor_issues(), self.i, self.dq)
+        self.i.move = calculations.reverse_move(
+            self.i.actor_issues(), self.i, self.dq, self.model.nbs_denominators[self.i.supply.issue]
+        )
         self.j.move = abs(self.i.demand.position - self.j.supply.position)
 
         # if the move exceeds the interval
         if abs(self.i.move) > abs(self.j.demand.position - self.i.supply.position):
-            self.dq = calculations.by_absolute_move(self.i.actor_issues(), self.i)
+            self.dq = calculations.by_absolute_move(
+                self.i.actor_issues(), self.i, self.model.nbs_denominators[self.i.supply.issue]
+            )
             self.dp = calculations.by_exchange_ratio(self.i, self.dq)
 
             self.i.move = abs(self.j.demand.position - self.i.supply.position)
             self.j.move = calculations.reverse_move(
-                self.j.actor_issues(), self.j, self.dp
+                self.j.actor_issues(), self.j, self.dp, self.model.nbs_denominators[self.j.supply.issue]
             )
 
         # determine the direction of both moves
@@ -391,7 +403,7 @@ class EqualGainExchange(base.AbstractExchange):
         euj = calculations.expected_utility(self.j, self.dp, self.dq)
 
         # since this is the Equal Gain model, the gains should be equal
-        if calculations.is_gain_equal(eui, euj):
+        if calculations.is_gain_equal(eui, euj, self.model.tolerance):
             self.gain = abs(eui)
             self.i.eu = self.gain
             self.j.eu = self.gain
@@ -412,17 +424,21 @@ class EqualGainExchange(base.AbstractExchange):
             b2 = self.j.is_move_valid(self.j.move)
 
             self.is_valid = b1 and b2
-        else:
-            return  # stop if its not valid
 
+    def randomize(self):
+        """
+        Overrides Abstract, the random component of the gain of a model with a randomized value
+        """
         if (
             self.model.randomized_value is not None
             and self.model.randomized_value > 0.0
         ):
 
-            u = random.uniform(0, 1)
-            v = random.uniform(0, 1)
-            z = decimal.Decimal(random.uniform(0, 1))
+            rnd = self.model.exchange_random
+
+            u = rnd.uniform(0, 1)
+            v = rnd.uniform(0, 1)
+            z = self.model.number_type(rnd.uniform(0, 1))
 
             self.calculate_maximum_utility()
 
@@ -609,13 +625,13 @@ class EqualGainModel(base.AbstractModel):
     the model but this gives not equal outcomes for testing purpose
     """
     ALLOW_RANDOM = True
+    DETERMINISTIC_CANDIDATES = True
 
-    def __init__(self, randomized_value=None):
-        super().__init__()
-        self.exchanges: List[EqualGainExchange]
+    def __init__(self, randomized_value=None, numeric_backend="decimal", seed=None):
+        super().__init__(numeric_backend=numeric_backend, seed=seed)
 
         if isinstance(randomized_value, str):
-            randomized_value = decimal.Decimal(randomized_value)
+            randomized_value = self.number_type(randomized_value)
 
         self.randomized_value = randomized_value
 
@@ -624,39 +640,120 @@ class EqualGainModel(base.AbstractModel):
         if randomized_value:
             self.model_name += "-" + str(round(randomized_value, 2))
 
+    def draws_for_exchanges(self):
+        """
+        Overrides Abstract, only a model with a randomized value adds a random component to the exchanges
+        """
+        return self.randomized_value is not None and self.randomized_value > 0.0
+
     def sort_exchanges(self):
         """
         The exchanges are sorted by there (equal) gain, highest first
         """
-        self.exchanges.sort(key=attrgetter("gain"), reverse=True)
+        self.exchanges.sort()
 
     def highest_gain(self):
         """
-        Overrides Abstract # To sort the list in place...
+        Overrides Abstract, pops the exchange with the highest gain from the queue
         :return:
         """
-        self.sort_exchanges()
-
-        realize = self.exchanges.pop(0)
+        realize = self.exchanges.pop()
 
         if len(self.exchanges) > 0:
 
             # in some cases the exchanges have an equal gain, choice randomly between them
             if EqualGainModel.ALLOW_RANDOM:
 
-                next_exchange = self.exchanges[0]
+                next_exchange = self.exchanges.peek()
 
-                if abs(realize.gain - next_exchange.gain) < 1e-20:
+                if abs(realize.gain - next_exchange.gain) < self.tolerance:
                     self.tie_count += 1
 
-                    if random.random() >= 0.5:
+                    if self.random.random() >= 0.5:
+                        self.exchanges.remove(next_exchange)
                         self.exchanges.append(realize)
-                        realize = self.exchanges.pop(0)
-                    else:
-                        self.exchanges.append(next_exchange)
+                        realize = next_exchange
 
         return realize
 
+    def viable_exchanges(self, arrays: base.ActorIssueArrays, group_i, group_j, p, q):
+        """
+        Overrides Abstract, the first part of EqualGainExchange.calculate for all the pairs at once.
+
+        A pair is skipped when its moves or gain are invalid by a margin larger than the
+        rounding error of the floats. Pairs near a boundary, or where the calculation is not
+        finite, are kept so the exact calculation decides.
+        """
+        margin = 1e-11
+
+        p, q = arrays.issue_index[p], arrays.issue_index[q]
+
+        x_ip, x_iq = arrays.position[group_i, p][:, None], arrays.position[group_i, q][:, None]
+        s_ip, s_iq = arrays.salience[group_i, p][:, None], arrays.salience[group_i, q][:, None]
+        c_ip, c_iq = arrays.power[group_i, p][:, None], arrays.power[group_i, q][:, None]
+
+        x_jp, x_jq = arrays.position[group_j, p][None, :], arrays.position[group_j, q][None, :]
+        s_jp, s_jq = arrays.salience[group_j, p][None, :], arrays.salience[group_j, q][None, :]
+        c_jp, c_jq = arrays.power[group_j, p][None, :], arrays.power[group_j, q][None, :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # the actor with the lowest salience ratio p/q becomes exchange actor i (see
+            # AbstractExchange), which supplies issue q and demands issue p
+            ratio_i = s_ip / s_iq
+            ratio_j = s_jp / s_jq
+            swap = ratio_i < ratio_j
+            undecided = np.isclose(ratio_i, ratio_j, rtol=1e-12, atol=0)
+
+            # supply (s) and demand (d) values of exchange actor i (I) and j (J)
+            x_is, x_id = np.where(swap, x_jq, x_iq), np.where(swap, x_jp, x_ip)
+            s_is, s_id = np.where(swap, s_jq, s_iq), np.where(swap, s_jp, s_ip)
+            c_is = np.where(swap, c_jq, c_iq)
+
+            x_js, x_jd = np.where(swap, x_ip, x_jp), np.where(swap, x_iq, x_jq)
+            s_js, s_jd = np.where(swap, s_ip, s_jp), np.where(swap, s_iq, s_jq)
+            c_js = np.where(swap, c_ip, c_jp)
+
+            den_i, den_j = arrays.denominator[q], arrays.denominator[p]
+
+            # first move j to the position of i
+            dp = np.abs(x_id - x_js) * s_js * c_js / den_j
+            dq = (s_js + s_id) / (s_jd + s_is) * dp
+            move_i = dq * den_i / (c_is * s_is)
+            move_j = np.abs(x_id - x_js)
+
+            # if the move exceeds the interval, move i to the position of j
+            exceeds = np.abs(move_i) > np.abs(x_jd - x_is)
+            undecided |= np.isclose(np.abs(move_i), np.abs(x_jd - x_is), rtol=0, atol=margin)
+
+            dq_i = np.abs(x_jd - x_is) * s_is * c_is / den_i
+            dp_i = (s_is + s_jd) / (s_id + s_js) * dq_i
+
+            dp = np.where(exceeds, dp_i, dp)
+            dq = np.where(exceeds, dq_i, dq)
+            move_i = np.where(exceeds, np.abs(x_jd - x_is), move_i)
+            move_j = np.where(exceeds, dp_i * den_j / (c_js * s_js), move_j)
+
+            move_i = np.where(x_is > x_jd, -move_i, move_i)
+            move_j = np.where(x_js > x_id, -move_j, move_j)
+
+            eui = np.abs(dq * s_is - dp * s_id)
+            euj = np.abs(dp * s_js - dq * s_jd)
+
+            # the gains are equal by construction, a pair where they are not is left to the
+            # exact calculation which raises an exception
+            undecided |= ~np.isclose(eui, euj, rtol=1e-9, atol=margin)
+
+            invalid = eui < 1e-10 - margin
+
+            for move, x in ((move_i, x_is), (move_j, x_js)):
+                invalid |= np.abs(move) > 100 + margin
+                invalid |= np.abs(move) < 1e-10 - margin
+                invalid |= (x + move < -margin) | (x + move > 100 + margin)
+
+        undecided |= ~np.isfinite(eui) | ~np.isfinite(euj)
+
+        return ~invalid | undecided
+
     @staticmethod
     def new_exchange_factory(i, j, p, q, model, groups):
         return EqualGainExchange(i, j, p, q, model, groups)
@@ -0,0 +1,178 @@
+import multiprocessing
+import pickle
+import queue
+
+from ..observers.observer import Observable
+from ..observers.recorder import EventRecorder, replay
+
+
+class BackgroundWriter(EventRecorder):
+    """
+    Hands the events of the model to the observers of another Observable in a writer process, so the model
+    loop does not wait for the database, the csv files and the charts.
+
+    The events are recorded as by the EventRecorder: each time the state of the model changes, the pending
+    events are pickled together with the model, without its candidate exchanges (see dump_record). The
+    records go through a bounded queue, when the writer process falls behind the model loop waits for a free
+    place in the queue. after_model is also handled by the writer process, it returns when the writer process
+    is finished.
+
+    The observers of the writer process are created in that process by init_writers, so they are not pickled
+    and the writer process can be started by spawn as well as by fork. The observers of the model process
+    (for example MdsConfidence) stay on the Observable of the model.
+    """
+
+    def __init__(self, observable: Observable, init_writers, writer_arguments=None, max_records=64, context=None):
+        """
+        :param observable: the event handler of the model
+        :param init_writers: a module level function that registers the observers of the writer process on the
+            given Observable, called in the writer process as init_writers(writers, **writer_arguments)
+        :param writer_arguments: the picklable keyword arguments of init_writers
+        :param max_records: the size of the queue, about three records per iteration
+        :param context: the multiprocessing context of the writer process, the default context when omitted
+        """
+        super().__init__(model_ref=observable.model_ref, output_directory=observable.output_directory)
+        observable.register(self)
+
+        context = context or multiprocessing.get_context()
+
+        self.queue = context.Queue(maxsize=max_records)
+        self.replies = context.Queue()
+
+        self.process = context.Process(
+            target=write,
+            args=(init_writers, writer_arguments or {}, self.output_directory, self.queue, self.replies),
+            name="decide-writer",
+            daemon=True,
+        )
+        self.process.start()
+
+    def _store(self, record: bytes):
+        if not self.replies.empty():
+            self._reply()  # an error of the writer process
+
+        self._put(("replay", self.output_directory, record))
+
+    def _put(self, message):
+        # blocks while the queue is full
+        while True:
+            try:
+                self.queue.put(message, timeout=1)
+                return
+            except queue.Full:
+                self._check_process()
+
+    def _reply(self):
+        while True:
+            try:
+                reply, value = self.replies.get(timeout=1)
+                break
+            except queue.Empty:
+                self._check_process()
+
+        if reply == "error":
+            raise value
+
+        return value
+
+    def _check_process(self):
+        if not self.process.is_alive():
+            raise RuntimeError("The writer process stopped with exit code {0}".format(self.process.exitcode))
+
+    def close(self):
+        """
+        Handle the remaining records and stop the writer process
+        """
+        if self.process.exitcode is not None:
+            return
+
+        if self.events:
+            self._snapshot()
+
+        self._put(None)
+
+        try:
+            self._reply()
+        finally:
+            self.process.join()
+
+    def before_model(self):
+        self._record("before_model")
+        self._snapshot()
+
+    def before_repetitions(self, repetitions, iterations, randomized_value=None):
+        self._record(
+            "before_repetitions",
+            repetitions=repetitions,
+            iterations=iterations,
+            randomized_value=randomized_value,
+        )
+        self._snapshot()
+
+    def after_repetitions(self):
+        self._record("after_repetitions")
+        self._snapshot()
+
+    def after_model(self):
+        self._record("after_model")
+        self._snapshot()
+
+        self.close()
+
+    def checkpoint_state(self):
+        self._put(("checkpoint_state",))
+
+        return self._reply()
+
+    def restore_checkpoint_state(self, state):
+        self._put(("restore_checkpoint_state", state))
+
+
+def write(init_writers, writer_arguments, output_directory, messages, replies):
+    """
+    The writer process, handles the messages of a BackgroundWriter until it is closed. After an error the
+    messages are only taken from the queue, so the model process does not block.
+    """
+    writers = Observable(model_ref=None, output_directory=output_directory)
+
+    try:
+        init_writers(writers, **writer_arguments)
+        failed = False
+    except Exception as e:
+        failed = True
+        replies.put(("error", _picklable(e)))
+
+    while True:
+        message = messages.get()
+
+        if message is None:
+            replies.put(("done", None))
+            return
+
+        if failed:
+            continue
+
+        try:
+            if message[0] == "replay":
+                _, output_directory, record = message
+
+                if output_directory != writers.output_directory:
+                    writers.update_output_directory(output_directory)
+
+                replay([record], writers)
+            elif message[0] == "checkpoint_state":
+                replies.put(("state", writers.checkpoint_state()))
+            elif message[0] == "restore_checkpoint_state":
+                writers.restore_checkpoint_state(message[1])
+        except Exception as e:
+            failed = True
+            replies.put(("error", _picklable(e)))
+
+
+def _picklable(e: Exception):
+    try:
+        pickle.dumps(e)
+    except Exception:
+        e = RuntimeError("The writer process failed: {0!r}".format(e))
+
+    return e
@@ -0,0 +1,64 @@
+from collections import defaultdict
+
+from .. import calculations
+from ..observers import observer
+
+
+class MdsConfidence(observer.Observer):
+    """
+    Tracks the mean and variance of the final MDS of each issue over the repetitions of a p-value, to decide
+    when the confidence interval of the mean is small enough to stop repeating.
+
+    The final MDS is the NBS of the voting positions after the last iteration, the last round of the
+    "after" table of results.nashbargainingsolution.
+    """
+
+    def __init__(self, observable: observer.Observable, z=1.96, min_repetitions=3):
+        """
+        :param z: the quantile of the normal distribution, 1.96 for a 95% confidence interval
+        :param min_repetitions: the minimal number of repetitions before the interval is trusted
+        """
+        super().__init__(observable)
+
+        self.z = z
+        self.min_repetitions = min_repetitions
+
+        self.statistics = defaultdict(calculations.RunningStatistics)  # dict with issue, RunningStatistics
+        self.final_nbs = {}
+
+    def before_repetitions(self, repetitions, iterations, randomized_value=None):
+        self.statistics.clear()
+
+    def before_iterations(self, repetition):
+        self.final_nbs = {}
+
+    def end_loop(self, iteration: int, repetition: int):
+        self.final_nbs = dict(self.model_ref.nbs)
+
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        # the remaining iterations are filled with the current positions
+        self.final_nbs = dict(self.model_ref.nbs)
+
+    def after_iterations(self, repetition):
+        for issue, nbs in self.final_nbs.items():
+            self.statistics[issue].add(float(nbs))
+
+    @property
+    def repetitions(self):
+        return min((s.count for s in self.statistics.values()), default=0)
+
+    def half_width(self):
+        """
+        The largest half-width of the confidence intervals of the issues
+        """
+        if not self.statistics:
+            return float("inf")
+
+        return max(s.half_width(self.z) for s in self.statistics.values())
+
+    def reached(self, tolerance):
+        """
+        :param tolerance: the target half-width, on the scale of the model (0 - 100)
+        :return: True when the confidence interval of every issue is smaller than the tolerance
+        """
+        return self.repetitions >= self.min_repetitions and self.half_width() <= tolerance
@@ -169,7 +169,8 @@ class Externalities(observer.Observer):
         create storage units for each repetition and each iteration
         :return:
         """
-        pass
+        # the summary is written for each p-value
+        self.actor_totals = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
     def before_loop(self, iteration: int, repetition: int):
         self._setup()
@@ -273,6 +274,18 @@ class Externalities(observer.Observer):
                 #     with db.connection.atomic():
                 #         db.Externality.create()
 
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        """
+        The remaining iterations have no exchanges, write them with zero externalities for every actor
+        """
+        for remaining in range(iteration + 1, iterations):
+            self.before_loop(remaining, repetition)
+
+            for actor in self.model_ref.actors:
+                self.actors[actor]  # the defaultdict adds the actor with zero externalities
+
+            self.end_loop(remaining, repetition)
+
     def after_repetitions(self):
         """
         Write the summary's
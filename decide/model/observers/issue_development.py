@@ -37,6 +37,16 @@ class IssueDevelopment(observer.Observer):
         self.issue_obj = None
         self.write_voting_position = write_voting_position
 
+        self._reset_sums()
+
+        self.denominator = 0  # TODO remove or document this attribute
+
+        self.summary_only = summary_only
+
+    def _reset_sums(self):
+        """
+        The storage for the summary of the repetitions of a single p-value
+        """
         self.preference_history_sum = defaultdict(
             lambda: defaultdict(lambda: defaultdict(list))
         )
@@ -50,10 +60,6 @@ class IssueDevelopment(observer.Observer):
             lambda: defaultdict(lambda: defaultdict(list))
         )
 
-        self.denominator = 0  # TODO remove or document this attribute
-
-        self.summary_only = summary_only
-
     def _setup(self):
         """
         Setup method.
@@ -99,7 +105,8 @@ class IssueDevelopment(observer.Observer):
             )
 
     def before_repetitions(self, repetitions, iterations, randomized_value=None):
-        pass
+        # the summary is written for each p-value
+        self._reset_sums()
 
     def before_iterations(self, repetition):
         """
@@ -198,6 +205,14 @@ class IssueDevelopment(observer.Observer):
             self.voting_loss[issue]["nbs"].append(nbs_var)
             self.voting_loss_sum[issue]["nbs"][iteration].append(nbs_var)
 
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        """
+        Fill the remaining iterations with the final positions, so every repetition has the same number of rows
+        """
+        for remaining in range(iteration + 1, iterations):
+            self.after_loop([], remaining, repetition)
+            self.end_loop(remaining, repetition)
+
     def after_iterations(self, repetition):
         """
         Write all the data of this repetition to the filesystem
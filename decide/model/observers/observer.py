@@ -17,6 +17,7 @@ class Observer(object):
     before_loop()
     after_loop()
     end_loop()
+    converged() (optional, when a repetition stops early)
     after_iterations()
     after_repetitions()
 
@@ -76,6 +77,17 @@ class Observer(object):
         """
         pass
 
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        """
+        The model converged after this iteration, the remaining iterations are not calculated because
+        the positions would not change (within the tolerance) anymore. The model reference has the final positions.
+        Next event: after_iterations
+        :param iteration: the last calculated iteration
+        :param repetition: the current repetition
+        :param iterations: the number of iterations of a complete repetition
+        """
+        pass
+
     def after_iterations(self, repetition):
         """
         After a set of loops are finished
@@ -95,6 +107,19 @@ class Observer(object):
         """
         pass
 
+    def checkpoint_state(self):
+        """
+        The state that is kept over the p-values of a sweep, stored in a checkpoint after a p-value is finished.
+        The storage of the current p-value is rebuilt by replaying the repetitions, see decide.checkpoint
+        """
+        return None
+
+    def restore_checkpoint_state(self, state):
+        """
+        Restore the state of checkpoint_state when an interrupted sweep is resumed
+        """
+        pass
+
     @staticmethod
     def log(message: str):
         logging.info(message)
@@ -169,6 +194,10 @@ class Observable(Observer):
         for observer in self.__observers:
             observer.end_loop(iteration, repetition)
 
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        for observer in self.__observers:
+            observer.converged(iteration, repetition, iterations)
+
     def after_iterations(self, repetition):
         for observer in self.__observers:
             observer.after_iterations(repetition)
@@ -180,3 +209,10 @@ class Observable(Observer):
     def after_model(self):
         for observer in self.__observers:
             observer.after_model()
+
+    def checkpoint_state(self):
+        return [observer.checkpoint_state() for observer in self.__observers]
+
+    def restore_checkpoint_state(self, state):
+        for observer, observer_state in zip(self.__observers, state):
+            observer.restore_checkpoint_state(observer_state)
@@ -0,0 +1,120 @@
+import copyreg
+import io
+import pickle
+from typing import List
+
+from .. import base
+from ..observers.observer import Observable
+
+
+class RecordPickler(pickle.Pickler):
+    """
+    Pickles the models in a record with AbstractModel.record_state, also the models referred to by the
+    realized exchanges
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, base.AbstractModel):
+            return copyreg.__newobj__, (type(obj),), obj.record_state()
+
+        return NotImplemented
+
+
+def dump_record(model: base.AbstractModel, events) -> bytes:
+    """
+    :return: the pickled (model, events) tuple of a record
+    """
+    file = io.BytesIO()
+    RecordPickler(file, protocol=pickle.HIGHEST_PROTOCOL).dump((model, events))
+
+    return file.getvalue()
+
+
+class EventRecorder(Observable):
+    """
+    Records the events of a repetition, so they can be replayed on the observers of another process.
+
+    The observers read the state of the model while handling an event. Each time the state of the model
+    changes, the pending events are pickled together with the model, without its candidate exchanges
+    (see AbstractModel.record_state). Replaying the records gives the observers the same events on the
+    same state as a run in a single process.
+    """
+
+    def __init__(self, model_ref: base.AbstractModel, output_directory: str = None):
+        super().__init__(model_ref=model_ref, output_directory=output_directory)
+
+        self.events = []  # the pending events, tuples of event name and keyword arguments
+        self.records = []  # the pickled (model, events) tuples
+
+    def _record(self, event, **kwargs):
+        self.events.append((event, kwargs))
+
+    def _snapshot(self):
+        self._store(dump_record(self.model_ref, self.events))
+        self.events = []
+
+    def _store(self, record: bytes):
+        self.records.append(record)
+
+    def before_iterations(self, repetition):
+        self._record("before_iterations", repetition=repetition)
+
+    def before_loop(self, iteration: int, repetition: int = None):
+        self._record("before_loop", iteration=iteration, repetition=repetition)
+        self._snapshot()
+
+    def execute_exchange(self, exchange: base.AbstractExchange):
+        # the realized exchange does not change anymore, it is pickled together with the loop
+        self._record("execute_exchange", exchange=exchange)
+
+    def after_loop(
+        self, realized: List[base.AbstractExchange], iteration: int, repetition: int
+    ):
+        self._record(
+            "after_loop", realized=realized, iteration=iteration, repetition=repetition
+        )
+        self._snapshot()
+
+    def end_loop(self, iteration: int, repetition: int):
+        self._record("end_loop", iteration=iteration, repetition=repetition)
+        self._snapshot()
+
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        # the model does not change anymore, it is pickled together with after_iterations
+        self._record(
+            "converged", iteration=iteration, repetition=repetition, iterations=iterations
+        )
+
+    def after_iterations(self, repetition):
+        self._record("after_iterations", repetition=repetition)
+        self._snapshot()
+
+
+def replay(records: List[bytes], observable: Observable, repetition: int = None):
+    """
+    Fire the recorded events on the observable, with the recorded model as model reference
+    :param records: EventRecorder.records
+    :param observable: Observable
+    :param repetition: fire the events for this repetition instead of the recorded one, to reuse the records
+        of a deterministic repetition (see AbstractModel.is_deterministic)
+    """
+    for record in records:
+        model, events = pickle.loads(record)
+
+        observable.update_model_ref(model)
+
+        for event, kwargs in events:
+            if repetition is not None and "repetition" in kwargs:
+                kwargs = dict(kwargs, repetition=repetition)
+
+            getattr(observable, event)(**kwargs)
+
+
+def is_deterministic(records: List[bytes]):
+    """
+    True when the recorded repetition did not draw a random number, every other repetition
+    with the same settings gives the same records
+    """
+    model, _ = pickle.loads(records[-1])
+
+    return model.is_deterministic()
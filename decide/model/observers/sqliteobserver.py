@@ -2,6 +2,8 @@ import datetime
 from collections import defaultdict
 from typing import List
 
+from peewee import chunked, fn
+
 from decide import results
 from decide.data import database as db
 from decide.data.database import connection
@@ -10,14 +12,67 @@ from decide.model.base import AbstractExchange, Actor, Issue, AbstractExchangeAc
 from decide.model.observers.observer import Observer, Observable
 
 
+# the number of rows per executemany, bounds the memory of the converted rows
+BATCH_SIZE = 5000
+
+# the tables written at the end of each repetition with the fields of their rows, in order of the foreign keys
+BUFFERED_FIELDS = {
+    db.Iteration: [db.Iteration.id, db.Iteration.pointer, db.Iteration.repetition],
+    db.Mds: [db.Mds.iteration, db.Mds.issue, db.Mds.type, db.Mds.mds],
+    db.ActorIssue: [
+        db.ActorIssue.issue,
+        db.ActorIssue.actor,
+        db.ActorIssue.power,
+        db.ActorIssue.salience,
+        db.ActorIssue.position,
+        db.ActorIssue.iteration,
+        db.ActorIssue.type,
+    ],
+    db.ExchangeActor: [
+        db.ExchangeActor.id,
+        db.ExchangeActor.actor,
+        db.ExchangeActor.supply_issue,
+        db.ExchangeActor.demand_issue,
+        db.ExchangeActor.eu,
+        db.ExchangeActor.x,
+        db.ExchangeActor.y,
+        db.ExchangeActor.demand_position,
+    ],
+    db.Exchange: [db.Exchange.id, db.Exchange.i, db.Exchange.j, db.Exchange.iteration],
+    db.Externality: [
+        db.Externality.actor,
+        db.Externality.exchange,
+        db.Externality.supply,
+        db.Externality.demand,
+        db.Externality.own,
+        db.Externality.inner_positive,
+        db.Externality.inner_negative,
+        db.Externality.outer_positive,
+        db.Externality.outer_negative,
+        db.Externality.iteration,
+    ],
+}
+
+
 class SQLiteObserver(Observer):
     """
-    Observer to store all the data in a sqlite database
+    Observer to store all the data in a sqlite database.
+
+    The rows of a repetition are kept in memory and written after the repetition with executemany, in
+    batches and in a single transaction. The observer assigns the ids of the iterations, exchange
+    actors and exchanges itself, so the rows can refer to each other before they are written. This assumes
+    the observer is the only writer of the database while a repetition runs.
+
+    With delta_snapshots the actor issues are stored completely once per repetition, after that only the
+    changed actor issues are stored. The view actorissue_snapshot rebuilds the complete snapshots.
     """
 
-    def __init__(self, observable: "Observable", output_directory: str):
+    def __init__(self, observable: "Observable", output_directory: str, delta_snapshots=False):
         super().__init__(observable)
 
+        self.delta_snapshots = delta_snapshots
+        self.stored = {}  # dict with the actor and issue ids, the last stored values of the repetition
+
         self.repetitions = {}
         self.iterations = defaultdict(lambda: {})
 
@@ -27,6 +82,9 @@ class SQLiteObserver(Observer):
         self.data_set = None
         self.model_run = None
 
+        self.rows = defaultdict(list)  # dict with table, the rows of the current repetition
+        self.next_ids = {}  # dict with table, the last assigned id
+
         if not output_directory.endswith(".db") and output_directory != ":memory:":
             output_directory += "/decide-data.sqlite.db"
             self.log("logging to database {}".format(output_directory))
@@ -40,7 +98,7 @@ class SQLiteObserver(Observer):
 
         # initialize the database
         manager = db.Manager(self.database_path)
-        manager.init_database()
+        manager.init_database(pragmas=db.RUN_PRAGMAS)
         manager.create_tables()
 
         with db.connection.atomic():
@@ -96,39 +154,45 @@ class SQLiteObserver(Observer):
 
             self.repetitions[repetition] = repetition
 
+        self.stored = {}
+
     def before_loop(self, iteration: int, repetition: int):
-        with db.connection.atomic():
-            self._write_actor_issues(iteration, repetition)
+        self._write_actor_issues(iteration, repetition)
 
     def after_loop(
             self, realized: List[AbstractExchange], iteration: int, repetition: int
     ):
-        iteration = self.iterations[repetition][iteration]
-
-        with db.connection.atomic():
-            for exchange in realized:
-                db_exchange = db.Exchange()
-                db_exchange.i = self._create_exchange_actor(exchange.i)
-                db_exchange.j = self._create_exchange_actor(exchange.j)
-
-                if db_exchange.i.eu < 1e-10:
-                    pass
+        iteration_id = self.iterations[repetition][iteration]
+
+        for exchange in realized:
+            exchange_id = self._add_row(
+                db.Exchange,
+                self._add_exchange_actor(exchange.i),
+                self._add_exchange_actor(exchange.j),
+                iteration_id,
+            )
 
-                if db_exchange.j.eu < 1e-10:
-                    pass
+            self._write_externalities(exchange, exchange_id, iteration_id)
 
-                db_exchange.iteration = iteration
-                db_exchange.save()
+    def end_loop(self, iteration: int, repetition: int):
+        self._write_actor_issues(iteration, repetition, "after")
 
-                self._write_externalities(exchange, db_exchange)
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        """
+        Store the final positions for the remaining iterations, the results expect all the iterations of a run
+        """
+        for remaining in range(iteration + 1, iterations):
+            self.before_loop(remaining, repetition)
+            self.end_loop(remaining, repetition)
 
-    def end_loop(self, iteration: int, repetition: int):
-        with db.connection.atomic():
-            self._write_actor_issues(iteration, repetition, "after")
+    def after_iterations(self, repetition):
+        self._flush()
 
     def after_repetitions(self):
 
         self.model_run.finished_at = datetime.datetime.now()
+        # with sequential sampling the number of repetitions is known afterwards
+        self.model_run.repetitions = len(self.repetitions)
         self.model_run.save()
         self.model_run_ids.append(self.model_run.id)
 
@@ -144,86 +208,182 @@ class SQLiteObserver(Observer):
         except Exception as e:
             print(e)
 
-    def _write_externalities(
-        self, exchange: AbstractExchange, db_exchange: db.Exchange
-    ):
+    def checkpoint_state(self):
+        return {
+            "model_run_ids": list(self.model_run_ids),
+            "last_model_run_id": db.ModelRun.select(fn.MAX(db.ModelRun.id)).scalar() or 0,
+        }
+
+    def restore_checkpoint_state(self, state):
+        self.model_run_ids = list(state["model_run_ids"])
+
+        self._remove_unfinished_runs(state["last_model_run_id"])
+
+    def _remove_unfinished_runs(self, last_model_run_id):
+        """
+        Remove the model run of the p-value that was interrupted, with the rows of its finished repetitions. The
+        repetitions are replayed into a new model run. The foreign keys are not enforced, so the rows are removed
+        table by table.
+        """
+        model_runs = db.ModelRun.select(db.ModelRun.id).where(
+            db.ModelRun.data_set == self.data_set,
+            db.ModelRun.finished_at.is_null(),
+            db.ModelRun.id > last_model_run_id,
+        )
+
+        repetitions = db.Repetition.select(db.Repetition.id).where(db.Repetition.model_run.in_(model_runs))
+        iterations = db.Iteration.select(db.Iteration.id).where(db.Iteration.repetition.in_(repetitions))
+        exchanges = db.Exchange.select(db.Exchange.id).where(db.Exchange.iteration.in_(iterations))
+
+        with db.connection.atomic():
+            exchange_actors = [
+                actor_id
+                for exchange in db.Exchange.select(db.Exchange.i, db.Exchange.j).where(
+                    db.Exchange.iteration.in_(iterations)
+                ).tuples()
+                for actor_id in exchange
+            ]
+
+            db.Externality.delete().where(db.Externality.exchange.in_(exchanges)).execute()
+            db.Exchange.delete().where(db.Exchange.iteration.in_(iterations)).execute()
+
+            for batch in chunked(exchange_actors, BATCH_SIZE):
+                db.ExchangeActor.delete().where(db.ExchangeActor.id.in_(batch)).execute()
+
+            db.ActorIssue.delete().where(db.ActorIssue.iteration.in_(iterations)).execute()
+            db.Mds.delete().where(db.Mds.iteration.in_(iterations)).execute()
+            db.Iteration.delete().where(db.Iteration.repetition.in_(repetitions)).execute()
+            db.Repetition.delete().where(db.Repetition.model_run.in_(model_runs)).execute()
+            db.ModelRun.delete().where(db.ModelRun.id.in_(model_runs)).execute()
+
+    def _add_row(self, table, *values):
+        """
+        Buffer a row of a table with an id assigned by the observer
+        :return: the id of the row
+        """
+        if table not in self.next_ids:
+            self.next_ids[table] = table.select(fn.MAX(table.id)).scalar() or 0
+
+        self.next_ids[table] += 1
+        self.rows[table].append((self.next_ids[table],) + values)
+
+        return self.next_ids[table]
+
+    def _flush(self):
+        """
+        Write the buffered rows of the repetition
+        """
+        with db.connection.atomic():
+            cursor = db.connection.cursor()
+
+            for table, fields in BUFFERED_FIELDS.items():
+                # the same statement as table.insert_many, without building the query for each batch
+                sql = 'INSERT INTO "{0}" ({1}) VALUES ({2})'.format(
+                    table._meta.table_name,
+                    ", ".join('"{0}"'.format(field.column_name) for field in fields),
+                    ", ".join("?" * len(fields)),
+                )
+
+                for batch in chunked(self.rows.pop(table, []), BATCH_SIZE):
+                    cursor.executemany(
+                        sql,
+                        [
+                            tuple(field.db_value(value) for field, value in zip(fields, row))
+                            for row in batch
+                        ],
+                    )
+
+        self.next_ids = {}
+
+    def _write_externalities(self, exchange: AbstractExchange, exchange_id, iteration_id):
+        """
+        Buffer the externalities of the exchange that are not zero, a missing row is an externality of zero.
+        The externalities of all the actors are calculated at once, see calculations.externalities
+        """
+        state = self.model_ref.state
 
         issue_set_key = self.model_ref.create_existing_issue_set_key(
             exchange.p, exchange.q
         )
-        inner = exchange.get_inner_groups()
+        inner = {
+            actor.actor_id
+            for group in exchange.get_inner_groups()
+            for actor in self.model_ref.groups[issue_set_key][group]
+        }
 
-        for actor in self.actors:
+        supply = self.issues[exchange.i.supply.issue].id
+        demand = self.issues[exchange.i.demand.issue].id
 
-            externality = db.Externality()
-            externality.actor = actor
-            externality.exchange = db_exchange
-            externality.supply = db_exchange.i.supply_issue
-            externality.demand = db_exchange.i.demand_issue
-            externality.iteration = db_exchange.iteration
+        rows = self.rows[db.Externality]
 
-            externality_size = calculations.actor_externalities(
-                actor, self.model_ref, exchange
-            )
+        own = {exchange.i.actor.actor_id: exchange.i.eu, exchange.j.actor.actor_id: exchange.j.eu}
 
-            is_inner = self.model_ref.is_inner_group_member(
-                str(actor.key), inner, issue_set_key
-            )
+        for actor_id, eu in own.items():
+            if eu != 0:
+                rows.append(
+                    (self.actors[actor_id].id, exchange_id, supply, demand, eu, None, None, None, None, iteration_id)
+                )
+
+        actors, sizes = calculations.externalities(self.model_ref, exchange)
+
+        for index, externality_size in zip(actors[sizes != 0], sizes[sizes != 0]):
+            actor_id = state.actors[index].actor_id
+
+            if actor_id in own:
+                continue
 
-            if actor.key == exchange.i.actor.actor_id:
-                externality.own = exchange.i.eu
-            elif actor.key == exchange.j.actor.actor_id:
-                exchange.own = exchange.j.eu
-            else:
-                if externality_size < 0:
-                    if is_inner:
-                        externality.inner_negative = externality_size
-                    else:
-                        externality.outer_negative = externality_size
-                else:
-                    if is_inner:
-                        externality.inner_positive = externality_size
-                    else:
-                        externality.outer_positive = externality_size
-
-            externality.save()
+            # inner positive, inner negative, outer positive, outer negative
+            values = [None] * 4
+            values[(0 if actor_id in inner else 2) + (1 if externality_size < 0 else 0)] = externality_size
+
+            rows.append((self.actors[actor_id].id, exchange_id, supply, demand, None, *values, iteration_id))
 
     def _write_actor_issues(self, iteration: int, repetition: int, _type="before"):
 
-        with db.connection.atomic():
+        iterations = self.iterations[repetition]
 
-            repetition = self.repetitions[repetition]
-            iteration, _ = db.Iteration.get_or_create(
-                pointer=iteration, repetition=repetition
+        if iteration not in iterations:
+            iterations[iteration] = self._add_row(
+                db.Iteration, iteration, self.repetitions[repetition].id
             )
 
-            self.iterations[repetition][iteration] = iteration
-
-            for (
-                issue_obj,
-                actors,
-            ) in self.model_ref.actor_issues.items():
-                for actor_obj, actor_issue in actors.items():
-                    db.ActorIssue.create(
-                        issue=self.issues[issue_obj.issue_id],
-                        actor=self.actors[actor_obj.actor_id],
-                        power=actor_issue.power,
-                        salience=actor_issue.salience,
-                        position=actor_issue.position,
-                        iteration=iteration,
-                        type=_type,
-                    )
+        iteration_id = iterations[iteration]
+
+        # the model calculated the NBS of these positions
+        for issue_obj, nbs in self.model_ref.nbs.items():
+            self.rows[db.Mds].append((iteration_id, self.issues[issue_obj.issue_id].id, _type, nbs))
 
-    def _create_exchange_actor(self, i: AbstractExchangeActor):
+        rows = self.rows[db.ActorIssue]
 
-        exchange_actor = db.ExchangeActor()
-        exchange_actor.actor = self.actors[i.actor]
-        exchange_actor.supply_issue = self.issues[i.supply.issue]
-        exchange_actor.demand_issue = self.issues[i.demand.issue]
-        exchange_actor.eu = i.eu
-        exchange_actor.x = i.supply.position
-        exchange_actor.y = i.y
-        exchange_actor.demand_position = i.opposite_actor.demand.position
-        exchange_actor.save()
+        for (
+            issue_obj,
+            actors,
+        ) in self.model_ref.actor_issues.items():
+            issue_id = self.issues[issue_obj.issue_id].id
 
-        return exchange_actor
+            for actor_obj, actor_issue in actors.items():
+                actor_id = self.actors[actor_obj.actor_id].id
+                values = (actor_issue.power, actor_issue.salience, actor_issue.position)
+
+                if self.delta_snapshots:
+                    if self.stored.get((actor_id, issue_id)) == values:
+                        continue
+
+                    self.stored[(actor_id, issue_id)] = values
+
+                rows.append((issue_id, actor_id) + values + (iteration_id, _type))
+
+    def _add_exchange_actor(self, i: AbstractExchangeActor):
+        """
+        :return: the id of the exchange actor
+        """
+        return self._add_row(
+            db.ExchangeActor,
+            self.actors[i.actor].id,
+            self.issues[i.supply.issue].id,
+            self.issues[i.demand.issue].id,
+            i.eu,
+            i.supply.position,
+            i.y,
+            i.opposite_actor.demand.position,
+        )
@@ -0,0 +1,66 @@
+import os
+import statistics
+
+import pytest
+
+from decide import input_folder
+from decide.data.modelfactory import ModelFactory
+from decide.data.reader import InputDataFile
+from decide.model.base import stream_seed
+from decide.model.equalgain import EqualGainModel
+from decide.model.observers.confidence import MdsConfidence
+from decide.model.observers.observer import Observable
+from decide.model.utils import ModelLoop
+
+
+def test_mds_confidence():
+    factory = ModelFactory(date_file=InputDataFile.open(os.path.join(input_folder, "sample_data.txt")))
+
+    # the issues of the models of a factory are equal, so the statistics are collected over the models
+    model = factory(EqualGainModel, randomized_value="0.5")
+
+    event_handler = Observable(model_ref=model, output_directory=None)
+    confidence = MdsConfidence(event_handler, min_repetitions=2)
+
+    event_handler.before_repetitions(repetitions=4, iterations=2)
+
+    assert not confidence.reached(100)
+
+    final_nbs = []
+
+    for repetition in range(4):
+        # a fresh model with its own random streams for every repetition
+        model = factory(EqualGainModel, randomized_value="0.5", seed=stream_seed(7, repetition))
+        event_handler.update_model_ref(model)
+
+        model_loop = ModelLoop(model, event_handler, repetition)
+
+        event_handler.before_iterations(repetition)
+        model_loop.run(2)
+        event_handler.after_iterations(repetition)
+
+        final_nbs.append({issue: float(nbs) for issue, nbs in model.nbs.items()})
+
+        if repetition == 0:
+            assert not confidence.reached(100)
+
+    assert confidence.repetitions == 4
+    assert set(confidence.statistics) == set(model.issues)
+
+    # the mean, the sample variance and the half-width calculated from the stored values
+    half_widths = []
+
+    for issue, running in confidence.statistics.items():
+        values = [nbs[issue] for nbs in final_nbs]
+
+        assert running.mean == pytest.approx(statistics.mean(values))
+        assert running.variance == pytest.approx(statistics.variance(values))
+
+        half_widths.append(1.96 * (statistics.variance(values) / 4) ** 0.5)
+
+    # the repetitions differ
+    assert max(half_widths) > 0
+    assert confidence.half_width() == pytest.approx(max(half_widths))
+
+    assert confidence.reached(max(half_widths) + 1e-9)
+    assert not confidence.reached(max(half_widths) / 2)
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+from decide.model.observers.background import BackgroundWriter
+from decide.model.observers.observer import Observable, Observer
+from decide.model.observers.recorder import EventRecorder, replay
+from decide.model.utils import ModelLoop
+
+
+class Collector(Observer):
+    def __init__(self, observable):
+        super().__init__(observable)
+        self.events = []
+
+    def _positions(self):
+        return sorted(
+            (issue.issue_id, actor.actor_id, actor_issue.position)
+            for issue, actor_issues in self.model_ref.actor_issues.items()
+            for actor, actor_issue in actor_issues.items()
+        )
+
+    def before_iterations(self, repetition):
+        self.events.append(("before_iterations", repetition))
+
+    def before_loop(self, iteration, repetition):
+        self.events.append(("before_loop", iteration, sorted(self.model_ref.nbs.values()), self._positions()))
+
+    def _execute_equal_exchange(self, exchange):
+        self.events.append(("execute_exchange", str(exchange.i), str(exchange.j), exchange.gain))
+
+    def after_loop(self, realized, iteration, repetition):
+        self.events.append(("after_loop", iteration, [e.gain for e in realized], self._positions()))
+
+    def end_loop(self, iteration, repetition):
+        self.events.append(("end_loop", iteration, sorted(self.model_ref.nbs.values()), self._positions()))
+
+    def after_iterations(self, repetition):
+        self.events.append(("after_iterations", repetition))
+
+
+def run(model, event_handler, iterations=2):
+    model_loop = ModelLoop(model, event_handler, 0)
+
+    event_handler.before_iterations(0)
+
+    for _ in range(iterations):
+        model_loop.loop()
+
+    event_handler.after_iterations(0)
+
+
+def test_replay(model, sample_model):
+    model.random.seed(1)
+    direct = Observable(model_ref=model, output_directory=None)
+    expected = Collector(direct)
+    run(model, direct)
+
+    sample_model.random.seed(1)
+    recorder = EventRecorder(sample_model)
+    run(sample_model, recorder)
+
+    observable = Observable(model_ref=None, output_directory=None)
+    collector = Collector(observable)
+    replay(recorder.records, observable)
+
+    assert len(collector.events) > 0
+    assert collector.events == expected.events
+
+
+def test_compact_records(sample_model):
+    recorder = EventRecorder(sample_model)
+    run(sample_model, recorder, iterations=1)
+
+    # the record of before_loop is made with all the candidate exchanges of the round
+    model, events = pickle.loads(recorder.records[0])
+
+    assert len(model.exchanges) == 0
+    assert model.actor_issues.keys() == sample_model.actor_issues.keys()
+
+    # the realized exchanges refer to the same compact model
+    model, events = pickle.loads(recorder.records[1])
+    realized = events[-1][1]["realized"]
+
+    assert len(realized) > 0
+    assert all(exchange.model is model for exchange in realized)
+
+
+def test_replay_as_other_repetition(sample_model):
+    recorder = EventRecorder(sample_model)
+    run(sample_model, recorder, iterations=1)
+
+    observable = Observable(model_ref=None, output_directory=None)
+    collector = Collector(observable)
+    replay(recorder.records, observable, repetition=4)
+
+    assert collector.events[0] == ("before_iterations", 4)
+    assert collector.events[-1] == ("after_iterations", 4)
+
+
+class Stored(Collector):
+    """
+    Stores the events of the writer process, so the test can read them
+    """
+
+    def after_model(self):
+        with open(os.path.join(self.output_directory, "events.pickle"), "wb") as file:
+            pickle.dump(self.events, file)
+
+
+class Failing(Observer):
+    def end_loop(self, iteration, repetition):
+        raise ValueError("disk full")
+
+
+def init_stored(writers):
+    Stored(writers)
+
+
+def init_failing(writers):
+    Failing(writers)
+
+
+
+@pytest.mark.parametrize("start_method", [None, "spawn"])
+def test_background_writer(model, sample_model, tmp_path, start_method):
+    model.random.seed(1)
+    direct = Observable(model_ref=model, output_directory=None)
+    expected = Collector(direct)
+    run(model, direct)
+
+    sample_model.random.seed(1)
+    observable = Observable(model_ref=sample_model, output_directory=str(tmp_path))
+
+    # the observers are created in the writer process, a spawned process can not inherit them
+    context = multiprocessing.get_context(start_method)
+
+    # a queue of a single record, the model loop waits for the writer process
+    BackgroundWriter(observable, init_stored, max_records=1, context=context)
+
+    observable.before_model()
+    run(sample_model, observable)
+    observable.after_model()
+
+    with open(os.path.join(str(tmp_path), "events.pickle"), "rb") as file:
+        events = pickle.load(file)
+
+    assert len(events) > 0
+    assert events == expected.events
+
+
+def test_background_writer_error(sample_model):
+    observable = Observable(model_ref=sample_model, output_directory=None)
+
+    BackgroundWriter(observable, init_failing)
+
+    with pytest.raises(ValueError):
+        run(sample_model, observable)
+        observable.after_model()
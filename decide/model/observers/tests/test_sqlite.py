@@ -0,0 +1,128 @@
+from decimal import Decimal
+
+from decide.data import database as db
+from decide.model.observers.observer import Observable, Observer
+from decide.model.utils import ModelLoop
+
+
+class Realized(Observer):
+    def __init__(self, observable):
+        super().__init__(observable)
+        self.exchanges = 0
+
+    def after_loop(self, realized, iteration, repetition):
+        self.exchanges += len(realized)
+
+
+def test_buffered_rows(model):
+    from decide.model.observers.sqliteobserver import SQLiteObserver
+
+    observable = Observable(model_ref=model, output_directory=":memory:")
+    SQLiteObserver(observable, ":memory:")
+    realized = Realized(observable)
+
+    observable.before_model()
+    observable.before_repetitions(1, 2, Decimal("0.5"))
+    observable.before_iterations(0)
+
+    model_loop = ModelLoop(model, observable, 0)
+    model_loop.loop()
+    model_loop.loop()
+
+    # the rows are written after the repetition
+    assert db.ActorIssue.select().count() == 0
+
+    observable.after_iterations(0)
+
+    actor_issues = sum(len(actors) for actors in model.actor_issues.values())
+
+    assert db.Iteration.select().count() == 2
+    assert db.ActorIssue.select().count() == 2 * 2 * actor_issues
+    assert db.Exchange.select().count() == realized.exchanges > 0
+    # at most a row for each actor and exchange, the externalities of zero are not stored
+    assert 0 < db.Externality.select().count() <= realized.exchanges * len(model.actors)
+
+    # the exchanges refer to their own exchange actors and iterations
+    for exchange in db.Exchange.select():
+        assert exchange.i.id != exchange.j.id
+        assert exchange.i.supply_issue == exchange.j.demand_issue
+        assert exchange.iteration.repetition.pointer == 0
+
+
+def snapshots(repetition, table="actorissue_snapshot"):
+    cursor = db.connection.execute_sql(
+        """
+        SELECT ai.actor_id, ai.issue_id, ai.position, i.pointer, ai.type
+        FROM {0} ai
+        INNER JOIN iteration i ON ai.iteration_id = i.id
+        INNER JOIN repetition r ON i.repetition_id = r.id
+        WHERE r.pointer = ?
+        """.format(table),
+        (repetition,),
+    )
+
+    return sorted(cursor.fetchall())
+
+
+def test_delta_snapshots(model, sample_model):
+    from decide.model.observers.sqliteobserver import SQLiteObserver
+
+    observable = Observable(model_ref=model, output_directory=":memory:")
+    observer = SQLiteObserver(observable, ":memory:")
+
+    observable.before_model()
+    observable.before_repetitions(2, 3, Decimal("0.5"))
+
+    # the same repetition twice, the second time with only the changed actor issues
+    for repetition, repetition_model in enumerate([model, sample_model]):
+        observer.delta_snapshots = repetition == 1
+
+        repetition_model.random.seed(1)
+        observable.update_model_ref(repetition_model)
+        observable.before_iterations(repetition)
+
+        model_loop = ModelLoop(repetition_model, observable, repetition)
+
+        for _ in range(3):
+            model_loop.loop()
+
+        observable.after_iterations(repetition)
+
+    # the view gives the stored snapshots when all the actor issues are stored
+    assert snapshots(0) == snapshots(0, "actorissue")
+
+    assert len(snapshots(1, "actorissue")) < len(snapshots(0, "actorissue"))
+    assert snapshots(1) == snapshots(0)
+
+
+def test_restore_removes_unfinished_run(model):
+    from decide.model.observers.sqliteobserver import SQLiteObserver
+
+    observable = Observable(model_ref=model, output_directory=":memory:")
+    SQLiteObserver(observable, ":memory:")
+
+    observable.before_model()
+
+    # an unfinished run of another sweep is kept
+    observable.before_repetitions(1, 1, Decimal("0.1"))
+
+    state = observable.checkpoint_state()
+
+    # the p-value that is interrupted after its first repetition
+    observable.before_repetitions(2, 2, Decimal("0.5"))
+    observable.before_iterations(0)
+
+    model_loop = ModelLoop(model, observable, 0)
+    model_loop.loop()
+    model_loop.loop()
+
+    observable.after_iterations(0)
+
+    assert db.Exchange.select().count() > 0
+
+    observable.restore_checkpoint_state(state)
+
+    assert [run.p for run in db.ModelRun.select()] == [0.1]
+
+    for table in [db.Repetition, db.Iteration, db.ActorIssue, db.Mds, db.Exchange, db.ExchangeActor, db.Externality]:
+        assert table.select().count() == 0
@@ -1,5 +1,4 @@
 import logging
-import random
 import uuid
 from collections import defaultdict
 from decimal import *
@@ -131,8 +130,8 @@ class RandomRateExchange(base.AbstractExchange):
             if b > a:
                 a, b = b, a
 
-            self.dp = Decimal(random.uniform(a, b))
-            self.dq = Decimal(random.uniform(a, b))
+            self.dp = Decimal(self.model.exchange_random.uniform(a, b))
+            self.dq = Decimal(self.model.exchange_random.uniform(a, b))
 
         self.i.move = calculations.reverse_move(
             self.model.actor_issues[self.i.supply_issue], self.i, self.dq
@@ -252,8 +251,8 @@ class RandomRateModel(base.AbstractModel):
     The Random Rate implementation
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, seed=None):
+        super().__init__(seed=seed)
         self.model_name = "random"
 
     def _get_sorted_exchange_actor_list(self):
@@ -397,10 +396,10 @@ class RandomRateModel(base.AbstractModel):
 
     def remove_exchange_by_key(self, key):
 
-        for __, exchange in enumerate(self.exchanges):
+        for exchange in self.exchanges:
 
             if key == exchange.key:
-                del self.exchanges[__]
+                self.exchanges.remove(exchange)
                 return
 
     @staticmethod
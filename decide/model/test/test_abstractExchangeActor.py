@@ -89,3 +89,37 @@ class TestAbstractExchangeActor(TestCase):
 
         self.assertFalse(exchange_actor0.equals_supply_issue(exchange_actor1))
         self.assertFalse(exchange_actor4.equals_supply_issue(exchange_actor1))
+
+    def test_supply_view(self):
+        model = AbstractModel()
+
+        issue = model.add_issue("test")
+        issue1 = model.add_issue("test1")
+
+        for i in (issue, issue1):
+            i.lower = 0
+            i.upper = 100
+
+        actor = model.add_actor("test")
+
+        actor_issue = model.add_actor_issue(actor, issue, 40, 1, 1)
+        model.add_actor_issue(actor, issue1, 60, 1, 1)
+
+        exchange_actor = AbstractExchangeActor(
+            model=model,
+            actor=actor,
+            demand_issue=issue1,
+            supply_issue=issue,
+            exchange=None,
+        )
+
+        self.assertIs(exchange_actor.supply.actor_issue, actor_issue)
+        self.assertEqual(exchange_actor.supply.position, 40)
+
+        actor_issue.position = 45
+        self.assertEqual(exchange_actor.supply.position, 45)
+
+        # a shifted supply position is an override, the model is not changed
+        exchange_actor.supply.position = 50
+        self.assertEqual(exchange_actor.supply.position, 50)
+        self.assertEqual(actor_issue.position, 45)
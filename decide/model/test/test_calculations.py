@@ -56,6 +56,111 @@ def test_calc_adjusted_nbs(test_model):
                                      test_model.denominator) == decimal.Decimal(200) / decimal.Decimal(3)
 
 
+def test_nash_bargaining_state(test_model):
+    state = base.NashBargainingState(test_model.actor_issues)
+
+    assert state.denominator == test_model.denominator
+    assert state.nbs == decimal.Decimal(200) / decimal.Decimal(3)
+
+    assert state.adjusted_nbs({}, "a", 100) == 100
+    assert state.adjusted_nbs({"a": 100}, "c", 0) == decimal.Decimal(200) / decimal.Decimal(3)
+
+    # the inverse: the shift of "a" needed to move the nbs to 100
+    assert state.adjusted_nbs_by_position({}, "a", 0, 100) == 100
+    assert state.adjusted_nbs_by_position({"b": 0}, "a", 0, 0) == -100
+
+    # the state does not change by an adjustment
+    assert state.nbs == decimal.Decimal(200) / decimal.Decimal(3)
+
+
+def test_nash_bargaining_state_positions():
+    p = base.Issue("p")
+
+    third = decimal.Decimal(1) / 3
+
+    # positions that are not exact in Decimal, so the order of the calculation changes the rounding
+    actor_issues = {
+        key: base.ActorIssue(
+            base.Actor(key), p, position=position, salience=decimal.Decimal(salience), power=decimal.Decimal(power)
+        )
+        for key, position, salience, power in [("a", 10, "0.7", "0.2"), ("b", 38 * third, "0.8", "0.2"),
+                                               ("c", 13 * third, "0.3", "0.1")]
+    }
+
+    state = base.NashBargainingState(actor_issues)
+
+    def summed(positions):
+        # the numerator of copies of the actor issues with the positions applied, summed in reverse order
+        with decimal.localcontext(base.NUMERATOR_CONTEXT):
+            numerator = 0
+
+            for key, actor_issue in reversed(list(actor_issues.items())):
+                numerator += positions.get(key, actor_issue.position) * actor_issue.salience * actor_issue.power
+
+        return numerator
+
+    # exactly the nbs of the copies in any order, also when the actors are not at zero
+    updates = {"b": decimal.Decimal(17)}
+
+    assert state.adjusted_nbs(updates, "a", 70 * third) == summed({"a": 70 * third, "b": 17}) / state.denominator
+
+    # the shift of "a" from 20 that moves the nbs to 60
+    delta = state.adjusted_nbs_by_position(updates, "a", 20, 60)
+
+    assert delta == (60 * state.denominator - summed({"a": 20, "b": 17})) / (
+        actor_issues["a"].salience * actor_issues["a"].power
+    )
+    assert state.adjusted_nbs(updates, "a", 20 + delta) == pytest.approx(60)
+
+
+class CountingDict(dict):
+    """
+    Counts the actor issues that are read
+    """
+
+    reads = 0
+
+    def get(self, key, default=None):
+        self.reads += 1
+        return super().get(key, default)
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return super().__getitem__(key)
+
+    def values(self):
+        self.reads += len(self)
+        return super().values()
+
+    def items(self):
+        self.reads += len(self)
+        return super().items()
+
+
+def test_nash_bargaining_state_terms():
+    p = base.Issue("p")
+
+    actor_issues = CountingDict(
+        (key, base.ActorIssue(base.Actor(key), p, position=key, salience=decimal.Decimal("0.5"), power=1))
+        for key in range(50)
+    )
+
+    state = base.NashBargainingState(actor_issues)
+
+    # the numerator is summed once for the state
+    state.adjusted_nbs({}, 0, 0)
+    actor_issues.reads = 0
+
+    # only the shifted actors are read, not the 50 terms of the numerator
+    state.adjusted_nbs({1: 2, 3: 4}, 0, 10)
+    assert actor_issues.reads == 3
+
+    actor_issues.reads = 0
+
+    state.adjusted_nbs_by_position({1: 2}, 0, 10, 20)
+    assert actor_issues.reads == 3
+
+
 def test_by_absolute_move(sample_model):
     model = sample_model
 
@@ -126,3 +231,41 @@ def test_sum_salience_power_2():
     actor_issues.append(base.ActorIssue(None, None, 1, 1, 1))
 
     assert calculations.sum_salience_power(mock) == 3
+
+
+def test_running_statistics():
+    values = [4.0, 7.0, 13.0, 16.0]
+
+    statistics = calculations.RunningStatistics()
+
+    assert statistics.half_width() == float("inf")
+
+    for value in values:
+        statistics.add(value)
+
+    average, variance = calculations.average_and_variance(values)
+
+    assert statistics.count == 4
+    assert statistics.mean == pytest.approx(average)
+    # the sample variance, average_and_variance returns the population variance
+    assert statistics.variance == pytest.approx(variance * 4 / 3)
+    assert statistics.half_width() == pytest.approx(1.96 * (30.0 / 4) ** 0.5)
+
+
+def test_externalities(sample_model):
+    model = sample_model
+
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+    model.determine_groups_and_calculate_exchanges()
+
+    exchange = model.highest_gain()
+    model.remove_invalid_exchanges(exchange)
+
+    actors, sizes = calculations.externalities(model, exchange)
+
+    calculated = {model.state.actors[index]: size for index, size in zip(actors, sizes)}
+
+    for actor in model.actors:
+        assert calculated.get(actor, 0) == calculations.actor_externalities(actor, model, exchange)
@@ -0,0 +1,79 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from decide.model.base import ExchangeQueue
+
+
+class TestExchangeQueue(TestCase):
+    def test_pop(self):
+        a = MagicMock(gain=1)
+        b = MagicMock(gain=3)
+        c = MagicMock(gain=2)
+
+        queue = ExchangeQueue([a, b, c])
+
+        self.assertEqual(len(queue), 3)
+        self.assertIs(queue.peek(), b)
+        self.assertIs(queue.pop(), b)
+        self.assertIs(queue.pop(), c)
+        self.assertIs(queue.pop(), a)
+        self.assertEqual(len(queue), 0)
+
+        with self.assertRaises(IndexError):
+            queue.pop()
+
+    def test_update_and_remove(self):
+        a = MagicMock(gain=1)
+        b = MagicMock(gain=3)
+        c = MagicMock(gain=2)
+
+        queue = ExchangeQueue([a, b, c])
+
+        a.gain = 4
+        queue.update(a)
+        queue.remove(b)
+
+        self.assertEqual(len(queue), 2)
+        self.assertNotIn(b, queue)
+        self.assertEqual(list(queue), [a, c])
+        self.assertIs(queue.pop(), a)
+        self.assertIs(queue.pop(), c)
+
+    def test_equal_gain_keeps_order(self):
+        a = MagicMock(gain=1)
+        b = MagicMock(gain=1)
+        c = MagicMock(gain=0)
+
+        queue = ExchangeQueue([a, b, c])
+
+        c.gain = 1
+        queue.update(c)
+
+        self.assertIs(queue.pop(), a)
+        self.assertIs(queue.pop(), b)
+        self.assertIs(queue.pop(), c)
+
+    def test_sort(self):
+        a = MagicMock(gain=1)
+        b = MagicMock(gain=3)
+        c = MagicMock(gain=2)
+
+        queue = ExchangeQueue([a, b, c])
+        queue.sort()
+
+        self.assertEqual(list(queue), [b, c, a])
+        self.assertIs(queue[0], b)
+
+    def test_update_to_previous_gain(self):
+        a = MagicMock(gain=1)
+        b = MagicMock(gain=1)
+
+        queue = ExchangeQueue([a, b])
+
+        a.gain = 2
+        queue.update(a)
+        a.gain = 1
+        queue.update(a)
+
+        self.assertIs(queue.pop(), a)
+        self.assertIs(queue.pop(), b)
@@ -1,7 +1,17 @@
 import math
+import os
+import random
 from decimal import *
 
+import pytest
+
+from decide import input_folder
+from decide.data.modelfactory import ModelFactory
+from decide.data.reader import InputDataFile
+from decide.model.base import ActorIssueArrays, stream_seed
 from decide.model.equalgain import EqualGainModel
+from decide.model.observers.observer import Observable
+from decide.model.utils import ModelLoop
 
 
 def test_add_actor():
@@ -72,3 +82,300 @@ def test_calc_combinations(model):
     k = 2
 
     assert combinations == math.factorial(n) / (math.factorial(k) * math.factorial(n - k))
+
+
+def test_affected_exchanges(model):
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+    model.determine_groups_and_calculate_exchanges()
+
+    realize = model.highest_gain()
+    keys = set(model.exchange_index_keys(realize))
+
+    affected = model.affected_exchanges(realize)
+
+    assert realize in affected
+
+    for exchange in model.exchanges:
+        shares_actor_issue = len(keys & set(model.exchange_index_keys(exchange))) > 0
+
+        assert shares_actor_issue == (exchange in affected)
+
+    model.remove_invalid_exchanges(realize)
+
+    assert realize not in model.affected_exchanges(realize)
+
+
+def test_numeric_backend():
+    model = EqualGainModel(numeric_backend="float")
+
+    issue = model.add_issue("TestIssue")
+    issue.lower = 0
+    issue.upper = 200
+    actor = model.add_actor("TestActor")
+    actor_issue = model.add_actor_issue(actor, issue, 100, 0.5, 0.75)
+
+    assert model.number_type is float
+    assert isinstance(actor_issue.position, float)
+    assert actor_issue.position == 50
+
+    with pytest.raises(ValueError):
+        EqualGainModel(numeric_backend="int")
+
+
+def test_seed():
+    date_file = InputDataFile.open(os.path.join(input_folder, "sample_data.txt"))
+    factory = ModelFactory(date_file=date_file)
+
+    def realized(seed, p="0.5"):
+        model = factory(EqualGainModel, randomized_value=p, seed=seed)
+        model_loop = ModelLoop(model, Observable(model_ref=model, output_directory=None), 0)
+
+        model_loop.loop()
+        model_loop.loop()
+
+        return [
+            (issue.issue_id, actor.actor_id, actor_issue.position)
+            for issue, actor_issues in model.actor_issues.items()
+            for actor, actor_issue in actor_issues.items()
+        ]
+
+    assert realized(stream_seed(7, 0)) == realized(stream_seed(7, 0))
+    assert realized(stream_seed(7, 0)) != realized(stream_seed(7, 1))
+
+    assert stream_seed(None, 0) is None
+    assert stream_seed(7, 1) == stream_seed(7, 1)
+    assert stream_seed(7, 1, "0.5") != stream_seed(7, 1, "0.6")
+
+
+def test_initial_exchanges():
+    date_file = InputDataFile.open(os.path.join(input_folder, "sample_data.txt"))
+    factory = ModelFactory(date_file=date_file)
+
+    def realized(p, reuse):
+        model = factory(EqualGainModel, randomized_value=p, seed=stream_seed(7, 0))
+
+        if not reuse:
+            model.initial_exchanges = None
+
+        model_loop = ModelLoop(model, Observable(model_ref=model, output_directory=None), 0)
+
+        model_loop.loop()
+        model_loop.loop()
+
+        return [
+            (issue.issue_id, actor.actor_id, actor_issue.position)
+            for issue, actor_issues in model.actor_issues.items()
+            for actor, actor_issue in actor_issues.items()
+        ]
+
+    assert realized(None, reuse=True) == realized(None, reuse=False)
+    assert realized("0.5", reuse=True) == realized("0.5", reuse=False)
+
+    # the initial exchanges are only used for the first round
+    model = factory(EqualGainModel)
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+    model.determine_groups_and_calculate_exchanges()
+
+    assert model.initial_exchanges is None
+    assert len(model.exchanges) == len(factory.first_round(EqualGainModel).exchanges)
+    assert all(exchange.model is model for exchange in model.exchanges)
+
+
+def test_unchanged_candidates():
+    date_file = InputDataFile.open(os.path.join(input_folder, "sample_data.txt"))
+    factory = ModelFactory(date_file=date_file)
+
+    def rounds(deterministic_candidates):
+        model = factory(EqualGainModel, randomized_value="0.5", seed=stream_seed(7, 0))
+        model.initial_exchanges = None
+        model.DETERMINISTIC_CANDIDATES = deterministic_candidates
+
+        exchanges = []
+
+        # the positions do not change, the third round copies the candidates of the second round
+        for _ in range(3):
+            model.calc_nbs()
+            model.determine_positions()
+            model.calc_combinations()
+            model.determine_groups_and_calculate_exchanges()
+
+            exchanges.append(
+                [(str(exchange.i), str(exchange.j), exchange.gain) for exchange in model.exchanges]
+            )
+
+        return model, exchanges
+
+    model, kept = rounds(True)
+    _, calculated = rounds(False)
+
+    assert kept == calculated
+    assert model.changed_issues() == set()
+    assert all(exchange.model is model for exchange in model.exchanges)
+
+
+def test_is_deterministic(monkeypatch):
+    date_file = InputDataFile.open(os.path.join(input_folder, "sample_data.txt"))
+    factory = ModelFactory(date_file=date_file)
+
+    def run(p):
+        model = factory(EqualGainModel, randomized_value=p)
+        model_loop = ModelLoop(model, Observable(model_ref=model, output_directory=None), 0)
+        model_loop.loop()
+
+        return model
+
+    # the sample data has exchanges with an equal gain
+    model = run(None)
+    assert not model.draws_for_exchanges()
+    assert model.tie_count > 0 and not model.is_deterministic()
+
+    model = run("0.5")
+    assert model.draws_for_exchanges()
+    assert not model.is_deterministic()
+
+    monkeypatch.setattr(EqualGainModel, "ALLOW_RANDOM", False)
+
+    assert run(None).is_deterministic()
+    assert run("0.0").is_deterministic()
+
+
+def test_viable_exchanges():
+    rnd = random.Random(3)
+
+    model = EqualGainModel()
+
+    issues = [model.add_issue("Issue{0}".format(n)) for n in range(3)]
+
+    for issue in issues:
+        issue.lower = 0
+        issue.upper = 100
+
+    for n in range(16):
+        actor = model.add_actor("Actor{0}".format(n))
+
+        for issue in issues:
+            model.add_actor_issue(
+                actor,
+                issue,
+                position=rnd.choice([0, 0, 10, 50, 90, 100, 100]),
+                salience=rnd.choice(["0.1", "0.5", "1"]),
+                power=rnd.choice(["0.000000000001", "0.5", "1"]),
+            )
+
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+
+    arrays = ActorIssueArrays(model)
+
+    skipped = 0
+
+    for p, q in model.issue_combinations:
+        pos = arrays.groups(p, q)
+
+        for group_i, group_j, groups in [(pos[0], pos[3], ["a", "d"]), (pos[1], pos[2], ["b", "c"])]:
+            viable = model.viable_exchanges(arrays, group_i, group_j, p, q)
+
+            for n, i in enumerate(group_i):
+                for m, j in enumerate(group_j):
+                    exchange = model.new_exchange_factory(
+                        arrays.actors[i], arrays.actors[j], p, q, model, groups
+                    )
+                    exchange.calculate()
+
+                    if not viable[n, m]:
+                        skipped += 1
+                        assert not exchange.is_valid
+
+    assert skipped > 0
+
+
+def test_model_state(model):
+    state = model.state
+
+    issue = next(iter(model.issues))
+    actor_issue = next(iter(model.actor_issues[issue].values()))
+
+    assert state.position[actor_issue.index] == actor_issue.position
+
+    actor_issue.position = Decimal(42)
+    assert state.position[actor_issue.index] == 42
+
+    state.set_positions([actor_issue, actor_issue], [Decimal(1), Decimal(2)])
+    assert actor_issue.position == 2
+
+    model.calc_nbs()
+    model.determine_positions()
+
+    for issue, actor_issues in model.actor_issues.items():
+        nbs = sum(a.position * a.salience * a.power for a in actor_issues.values()) / sum(
+            a.salience * a.power for a in actor_issues.values()
+        )
+
+        assert abs(model.nbs[issue] - nbs) < 1e-20
+
+        for actor_issue in actor_issues.values():
+            assert actor_issue.left == (actor_issue.position <= nbs)
+
+
+def test_model_state_grows_exceeded_dimension():
+    model = EqualGainModel()
+
+    issues = [model.add_issue("Issue{0}".format(n)) for n in range(4)]
+
+    for issue in issues:
+        issue.lower = 0
+        issue.upper = 100
+
+    for n in range(200):
+        actor = model.add_actor("Actor{0}".format(n))
+        model.add_actor_issue(actor, issues[n % 4], position=50, salience="0.5", power="1")
+
+    # adding actors does not grow the issue columns
+    assert model.state.present.shape[0] >= 200
+    assert model.state.present.shape[1] == 4
+
+
+def test_sparse_actor_issues():
+    rnd = random.Random(5)
+
+    model = EqualGainModel()
+
+    issues = [model.add_issue("Issue{0}".format(n)) for n in range(4)]
+
+    for issue in issues:
+        issue.lower = 0
+        issue.upper = 100
+
+    for n in range(200):
+        actor = model.add_actor("Actor{0}".format(n))
+
+        for issue in rnd.sample(issues, 2):
+            model.add_actor_issue(actor, issue, position=rnd.choice([0, 50, 100]), salience="0.5", power="1")
+
+    # adding actors does not grow the issue columns
+    assert model.state.present.shape[1] == 4
+
+    model.calc_nbs()
+    model.determine_positions()
+    model.calc_combinations()
+
+    arrays = ActorIssueArrays(model)
+
+    for p, q in model.issue_combinations:
+        groups = arrays.groups(p, q)
+
+        assert sum(len(group) for group in groups) == len(
+            set(model.actor_issues[p]) & set(model.actor_issues[q])
+        )
+
+        for key, group in zip([0, 1, 2, 3], groups):
+            for n in group:
+                actor = arrays.actors[n]
+                left = model.actor_issues[p][actor].left + 2 * model.actor_issues[q][actor].left
+
+                assert left == key
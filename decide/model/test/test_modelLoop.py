@@ -0,0 +1,54 @@
+from decide.model.observers.observer import Observable, Observer
+from decide.model.utils import ModelLoop
+
+
+class Events(Observer):
+    def __init__(self, observable):
+        super().__init__(observable)
+        self.loops = 0
+        self.converged_at = None
+
+    def before_loop(self, iteration: int, repetition: int):
+        self.loops += 1
+
+    def converged(self, iteration: int, repetition: int, iterations: int):
+        self.converged_at = (iteration, iterations)
+
+
+def run(model, iterations, convergence_tolerance):
+    event_handler = Observable(model_ref=model, output_directory=None)
+    events = Events(event_handler)
+
+    model_loop = ModelLoop(model, event_handler, 0, convergence_tolerance)
+    model_loop.run(iterations)
+
+    return model_loop, events
+
+
+def test_run_all_iterations(model):
+    model_loop, events = run(model, 3, None)
+
+    assert events.loops == 3
+    assert events.converged_at is None
+    assert not model_loop.converged
+
+
+def test_converged_on_tolerance(model):
+    # the NBS does not move more than the width of an issue
+    model_loop, events = run(model, 3, 1000)
+
+    assert events.loops == 1
+    assert events.converged_at == (0, 3)
+    assert set(model_loop.nbs_deltas) == set(model.issues)
+
+
+def test_converged_without_exchanges(model):
+    # a tolerance of 0 stops only when there are no exchanges left, with a single issue there are none
+    for issue in list(model.issues)[1:]:
+        del model.issues[issue]
+        del model.actor_issues[issue]
+
+    model_loop, events = run(model, 3, 0)
+
+    assert events.loops == 1
+    assert events.converged_at == (0, 3)
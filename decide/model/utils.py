@@ -1,19 +1,62 @@
 import logging
 
+import numpy as np
+
+from decide.model import calculations
+
 
 class ModelLoop(object):
     """
     Helps performing all the actions in the correct order
     """
 
-    def __init__(self, model, event_handler: "observer.Observable", repetition: int):
+    def __init__(
+        self,
+        model,
+        event_handler: "observer.Observable",
+        repetition: int,
+        convergence_tolerance=None,
+    ):
+        """
+        :param convergence_tolerance: opt-in stopping rule, see converged. None calculates all the iterations
+        """
         self.model = model
         self.event_handler = event_handler
         self.iteration_number = 0
         self.repetition_number = repetition
 
+        self.convergence_tolerance = convergence_tolerance
+        self.converged = False
+        self.nbs_deltas = {}  # dict with issue, the change of the NBS in the last loop
+
+    def run(self, iterations: int, callback=None):
+        """
+        Execute the (remaining) loops of a repetition, stops early when the model converged
+        :param iterations: the maximum number of loops
+        :param callback: called with the ModelLoop after each loop, for example to write a checkpoint
+        """
+        for iteration_number in range(self.iteration_number, iterations):
+            logging.info("round {0}.{1}".format(self.repetition_number, iteration_number))
+            self.loop()
+
+            if self.converged:
+                logging.info(
+                    "converged after round {0}.{1}".format(self.repetition_number, iteration_number)
+                )
+                self.event_handler.converged(
+                    iteration=iteration_number,
+                    repetition=self.repetition_number,
+                    iterations=iterations,
+                )
+                break
+
+            if callback:
+                callback(self)
+
     def loop(self):
         self.model.calc_nbs()
+
+        start_nbs = dict(self.model.nbs)
         self.model.determine_positions()
         self.model.calc_combinations()
         self.model.determine_groups_and_calculate_exchanges()
@@ -47,13 +90,15 @@ class ModelLoop(object):
             repetition=self.repetition_number,
         )
 
-        for exchange in realized:
-            self.model.actor_issues[exchange.i.supply.issue][
-                exchange.i.actor
-            ].position = exchange.i.y
-            self.model.actor_issues[exchange.j.supply.issue][
-                exchange.j.actor
-            ].position = exchange.j.y
+        # the actor issues of the supply issues of all the exchange actors
+        exchange_actors = [
+            exchange_actor for exchange in realized for exchange_actor in (exchange.i, exchange.j)
+        ]
+        actor_issues = [exchange_actor.supply.actor_issue for exchange_actor in exchange_actors]
+
+        self.model.state.set_positions(
+            actor_issues, [exchange_actor.y for exchange_actor in exchange_actors]
+        )
 
         # calc the new MDS on the voting positions and fire the event for ending this loop
         self.model.calc_nbs()
@@ -62,15 +107,40 @@ class ModelLoop(object):
         )
 
         # calculate for each realized exchange there new start positions
-        for exchange in realized:
-            pi = exchange.i.new_start_position()
-            self.model.actor_issues[exchange.i.supply.issue][
-                exchange.i.actor
-            ].position = pi
+        self.model.state.set_positions(
+            actor_issues,
+            calculations.new_start_position(
+                salience=self.as_array([e.supply.salience for e in exchange_actors]),
+                x=self.as_array([e.start_position for e in exchange_actors]),
+                y=self.as_array([e.y for e in exchange_actors]),
+                salience_weight=self.model.SALIENCE_WEIGHT,
+                fixed_weight=self.model.FIXED_WEIGHT,
+                number_type=self.model.number_type,
+            ),
+        )
 
-            pj = exchange.j.new_start_position()
-            self.model.actor_issues[exchange.j.supply.issue][
-                exchange.j.actor
-            ].position = pj
+        if self.convergence_tolerance is not None:
+            self.check_convergence(start_nbs, realized)
 
         self.iteration_number += 1
+
+    def check_convergence(self, start_nbs, realized):
+        """
+        The model converged when no exchange is realized in this loop, the positions do not change anymore,
+        or when the NBS on every issue moved less than the tolerance between the start of this and the next loop.
+        """
+        self.model.calc_nbs()
+
+        self.nbs_deltas = {
+            issue: abs(self.model.nbs[issue] - nbs) for issue, nbs in start_nbs.items()
+        }
+
+        self.converged = len(realized) == 0 or all(
+            delta < self.convergence_tolerance for delta in self.nbs_deltas.values()
+        )
+
+    def as_array(self, values):
+        """
+        Array with the dtype of the model state, so the calculations are done in the number type of the model
+        """
+        return np.array(values, dtype=self.model.state.dtype)
@@ -1,27 +1,31 @@
 import logging
 import os
-import statistics
+import random
 import sys
 import time
 import xml.etree.cElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from shutil import copyfile
 
 from PyQt5 import QtCore
 from PyQt5 import QtWidgets
 from decide import log_filename
+from decide.checkpoint import CHECKPOINT_FILENAME, Checkpoint
 from decide.cli import init_output_directory
 from decide.data.modelfactory import ModelFactory
 from decide.data.reader import InputDataFile
-from decide.model.base import AbstractModel, ActorIssue
+from decide.model.base import ActorIssue
 from decide.model.equalgain import EqualGainModel
 from decide.model.observers.exchanges_writer import ExchangesWriter
 from decide.model.observers.externalities import Externalities
 from decide.model.observers.issue_development import IssueDevelopment
 from decide.model.observers.logger import Logger
 from decide.model.observers.observer import Observable
+from decide.model.observers.recorder import is_deterministic, replay
 from decide.model.observers.sqliteobserver import SQLiteObserver
-from decide.model.utils import ModelLoop
 from decide.qt import utils
+from decide.sweep import SweepScheduler, run_repetition
 from decide.qt.mainwindow.helpers import esc, normalize
 from decide.qt.mainwindow.settings import ProgramSettings
 from decide.qt.mainwindow.settings import SettingsFormWidget
@@ -57,67 +61,162 @@ class Worker(QtCore.QObject):
         model = factory(model_klass=EqualGainModel, randomized_value=settings.model_variations[0])
 
         safe_model_as_input(model, os.path.join(parent_output_directory, "input.csv"))
-        safe_settings_as_csv(self.settings, os.path.join(parent_output_directory, "settings.csv"))
 
-        event_handler = init_event_handlers(model, parent_output_directory, settings)
-
-        event_handler.before_model()
+        numeric_backend = "decimal"
 
         model_variations = list(settings.model_variations)
 
-        for variation, p in enumerate(model_variations, 0):
+        # a run with the same seed can be reproduced, an interrupted run continues with its own seed
+        seed = settings.seed or None
 
-            output_directory = init_output_directory(
-                parent_output_directory,
-                p
-            )
+        checkpoint = None
 
-            event_handler.update_output_directory(output_directory)
+        if settings.checkpoint:
+            checkpoint = self.load_checkpoint(parent_output_directory, model_variations, seed, numeric_backend)
+            seed = checkpoint.arguments["seed"]
 
-            event_handler.before_repetitions(
-                repetitions=settings.repetitions,
-                iterations=settings.iterations,
-                randomized_value=p,
-            )
+        if seed is None:
+            seed = random.randrange(2 ** 32)
 
-            start_time = time.time()
+        safe_settings_as_csv(self.settings, os.path.join(parent_output_directory, "settings.csv"), seed)
 
-            for repetition in range(settings.repetitions):
+        event_handler = init_event_handlers(model, parent_output_directory, settings)
 
-                model = factory(model_klass=EqualGainModel, randomized_value=p)
+        event_handler.before_model()
 
-                event_handler.update_model_ref(model)
+        event_handler.log(message="Seed {0}".format(seed))
+
+        if checkpoint and checkpoint.resumed:
+            # the output of the finished p-values is written before the interruption
+            event_handler.restore_checkpoint_state(checkpoint.observer_states)
+            model_variations = [p for p in model_variations if p not in checkpoint.finished]
+        elif checkpoint:
+            checkpoint.observer_states = event_handler.checkpoint_state()
+
+        task = partial(
+            run_repetition,
+            input_file=settings.input_filename,
+            actors=settings.selected_actors,
+            issues=settings.selected_issues,
+            model_klass=EqualGainModel,
+            numeric_backend=numeric_backend,
+            iterations=settings.iterations,
+            seed=seed,
+        )
 
-                model_loop = ModelLoop(model, event_handler, repetition)
+        start_time = time.time()
 
-                event_handler.before_iterations(repetition)
+        # the repetitions that are calculated, in any order
+        finished = checkpoint.repetitions if checkpoint else {}
+        calculated = set((p, repetition) for p in model_variations for repetition in finished.get(p, {}))
 
-                for iteration_number in range(settings.iterations):
+        def repetition_finished(p, repetition, records):
+            if checkpoint:
+                checkpoint.add_repetition(p, repetition, records)
 
-                    if self.break_loop:
-                        break
+            calculated.add((p, repetition))
+            self.emit_progress(len(calculated), start_time)
 
-                    self.update.emit(variation, repetition, iteration_number, start_time)
+            if self.break_loop:
+                scheduler.cancel()
 
-                    model_loop.loop()
+        # the (p-value x repetition) grid is calculated on all the cores, each p-value is written when it is complete
+        with ProcessPoolExecutor() as executor:
+            scheduler = SweepScheduler(
+                executor,
+                task,
+                model_variations,
+                settings.repetitions,
+                finished=finished,
+                callback=repetition_finished,
+                deterministic=is_deterministic,
+            )
 
-                event_handler.after_iterations(repetition)
+            for p, repetition_records in scheduler.completed():
 
                 if self.break_loop:
+                    scheduler.cancel()
                     break
 
-            if not self.break_loop:
+                output_directory = init_output_directory(
+                    parent_output_directory,
+                    p
+                )
+
+                model = factory(model_klass=EqualGainModel, randomized_value=p)
+
+                event_handler.update_model_ref(model)
+                event_handler.update_output_directory(output_directory)
+
+                event_handler.before_repetitions(
+                    repetitions=settings.repetitions,
+                    iterations=settings.iterations,
+                    randomized_value=p,
+                )
+
+                for repetition, records in enumerate(repetition_records):
+                    replay(records, event_handler, repetition)
+
+                # the repetitions of a deterministic p-value are not calculated
+                calculated.update((p, repetition) for repetition in range(settings.repetitions))
+                self.emit_progress(len(calculated), start_time)
+
                 event_handler.after_repetitions()
 
-                logging.info('tie count is {}'.format(model.tie_count))
+                logging.info('tie count is {}'.format(event_handler.model_ref.tie_count))
+
+                if checkpoint:
+                    checkpoint.finish(p, event_handler.checkpoint_state())
 
         if not self.break_loop:
             event_handler.update_output_directory(parent_output_directory)
             event_handler.after_model()
-            print(len(AbstractModel.eui))
-            print(statistics.variance(AbstractModel.eui))
+
+        # a cancelled run starts over, only an interrupted run is resumed
+        if checkpoint:
+            checkpoint.remove()
+
         self.finished.emit(parent_output_directory)
 
+    def load_checkpoint(self, parent_output_directory, model_variations, seed, numeric_backend):
+        """
+        Resume the checkpoint of an interrupted run with the same settings, otherwise start a new checkpoint
+        :param seed: the seed of the run, None takes the seed of the interrupted run or chooses a random seed
+        """
+        settings = self.settings
+
+        path = os.path.join(parent_output_directory, CHECKPOINT_FILENAME)
+
+        arguments = dict(
+            input_file=os.path.abspath(settings.input_filename),
+            p_values=model_variations,
+            repetitions=settings.repetitions,
+            iterations=settings.iterations,
+            numeric=numeric_backend,
+            seed=seed,
+            actors=list(settings.selected_actors),
+            issues=list(settings.selected_issues),
+        )
+
+        if os.path.isfile(path):
+            try:
+                return Checkpoint.load(path, arguments)
+            except ValueError as e:
+                logging.info(e)
+
+        if seed is None:
+            arguments["seed"] = random.randrange(2 ** 32)
+
+        return Checkpoint(path, arguments)
+
+    def emit_progress(self, calculated, start_time):
+        """
+        Emit the progress as the position of the last repetition when the repetitions are calculated in order
+        """
+        variation, repetition = divmod(calculated - 1, self.settings.repetitions)
+
+        self.update.emit(variation, repetition, self.settings.iterations - 1, start_time)
+
     def stop(self):
         self.break_loop = True
 
@@ -522,7 +621,7 @@ if __name__ == "__main__":
     main()
 
 
-def safe_settings_as_csv(settings: ProgramSettings, filename):
+def safe_settings_as_csv(settings: ProgramSettings, filename, seed):
 
     items = ["salience_weight", "fixed_weight", "iterations", "repetitions"]
 
@@ -536,6 +635,9 @@ def safe_settings_as_csv(settings: ProgramSettings, filename):
 
             file.write("\t".join([esc(item), esc(value), "\n"]))
 
+        # the seed of the run, also when it was chosen at random
+        file.write("\t".join([esc("seed"), esc(seed), "\n"]))
+
 
 def safe_model_as_input(model, filename):
     with open(filename, "w") as file:
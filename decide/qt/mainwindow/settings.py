@@ -61,17 +61,28 @@ class SettingsFormWidget(QtWidgets.QFormLayout):
         self.repetitions.setValue(10)
         self.repetitions.setMaximum(10000)
 
+        self.checkpoint = QtWidgets.QCheckBox()
+        self.checkpoint.stateChanged.connect(self.state_changed)
+
+        self.seed = QtWidgets.QSpinBox()
+        self.seed.setMaximum(2 ** 31 - 1)
+        self.seed.valueChanged.connect(self.state_changed)
+
         self.addRow(QtWidgets.QLabel("Fixed weight"), self.fixed_weight)
         self.addRow(QtWidgets.QLabel("Salience weight"), self.salience_weight)
         self.addRow(QtWidgets.QLabel(""))
         self.addRow(QtWidgets.QLabel("Negotiation rounds"), self.iterations)
         self.addRow(QtWidgets.QLabel("Simulation repetitions"), self.repetitions)
+        self.addRow(QtWidgets.QLabel("Seed (0 is random)"), self.seed)
         self.addRow(QtWidgets.QLabel(""))
 
         self.addRow(QtWidgets.QLabel("p-value"))
         self.addRow(QtWidgets.QLabel("Start"), self.start)
         self.addRow(QtWidgets.QLabel("Step"), self.step)
         self.addRow(QtWidgets.QLabel("Stop"), self.stop)
+        self.addRow(QtWidgets.QLabel(""))
+
+        self.addRow(QtWidgets.QLabel("Resume after an interruption"), self.checkpoint)
 
     def load(self):
         """
@@ -87,9 +98,9 @@ class SettingsFormWidget(QtWidgets.QFormLayout):
             if hasattr(self, key):
                 attr = getattr(self, key)
 
-                if isinstance(value, bool):  # type: QtWidgets.QAction
+                if isinstance(value, bool):  # type: QtWidgets.QCheckBox
                     attr.setChecked(value)
-                if isinstance(attr, list):
+                elif isinstance(attr, list):
                     self.settings.__dict__[attr] = value
                 else:
                     attr.setValue(value)
@@ -104,7 +115,10 @@ class SettingsFormWidget(QtWidgets.QFormLayout):
 
         for key, value in settings:
             if hasattr(self.settings, key):
-                setattr(self.settings, key, value.value())
+                if isinstance(value, QtWidgets.QCheckBox):
+                    setattr(self.settings, key, value.isChecked())
+                else:
+                    setattr(self.settings, key, value.value())
 
     def state_changed(self):
 
@@ -140,6 +154,12 @@ class ProgramSettings(QtCore.QObject):
         self.repetitions = 10
         self.iterations = 10
 
+        # the seed of the run, every repetition gets its own random streams derived from it. 0 chooses a random seed
+        self.seed = 0
+
+        # write a checkpoint, so an interrupted run with the same settings is resumed
+        self.checkpoint = False
+
         self.settings_type = "xml"
         self.settings_list_separator = ";"
 
@@ -12,26 +12,17 @@ pd.set_option('display.max_columns', 500)
 def write_result(conn, iterations, model_run_id, output_directory):
 
     df = pd.read_sql("""
-    SELECT  
-        a.p as p,
-        a.issue as issue,  
-        a.repetion || '-' || a.iteration as pointer, 
-        a.numerator / a.denominator AS nbs
-    FROM (SELECT
-            sum(ai.position * ai.power * ai.salience) AS numerator,
-            sum(ai.salience * ai.power)               AS denominator,
-            r.pointer                                 AS repetion,
-            i2.pointer                                AS iteration,
-            m.p,
-            i.name as issue
-          FROM actorissue ai
-            LEFT JOIN issue i ON ai.issue_id = i.id
-            LEFT JOIN actor a ON ai.actor_id = a.id
-            LEFT JOIN iteration i2 ON ai.iteration_id = i2.id
-            LEFT JOIN repetition r ON i2.repetition_id = r.id
-            LEFT JOIN modelrun m ON r.model_run_id = m.id            
-          WHERE  ai.type = 'after' AND i2.pointer = ? AND m.id = ? 
-         GROUP BY m.id,r.id, i2.id, i.id) a
+    SELECT
+        m.p as p,
+        i.name as issue,
+        r.pointer || '-' || i2.pointer as pointer,
+        x.mds AS nbs
+    FROM mds x
+        INNER JOIN issue i ON x.issue_id = i.id
+        INNER JOIN iteration i2 ON x.iteration_id = i2.id
+        INNER JOIN repetition r ON i2.repetition_id = r.id
+        INNER JOIN modelrun m ON r.model_run_id = m.id
+    WHERE x.type = 'after' AND i2.pointer = ? AND m.id = ?
     """,
                      conn,
                      params=(iterations, model_run_id, ),
@@ -42,7 +33,8 @@ def write_result(conn, iterations, model_run_id, output_directory):
     for p in sorted(set(df.index)):
         x = df.loc[p].pivot(index='pointer', columns='issue', values='nbs').cov().round(5)
 
-        x.to_csv(os.path.join(output_directory, 'covariance.equal-{}.csv'.format(p)))
+        # p is stored as REAL, keep the file names of the DECIMAL column (0 instead of 0.0)
+        x.to_csv(os.path.join(output_directory, 'covariance.equal-{:g}.csv'.format(p)))
 
         logging.info('writen covariance table for p={}'.format(p))
 
@@ -13,20 +13,29 @@ pd.set_option('display.max_columns', 500)
 
 
 def write_summary_result(conn, model_run_ids, output_directory):
-    sql = """SELECT SUM(e.own)            as own,
-           SUM(e.inner_positive) as inner_positive,
-           SUM(e.inner_negative) as inner_negative,
-           SUM(e.outer_positive) as outer_positive,
-           SUM(e.outer_negative) as outer_negative,
+    # only the externalities that are not zero are stored, a missing row counts as zero
+    sql = """SELECT COALESCE(s.own, 0)            as own,
+           COALESCE(s.inner_positive, 0) as inner_positive,
+           COALESCE(s.inner_negative, 0) as inner_negative,
+           COALESCE(s.outer_positive, 0) as outer_positive,
+           COALESCE(s.outer_negative, 0) as outer_negative,
            a.name                   actor,
            m.p
-    FROM externality e
-             JOIN actor a on e.actor_id = a.id
-             JOIN iteration i on e.iteration_id = i.id
-             JOIN repetition r on i.repetition_id = r.id
-             JOIN modelrun m on r.model_run_id = m.id         
-    WHERE m.id IN(%s)
-    GROUP BY e.actor_id, m.id""" % list_to_sql_param(model_run_ids)
+    FROM modelrun m
+             JOIN actor a on a.data_set_id = m.data_set_id
+             LEFT JOIN (SELECT SUM(e.own)            as own,
+                               SUM(e.inner_positive) as inner_positive,
+                               SUM(e.inner_negative) as inner_negative,
+                               SUM(e.outer_positive) as outer_positive,
+                               SUM(e.outer_negative) as outer_negative,
+                               e.actor_id,
+                               r.model_run_id
+                        FROM externality e
+                                 JOIN iteration i on e.iteration_id = i.id
+                                 JOIN repetition r on i.repetition_id = r.id
+                        WHERE r.model_run_id IN(%s)
+                        GROUP BY e.actor_id, r.model_run_id) s on s.actor_id = a.id AND s.model_run_id = m.id
+    WHERE m.id IN(%s)""" % (list_to_sql_param(model_run_ids), list_to_sql_param(model_run_ids))
 
     df = pd.read_sql_query(
         sql,
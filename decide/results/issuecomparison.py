@@ -18,7 +18,7 @@ def write_summary_result(conn, model_run_ids, output_directory):
             i2.pointer + 1                                AS round,
             m.p,
             m.id  
-          FROM actorissue ai
+          FROM actorissue_snapshot ai
             LEFT JOIN issue i ON ai.issue_id = i.id
             LEFT JOIN actor a ON ai.actor_id = a.id
             LEFT JOIN iteration i2 ON ai.iteration_id = i2.id
@@ -43,7 +43,7 @@ def write_summary_result(conn, model_run_ids, output_directory):
             i2.pointer + 1                                AS round,
             m.p,
             m.id  
-          FROM actorissue ai
+          FROM actorissue_snapshot ai
             LEFT JOIN issue i ON ai.issue_id = i.id
             LEFT JOIN actor a ON ai.actor_id = a.id
             LEFT JOIN iteration i2 ON ai.iteration_id = i2.id
@@ -17,26 +17,17 @@ def write_summary_result(conn, model_run_ids, output_directory, ai_type="before"
     df = pd.read_sql(
         """
     SELECT
-      a.p as p,
-      a.issue as issue,
-      a.round as round,
-      a.repetion as repetion,
-      a.numerator / a.denominator AS mds
-    FROM (SELECT
-            sum(ai.position * ai.power * ai.salience) AS numerator,
-            sum(ai.salience * ai.power)               AS denominator,
-            r.pointer                                 AS repetion,
-            i2.pointer + 1                                AS round,
-            m.p,
-      i.name as issue
-          FROM actorissue ai
-            LEFT JOIN issue i ON ai.issue_id = i.id
-            LEFT JOIN actor a ON ai.actor_id = a.id
-            LEFT JOIN iteration i2 ON ai.iteration_id = i2.id
-            LEFT JOIN repetition r ON i2.repetition_id = r.id
-            LEFT JOIN modelrun m ON r.model_run_id = m.id        
-          WHERE  ai.type = '%s' AND m.id IN (%s)
-         GROUP BY m.id,r.id, i2.id, i.id) a
+      m.p as p,
+      i.name as issue,
+      i2.pointer + 1 as round,
+      r.pointer as repetion,
+      x.mds AS mds
+    FROM mds x
+      INNER JOIN issue i ON x.issue_id = i.id
+      INNER JOIN iteration i2 ON x.iteration_id = i2.id
+      INNER JOIN repetition r ON i2.repetition_id = r.id
+      INNER JOIN modelrun m ON r.model_run_id = m.id
+    WHERE x.type = '%s' AND m.id IN (%s)
     """
         % (ai_type, list_to_sql_param(model_run_ids)),
         conn,
@@ -80,31 +71,19 @@ ORDER BY issue.name""" % list_to_sql_param(
 
     for name, issue_id in issues:
         df = pd.read_sql(
-            """SELECT a.p                         as p,
-       a.issue                     as issue,
-       a.round                 as round,
-       a.repetion                  as repetion,
-       a.numerator / a.denominator AS mds
-FROM (SELECT sum(ai.position * ai.power * ai.salience) AS numerator,
-             sum(ai.salience * ai.power)
-                                                       AS denominator,
-             r.pointer
-                                                       AS repetion,
-             i2.pointer +1
-                                                       AS round,
-             m.p,
-             i.name                                    as issue
-      FROM actorissue ai
-               LEFT JOIN issue i ON ai.issue_id = i.id
-               LEFT JOIN actor a ON ai.actor_id = a.id
-               LEFT JOIN iteration i2 ON ai.iteration_id = i2.id
-               LEFT JOIN repetition r ON i2.repetition_id = r.id
-               LEFT JOIN modelrun m ON r.model_run_id = m.id
-               LEFT JOIN dataset d ON a.data_set_id = d.id
-      WHERE ai.type = '%s'
-        AND m.id IN(%s)
-        AND i.id = %s
-      GROUP BY m.id, r.id, i2.id, i.id) a
+            """SELECT m.p            as p,
+       i.name                as issue,
+       i2.pointer + 1        as round,
+       r.pointer             as repetion,
+       x.mds                 AS mds
+FROM mds x
+         INNER JOIN issue i ON x.issue_id = i.id
+         INNER JOIN iteration i2 ON x.iteration_id = i2.id
+         INNER JOIN repetition r ON i2.repetition_id = r.id
+         INNER JOIN modelrun m ON r.model_run_id = m.id
+WHERE x.type = '%s'
+  AND m.id IN(%s)
+  AND i.id = %s
         """
             % (ai_type, list_to_sql_param(model_run_ids), issue_id),
             conn,
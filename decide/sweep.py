@@ -0,0 +1,245 @@
+"""
+Parallel sweep over p-values.
+
+The repetitions of all the p-values of a sweep are independent of each other. The SweepScheduler runs
+the (p-value x repetition) grid as separate tasks on a pool of worker processes, the results are
+replayed on the observers of the main process.
+"""
+from collections import defaultdict
+from concurrent.futures import as_completed
+from functools import lru_cache
+
+from decide.components import run_components
+from decide.data.modelfactory import ModelFactory
+from decide.data.reader import InputDataFile
+from decide.model.base import stream_seed
+from decide.model.observers.recorder import EventRecorder
+from decide.model.utils import ModelLoop
+
+
+def run_repetition(p, repetition, iterations, split_components=False, **kwargs):
+    """
+    Calculate a single repetition in a worker process, see create_repetition for the arguments
+    :param split_components: calculate the groups of issues without shared actors as separate models,
+        see decide.components
+    :return: the records of the EventRecorder, to be replayed on the observers of the main process
+    """
+    if split_components:
+        convergence_tolerance = kwargs.pop("convergence_tolerance", None)
+        model = create_model(p, repetition, **kwargs)
+
+        if len(model.issue_components()) > 1:
+            return run_components(model, repetition, iterations, convergence_tolerance)
+
+        return finish_repetition(
+            record_repetition(model, repetition, convergence_tolerance), iterations
+        )
+
+    return finish_repetition(create_repetition(p, repetition, **kwargs), iterations)
+
+
+def create_repetition(p, repetition, convergence_tolerance=None, **kwargs):
+    """
+    Create the model of a repetition, with an EventRecorder as event handler
+    :param convergence_tolerance: stop the repetition early when the model converged, see ModelLoop
+    :param kwargs: see create_model
+    :return: ModelLoop
+    """
+    return record_repetition(
+        create_model(p, repetition, **kwargs), repetition, convergence_tolerance
+    )
+
+
+def create_model(
+        p,
+        repetition,
+        input_file,
+        actors,
+        issues,
+        model_klass,
+        numeric_backend,
+        seed=None,
+        common_random_numbers=False,
+):
+    """
+    Create the model of a repetition
+    :param seed: the seed of the run, the model gets its own random streams derived from it
+    :param common_random_numbers: use the same random streams for all the p-values
+    """
+    factory = model_factory(input_file, tuple(actors or ()), tuple(issues or ()))
+
+    return factory(
+        model_klass=model_klass,
+        randomized_value=p,
+        numeric_backend=numeric_backend,
+        seed=stream_seed(seed, repetition, None if common_random_numbers else p),
+    )
+
+
+def record_repetition(model, repetition, convergence_tolerance=None):
+    """
+    Start a repetition of the model with an EventRecorder as event handler
+    :return: ModelLoop
+    """
+    event_handler = EventRecorder(model)
+
+    event_handler.before_iterations(repetition)
+
+    return ModelLoop(model, event_handler, repetition, convergence_tolerance)
+
+
+@lru_cache(maxsize=8)
+def model_factory(input_file, actors, issues):
+    """
+    The ModelFactory of a data file, kept for the next repetitions in the same worker process so the
+    file is only read and the template model is only built once
+    """
+    return ModelFactory(
+        InputDataFile.open(input_file),
+        actor_whitelist=list(actors),
+        issue_whitelist=list(issues),
+    )
+
+
+def finish_repetition(model_loop: ModelLoop, iterations, callback=None):
+    """
+    Execute the remaining loops of a repetition created by create_repetition
+    :param callback: see ModelLoop.run
+    :return: the records of the EventRecorder
+    """
+    model_loop.run(iterations, callback)
+
+    model_loop.event_handler.after_iterations(model_loop.repetition_number)
+
+    return model_loop.event_handler.records
+
+
+class SweepScheduler:
+    """
+    Schedules the repetitions of a sweep over p-values on an executor.
+
+    All the tasks are submitted at once. A worker that finished a repetition picks up the next task,
+    also when it belongs to the next p-value, so all the workers stay busy until the sweep is done.
+    """
+
+    def __init__(
+            self,
+            executor,
+            task,
+            p_values,
+            repetitions,
+            finished=None,
+            callback=None,
+            deterministic=None,
+    ):
+        """
+        :param executor: concurrent.futures.Executor
+        :param task: callable with the p-value and the repetition as arguments, the result needs to be picklable
+        :param p_values: the p-values of the sweep
+        :param repetitions: the number of repetitions of each p-value
+        :param finished: dict with p-value, dict with repetition and result. These tasks are not submitted again
+        :param callback: called with the p-value, repetition and result of each task that finishes
+        :param deterministic: callable with the result of the first repetition, True when all the repetitions of
+            the p-value give that result. The other repetitions are then not calculated and get the same result.
+        """
+        self.executor = executor
+        self.task = task
+        self.p_values = list(p_values)
+        self.repetitions = repetitions
+        self.futures = {}
+
+        self.results = defaultdict(dict)
+
+        for index, p in enumerate(self.p_values):
+            self.results[index].update((finished or {}).get(p, {}))
+
+        self.callback = callback
+        self.deterministic = deterministic
+        self.cancelled = False
+
+        # the index of the next p-value that completed() yields
+        self.next_index = 0
+
+    def submit(self):
+        for index, p in enumerate(self.p_values):
+            self._check_deterministic(index)
+
+            for repetition in range(self.repetitions):
+                if repetition in self.results[index]:
+                    continue
+
+                future = self.executor.submit(self.task, p, repetition)
+                self.futures[future] = (index, repetition)
+
+    def completed(self):
+        """
+        Yields the p-values in the order of p_values, each as soon as all its repetitions and those of the
+        p-values before it are calculated. The repetitions of later p-values are calculated in the meantime.
+        :return: generator of tuples with the p-value and the results of the repetitions in order of repetition
+        """
+        if not self.futures:
+            self.submit()
+
+        # the p-values that were finished before
+        yield from self._in_order()
+
+        for future in as_completed(list(self.futures)):
+            if self.cancelled:
+                return
+
+            if future not in self.futures:
+                continue  # a repetition of a deterministic p-value
+
+            index, repetition = self.futures[future]
+
+            self.results[index][repetition] = future.result()
+
+            if self.callback:
+                self.callback(self.p_values[index], repetition, self.results[index][repetition])
+
+            if repetition == 0:
+                self._check_deterministic(index)
+
+            yield from self._in_order()
+
+    def _in_order(self):
+        """
+        The finished p-values that are next in the order of p_values
+        """
+        while self.next_index < len(self.p_values) and len(self.results[self.next_index]) == self.repetitions:
+            yield self._pop(self.next_index)
+
+            self.next_index += 1
+
+    def _check_deterministic(self, index):
+        """
+        When the first repetition is deterministic, it is the result of all the repetitions of the p-value
+        """
+        if self.deterministic is None or 0 not in self.results[index]:
+            return
+
+        if len(self.results[index]) == self.repetitions or not self.deterministic(self.results[index][0]):
+            return
+
+        for future, (future_index, repetition) in list(self.futures.items()):
+            if future_index == index and repetition not in self.results[index]:
+                # a repetition that is already running finishes, but its result is not used
+                future.cancel()
+                del self.futures[future]
+
+        for repetition in range(self.repetitions):
+            self.results[index].setdefault(repetition, self.results[index][0])
+
+    def _pop(self, index):
+        finished = self.results.pop(index)
+
+        return self.p_values[index], [finished[r] for r in range(self.repetitions)]
+
+    def cancel(self):
+        """
+        Cancel the tasks that are not started yet and stop completed(), also when called from the callback
+        """
+        self.cancelled = True
+
+        for future in self.futures:
+            future.cancel()
@@ -0,0 +1,77 @@
+import os
+import pickle
+from functools import partial
+
+import pytest
+
+from decide import input_folder
+from decide.checkpoint import Checkpoint
+from decide.model.equalgain import EqualGainModel
+from decide.sweep import create_repetition, finish_repetition
+
+ARGUMENTS = dict(
+    input_file=os.path.join(input_folder, "sample_data.txt"),
+    actors=None,
+    issues=None,
+    model_klass=EqualGainModel,
+    numeric_backend="decimal",
+    seed=3,
+)
+
+
+def final_positions(records):
+    model, _ = pickle.loads(records[-1])
+
+    return [
+        (issue.issue_id, actor.actor_id, actor_issue.position)
+        for issue, actor_issues in model.actor_issues.items()
+        for actor, actor_issue in actor_issues.items()
+    ]
+
+
+def test_resume_running_repetition(tmp_path):
+    expected = finish_repetition(create_repetition("0.5", 1, **ARGUMENTS), 3)
+
+    path = str(tmp_path / "checkpoint.pickle")
+
+    checkpoint = Checkpoint(path, {"seed": 3}, interval=0)
+
+    # interrupted after the second iteration
+    model_loop = create_repetition("0.5", 1, **ARGUMENTS)
+    model_loop.run(2, partial(checkpoint.save_running, "0.5"))
+
+    resumed = Checkpoint.load(path, {"seed": None})
+
+    assert resumed.arguments == {"seed": 3}
+    assert resumed.running_repetition("0.5", 0) is None
+
+    model_loop = resumed.running_repetition("0.5", 1)
+
+    assert model_loop.iteration_number == 2
+
+    records = finish_repetition(model_loop, 3)
+
+    assert len(records) == len(expected)
+    assert final_positions(records) == final_positions(expected)
+
+
+def test_finished(tmp_path):
+    path = str(tmp_path / "checkpoint.pickle")
+
+    checkpoint = Checkpoint(path, {"seed": 3}, interval=0)
+    checkpoint.add_repetition("0.5", 0, [b"records"])
+    checkpoint.add_repetition("0.6", 0, [b"records"])
+    checkpoint.finish("0.5", [None, {"model_run_ids": [1]}])
+
+    resumed = Checkpoint.load(path, {"seed": 3})
+
+    assert resumed.finished == ["0.5"]
+    assert resumed.observer_states == [None, {"model_run_ids": [1]}]
+    assert dict(resumed.repetitions) == {"0.6": {0: [b"records"]}}
+
+    with pytest.raises(ValueError):
+        Checkpoint.load(path, {"seed": 4})
+
+    resumed.remove()
+
+    assert not os.path.isfile(path)
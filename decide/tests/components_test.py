@@ -0,0 +1,106 @@
+import random
+from decimal import Decimal
+
+from decide.components import component_seed, run_components
+from decide.model.equalgain import EqualGainModel
+from decide.model.observers.observer import Observable, Observer
+from decide.model.observers.recorder import EventRecorder, replay
+from decide.model.utils import ModelLoop
+
+
+def create_model(seed=None):
+    rnd = random.Random(7)
+
+    model = EqualGainModel(randomized_value=Decimal("0.1"), seed=seed)
+
+    # two groups of actors, each with their own issues
+    for component in range(2):
+        issues = [model.add_issue("Issue{0}-{1}".format(component, n)) for n in range(2)]
+
+        for issue in issues:
+            issue.lower = 0
+            issue.upper = 100
+
+        for n in range(6):
+            actor = model.add_actor("Actor{0}-{1}".format(component, n))
+
+            for issue in issues:
+                model.add_actor_issue(
+                    actor,
+                    issue,
+                    position=rnd.choice([0, 10, 50, 90, 100]),
+                    salience=rnd.choice(["0.1", "0.5", "1"]),
+                    power=rnd.choice(["0.5", "1"]),
+                )
+
+    return model
+
+
+def positions(model):
+    return {
+        (actor.actor_id, issue.issue_id): actor_issue.position
+        for issue, actor_issues in model.actor_issues.items()
+        for actor, actor_issue in actor_issues.items()
+    }
+
+
+class Collector(Observer):
+    def __init__(self, observable):
+        super().__init__(observable)
+        self.events = []
+        self.positions = None
+
+    def execute_exchange(self, exchange):
+        self.events.append("execute_exchange")
+
+    def before_loop(self, iteration, repetition=None):
+        self.events.append("before_loop")
+
+    def after_loop(self, realized, iteration, repetition):
+        self.events.append("after_loop")
+
+    def end_loop(self, iteration, repetition):
+        self.events.append("end_loop")
+
+    def after_iterations(self, repetition):
+        self.events.append("after_iterations")
+        self.positions = positions(self.model_ref)
+
+
+def test_issue_components():
+    model = create_model()
+
+    components = model.issue_components()
+
+    assert [[issue.issue_id for issue in issues] for issues in components] == [
+        ["Issue0-0", "Issue0-1"],
+        ["Issue1-0", "Issue1-1"],
+    ]
+
+
+def test_run_components():
+    model = create_model(seed="components")
+    records = run_components(model, 0, 5)
+
+    observable = Observable(model, "")
+    collector = Collector(observable)
+
+    replay(records, observable)
+
+    assert collector.events[0] == "before_loop"
+    assert collector.events.count("before_loop") == 5
+    assert collector.events.count("end_loop") == 5
+    assert collector.events[-1] == "after_iterations"
+    assert "execute_exchange" in collector.events
+
+    # the same as calculating each component as a model of its own
+    model = create_model(seed="components")
+    expected = {}
+
+    for component, issues in enumerate(model.issue_components()):
+        sub_model = model.sub_model(issues, component_seed("components", component))
+        ModelLoop(sub_model, EventRecorder(sub_model), 0).run(5)
+
+        expected.update(positions(sub_model))
+
+    assert collector.positions == expected
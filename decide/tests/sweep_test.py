@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from decide.sweep import SweepScheduler
+
+
+def task(p, repetition):
+    # the first repetitions finish last
+    time.sleep(0.01 * (3 - repetition))
+
+    return p, repetition
+
+
+def test_sweep_scheduler():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scheduler = SweepScheduler(executor, task, ["0.0", "0.5", "0.5"], 3)
+
+        completed = list(scheduler.completed())
+
+    assert sorted(p for p, _ in completed) == ["0.0", "0.5", "0.5"]
+
+    for p, results in completed:
+        assert results == [(p, 0), (p, 1), (p, 2)]
+
+
+def test_submission_order():
+    def slow_first(p, repetition):
+        # the first p-value finishes last
+        time.sleep(0.05 if p == "0.0" else 0)
+
+        return p, repetition
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scheduler = SweepScheduler(executor, slow_first, ["0.0", "0.1", "0.2"], 2)
+
+        completed = list(scheduler.completed())
+
+    assert [p for p, _ in completed] == ["0.0", "0.1", "0.2"]
+
+
+def test_deterministic_p_value():
+    calculated = []
+
+    def deterministic_task(p, repetition):
+        calculated.append((p, repetition))
+
+        return task(p, repetition)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        scheduler = SweepScheduler(
+            executor,
+            deterministic_task,
+            ["0.0", "0.5"],
+            3,
+            deterministic=lambda result: result[0] == "0.0",
+        )
+
+        completed = dict(scheduler.completed())
+
+    # the first repetition of p=0.0 is used for all its repetitions
+    assert completed["0.0"] == [("0.0", 0)] * 3
+    assert completed["0.5"] == [("0.5", 0), ("0.5", 1), ("0.5", 2)]
+    assert ("0.0", 2) not in calculated
+
+
+def test_cancel_from_callback():
+    finished = []
+
+    def callback(p, repetition, result):
+        finished.append(result)
+        scheduler.cancel()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        scheduler = SweepScheduler(executor, task, ["0.0", "0.5"], 3, callback=callback)
+
+        completed = list(scheduler.completed())
+
+    # the scheduler stops after the first repetition that finished
+    assert completed == []
+    assert len(finished) == 1